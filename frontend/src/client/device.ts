@@ -55,7 +55,7 @@ export class Device {
         for await (const event of eventStream) {
             switch (event.event_type) {
                 case SSEEventType.StateChanged:
-                    this.state = {...this._state, ...(event.payload as DeviceState)};
+                    this.state = {...this._state, ...(event.payload as Partial<DeviceState>)};
                     break;
                 case SSEEventType.DeviceDisconnected:
                     this._state.connected = false;
@@ -68,6 +68,10 @@ export class Device {
                     break;
                 case SSEEventType.Ping:
                     break
+                case SSEEventType.Reset:
+                    // Missed events could not be replayed
+                    await this.getDeviceState();
+                    break;
             }
 
             if (this._stop) {
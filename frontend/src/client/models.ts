@@ -14,6 +14,7 @@ export interface DeviceState {
     timer_value: number;
     unit: TemperatureUnit | null;
     speaker_status: boolean;
+    version: number;
 }
 
 export enum DeviceStatus {
@@ -64,12 +65,13 @@ export enum SSEEventType {
     StateChanged = 'state_changed',
     Event = 'event',
     Ping = 'ping',
+    Reset = 'reset',
 }
 
 export interface SSEEvent {
     event_type: SSEEventType;
     device_id: string | null;
-    payload: AnovaEvent | DeviceState | null;
+    payload: AnovaEvent | Partial<DeviceState> | null;
 }
 
 export interface BLEDevice {
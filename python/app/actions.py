@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from anova_wifi.device import AnovaDevice
+from anova_wifi.manager import AnovaManager
+from commands import SetTargetTemperature, SetTimer, StartTimer, StopTimer, ClearAlarm, SetTemperatureUnit, \
+    TemperatureUnit
+from .models import CommandType, DeviceCommand, CommandResult, BatchDeviceResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_CONCURRENCY = 20
+
+COMMANDS: Dict[CommandType, Callable[[AnovaDevice, Any], Awaitable[Any]]] = {
+    CommandType.start: lambda device, _: device.start_cooking(),
+    CommandType.stop: lambda device, _: device.stop_cooking(),
+    CommandType.set_target_temperature:
+        lambda device, value: device.write(SetTargetTemperature(float(value), device.state.unit)),
+    CommandType.set_timer: lambda device, value: device.write(SetTimer(int(value))),
+    CommandType.start_timer: lambda device, _: device.send_command(StartTimer()),
+    CommandType.stop_timer: lambda device, _: device.send_command(StopTimer()),
+    CommandType.clear_alarm: lambda device, _: device.send_command(ClearAlarm()),
+    CommandType.set_unit: lambda device, value: device.write(SetTemperatureUnit(TemperatureUnit(value))),
+}
+
+
+async def run_command(device: AnovaDevice, command: DeviceCommand) -> CommandResult:
+    """
+    Run a command on a device.
+    :return: The result of the command, or its error if it raised or the device refused it
+    """
+    try:
+        result = await COMMANDS[command.command](device, command.value)
+    except Exception as e:
+        logger.warning(f"Command {command.command} of {device} failed: {repr(e)}")
+        return CommandResult(id=command.id, error=repr(e))
+    if result is False:  # The device refused the command
+        return CommandResult(id=command.id, error="Command failed")
+    return CommandResult(id=command.id, result=result)
+
+
+async def run_batch(manager: AnovaManager, device_ids: Optional[Sequence[str]], commands: Sequence[DeviceCommand],
+                    concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> List[BatchDeviceResult]:
+    """
+    Run a list of commands on many devices.
+    The commands run in order on each device, and the devices are served concurrently, up to `concurrency` at once.
+    A failing command skips the remaining commands of its device, without affecting the other devices.
+    :param manager: The device manager
+    :param device_ids: The devices to run the commands on, or None for all the connected devices. A device listed
+                       twice is run once, as its commands must not run concurrently.
+    :param commands: The commands to run
+    :param concurrency: The maximum number of devices running commands at once
+    :return: The results of each device, in the order of `device_ids`
+    """
+    if device_ids is None:
+        device_ids = [device.id_card for device in manager.get_devices() if device.id_card]
+    device_ids = list(dict.fromkeys(device_ids))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_device(device_id: str) -> BatchDeviceResult:
+        device = manager.get_device(device_id)
+        if device is None:
+            return BatchDeviceResult(device_id=device_id, ok=False, error="Device not found")
+
+        results: List[CommandResult] = []
+        async with semaphore:
+            for command in commands:
+                result = await run_command(device, command)
+                results.append(result)
+                if result.error is not None:
+                    break
+        return BatchDeviceResult(device_id=device_id, ok=all(result.error is None for result in results),
+                                 results=results)
+
+    return await asyncio.gather(*(run_device(device_id) for device_id in device_ids))
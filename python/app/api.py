@@ -1,25 +1,35 @@
-import asyncio
-import random
 import socket
-import string
 from functools import cache
-from typing import List, Optional, AsyncIterator, Annotated
+from typing import Dict, List, Optional, AsyncIterator, Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Body, Security
+from fastapi import APIRouter, Depends, HTTPException, Body, Security, Header, Query, WebSocket, Response, status
 from fastapi.responses import StreamingResponse
 
-from anova_ble.client import AnovaBluetoothClient
+from anova_ble.client import AnovaBluetoothClient, ANOVA_DEVICE_NAME
+from anova_ble.discovery import DiscoveryService, DiscoveredDevice
+from anova_ble.pool import BLESessionPool, BLEPoolStats
+from anova_ble.provisioning import run_pipeline, generate_secret_key, ProvisioningJob, ProvisioningJobState, \
+    DeviceProvisioning
+from anova_wifi.bus import ALL_DEVICES
 from anova_wifi.device import DeviceState, AnovaDevice
 from anova_wifi.manager import AnovaManager
 from commands import SetWifiCredentials, SetServerInfo, GetIDCard, GetVersion, GetTemperatureUnit, GetSpeakerStatus, \
     SetSecretKey, SetTemperatureUnit, SetTargetTemperature, GetCurrentTemperature, SetTimer, StopTimer, ClearAlarm, \
-    GetTimerStatus, GetTargetTemperature, TemperatureUnit, StartTimer
-from .deps import get_device_manager, get_sse_manager, get_authenticated_device, get_settings, admin_auth
+    GetTimerStatus, GetTargetTemperature, TemperatureUnit, StartTimer, AnovaCommand
+from .actions import run_batch
+from .deps import get_device_manager, get_sse_manager, get_authenticated_device, get_settings, admin_auth, \
+    get_max_age, get_websocket_device, get_ble_pool, get_ble_client, \
+    get_ble_discovery, get_provisioning_jobs, get_provisioning_job
 from .models import DeviceInfo, SetTemperatureResponse, SetTimerResponse, UnitResponse, SpeakerStatusResponse, \
     TimerResponse, BLEDevice, OkResponse, GetTargetTemperatureResponse, TemperatureResponse, NewSecretResponse, \
-    BLEDeviceInfo, SSEEvent, SSEEventType, ServerInfo
+    BLEDeviceInfo, SSEEvent, ServerInfo, DeviceStats, SSEStats, SSEEventType, BatchRequest, BatchDeviceResult, \
+    ProvisionRequest, ProvisionResponse, BulkProvisionRequest
 from .settings import Settings
-from .sse import SSEManager, event_stream
+from .sse import SSEManager, SSEListener, SSEFilter, PING, render_event
+from .ws import WebSocketSession
+
+MAX_STATE_WAIT = 60000  # ms
+MAX_PROVISIONING_JOBS = 20  # The finished jobs kept, the oldest are forgotten
 
 router = APIRouter()
 
@@ -42,21 +52,80 @@ async def get_devices(
     ]
 
 
-@router.get("/devices/{device_id}/state")
-async def get_device_state(device: Annotated[AnovaDevice, Security(get_authenticated_device)]) -> DeviceState:
+@router.get("/devices/states")
+async def get_device_states(
+        manager: Annotated[AnovaManager, Depends(get_device_manager)],
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+) -> Dict[str, DeviceState]:
     """
-    Get the state of the device
+    Get the state of all the devices connected to the server, by device ID
     """
+    return {device.id_card: device.state for device in manager.get_devices() if device.id_card}
+
+
+@router.post("/devices/batch")
+async def run_device_batch(
+        batch: BatchRequest,
+        manager: Annotated[AnovaManager, Depends(get_device_manager)],
+        settings: Annotated[Settings, Depends(get_settings)],
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+) -> List[BatchDeviceResult]:
+    """
+    Run a list of commands on many devices concurrently.
+    The results are reported per device: a device failing doesn't abort the batch on the other devices.
+    """
+    concurrency = min(batch.concurrency or settings.batch_concurrency, settings.batch_concurrency)
+    return await run_batch(manager, batch.device_ids, batch.commands, concurrency)
+
+
+def state_etag(device: AnovaDevice) -> str:
+    return f'W/"{int(device.connected_at * 1000)}-{device.state.version}"'
+
+
+@router.get("/devices/{device_id}/state", response_model=DeviceState,
+            responses={304: {"description": "The state didn't change since the version of `If-None-Match`"}})
+async def get_device_state(
+        device: Annotated[AnovaDevice, Security(get_authenticated_device)],
+        response: Response,
+        if_none_match: Annotated[Optional[str], Header()] = None,
+        wait: Annotated[Optional[int], Query(
+            ge=0, le=MAX_STATE_WAIT, description="When the state is still the version of `If-None-Match`, wait up to "
+                                                 "`wait` ms for it to change before answering")
+        ] = None,
+) -> DeviceState | Response:
+    """
+    Get the state of the device.
+    The response has an ETag of the state version, and a request with that ETag in `If-None-Match` is answered with
+    304 Not Modified until the state changes. With `wait`, such a request is held until the state changes.
+    """
+    etag = state_etag(device)
+    if if_none_match is not None and any(tag.strip() in (etag, "*") for tag in if_none_match.split(",")):
+        if not wait or not await device.wait_for_change(device.state.version, wait / 1000):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        etag = state_etag(device)
+
+    response.headers["ETag"] = etag
     return device.state
 
 
+@router.get("/devices/{device_id}/stats")
+async def get_device_stats(device: Annotated[AnovaDevice, Security(get_authenticated_device)]) -> DeviceStats:
+    """
+    Get the event dispatch statistics of the device, and how long its commands waited for the device per priority
+    """
+    return DeviceStats(
+        events=device.event_stats,
+        command_wait={priority.name.lower(): stats for priority, stats in device.command_stats.items()},
+    )
+
+
 @router.post("/devices/{device_id}/target_temperature")
 async def set_temperature(temperature: Annotated[float, Body(embed=True)],
                           device: Annotated[AnovaDevice, Security(get_authenticated_device)]) -> SetTemperatureResponse:
     """
     Set the target temperature of the device
     """
-    resp = await device.send_command(SetTargetTemperature(temperature, device.state.unit))
+    resp = await device.write(SetTargetTemperature(temperature, device.state.unit))
     return SetTemperatureResponse(changed_to=resp)
 
 
@@ -87,7 +156,7 @@ async def set_timer(minutes: Annotated[int, Body(embed=True)],
     """
     Set the timer on the device
     """
-    return SetTimerResponse(message="Timer set successfully", minutes=await device.send_command(SetTimer(minutes)))
+    return SetTimerResponse(message="Timer set successfully", minutes=await device.write(SetTimer(minutes)))
 
 
 @router.post("/devices/{device_id}/timer/start")
@@ -125,36 +194,31 @@ async def clear_alarm(device: Annotated[AnovaDevice, Security(get_authenticated_
 
 @router.get("/devices/{device_id}/temperature")
 async def get_temperature(device: Annotated[AnovaDevice, Security(get_authenticated_device)],
-                          from_state: bool = True) -> TemperatureResponse:
+                          max_age: Annotated[Optional[float], Depends(get_max_age)]) -> TemperatureResponse:
     """
     Get the current temperature of the device
     """
-    if from_state:
-        return TemperatureResponse(temperature=device.state.current_temperature)
-
-    return TemperatureResponse(temperature=await device.send_command(GetCurrentTemperature()))
+    return TemperatureResponse(temperature=await device.read(GetCurrentTemperature(), max_age))
 
 
 @router.get("/devices/{device_id}/target_temperature")
-async def get_target_temperature(device: Annotated[AnovaDevice, Security(get_authenticated_device)],
-                                 from_state: bool = True) -> GetTargetTemperatureResponse:
+async def get_target_temperature(
+        device: Annotated[AnovaDevice, Security(get_authenticated_device)],
+        max_age: Annotated[Optional[float], Depends(get_max_age)],
+) -> GetTargetTemperatureResponse:
     """
     Get the target temperature of the device
     """
-    if from_state:
-        return GetTargetTemperatureResponse(temperature=device.state.target_temperature)
-    return GetTargetTemperatureResponse(temperature=await device.send_command(GetTargetTemperature()))
+    return GetTargetTemperatureResponse(temperature=await device.read(GetTargetTemperature(), max_age))
 
 
 @router.get("/devices/{device_id}/unit")
 async def get_unit(device: Annotated[AnovaDevice, Security(get_authenticated_device)],
-                   from_state: bool = True) -> UnitResponse:
+                   max_age: Annotated[Optional[float], Depends(get_max_age)]) -> UnitResponse:
     """
     Get the temperature unit of the device - either Celsius(c) or Fahrenheit(f)
     """
-    if from_state:
-        return UnitResponse(unit=device.state.unit)
-    return UnitResponse(unit=await device.send_command(GetTemperatureUnit()))
+    return UnitResponse(unit=await device.read(GetTemperatureUnit(), max_age))
 
 
 @router.post("/devices/{device_id}/unit")
@@ -163,58 +227,104 @@ async def set_unit(unit: Annotated[TemperatureUnit, Body(embed=True)],
     """
     Set the temperature unit of the device
     """
-    await device.send_command(SetTemperatureUnit(unit))
+    await device.write(SetTemperatureUnit(unit))
     return "ok"
 
 
 @router.get("/devices/{device_id}/timer")
 async def get_timer(device: Annotated[AnovaDevice, Security(get_authenticated_device)],
-                    from_state: bool = True) -> TimerResponse:
+                    max_age: Annotated[Optional[float], Depends(get_max_age)]) -> TimerResponse:
     """
     Get the timer value of the device
     """
-    if from_state:
-        return TimerResponse(timer=device.state.timer_value)
-
-    return TimerResponse(timer=await device.send_command(GetTimerStatus()))
+    timer_value, _ = await device.read(GetTimerStatus(), max_age)
+    return TimerResponse(timer=timer_value)
 
 
 @router.get("/devices/{device_id}/speaker_status")
 async def get_speaker_status(device: Annotated[AnovaDevice, Security(get_authenticated_device)],
-                             from_state: bool = True) -> SpeakerStatusResponse:
+                             max_age: Annotated[Optional[float], Depends(get_max_age)]) -> SpeakerStatusResponse:
     """
     Get the speaker status of the device
     """
-    return SpeakerStatusResponse(speaker_status=await device.send_command(GetSpeakerStatus()))
+    return SpeakerStatusResponse(speaker_status=await device.read(GetSpeakerStatus(), max_age))
+
+
+def stream_events(sse_manager: SSEManager, device_id: str, listener_id: str,
+                  listener: SSEListener) -> StreamingResponse:
+    async def event_generator() -> AsyncIterator[bytes]:
+        # The response stops iterating as soon as the client disconnects, so there is no need to poll for it
+        try:
+            while message := await listener.get():
+                yield message.data
+        finally:
+            await sse_manager.disconnect(device_id, listener_id)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
 @router.get("/devices/{device_id}/sse", response_model=SSEEvent, response_class=StreamingResponse)
 async def sse_endpoint(
-        request: Request,
         device: Annotated[AnovaDevice, Security(get_authenticated_device)],
         sse_manager: Annotated[SSEManager, Depends(get_sse_manager)],
+        last_event_id: Annotated[Optional[int], Header()] = None,
 ) -> StreamingResponse:
     """
     Server-Sent Events route that listens for events from a specific device.
+    A client reconnecting with the Last-Event-ID header receives the events it missed.
     """
-    listener_id, queue = await sse_manager.connect(device.id_card)  # type: ignore
+    listener_id, listener = await sse_manager.connect(device.id_card, last_event_id)  # type: ignore
+    return stream_events(sse_manager, device.id_card, listener_id, listener)  # type: ignore
 
-    async def event_generator() -> AsyncIterator[SSEEvent]:
-        try:
-            while True:
-                if await request.is_disconnected():
-                    break
-
-                try:
-                    async with asyncio.timeout(1.0):
-                        event = await queue.get()
-                        yield event
-                except asyncio.TimeoutError:
-                    yield SSEEvent(event_type=SSEEventType.ping)
-        finally:
-            await sse_manager.disconnect(device.id_card, listener_id)  # type: ignore
 
-    return StreamingResponse(event_stream(event_generator()), media_type="text/event-stream")
+@router.get("/sse", response_model=SSEEvent, response_class=StreamingResponse)
+async def fleet_sse_endpoint(
+        sse_manager: Annotated[SSEManager, Depends(get_sse_manager)],
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        device_id: Annotated[Optional[List[str]], Query()] = None,
+        event_type: Annotated[Optional[List[SSEEventType]], Query()] = None,
+        last_event_id: Annotated[Optional[int], Header()] = None,
+) -> StreamingResponse:
+    """
+    Server-Sent Events route that listens for the events of all the devices, on a single connection.
+    The events can be filtered by device and by type. A client reconnecting with the Last-Event-ID header receives
+    the events it missed, or a `reset` event if they are no longer available.
+    """
+    event_filter = SSEFilter(
+        device_ids=set(device_id) if device_id else None,
+        event_types=set(event_type) if event_type else None,
+    )
+    listener_id, listener = await sse_manager.connect(ALL_DEVICES, last_event_id, event_filter)
+    return stream_events(sse_manager, ALL_DEVICES, listener_id, listener)
+
+
+@router.websocket("/devices/{device_id}/ws")
+async def websocket_endpoint(
+        websocket: WebSocket,
+        device: Annotated[AnovaDevice, Depends(get_websocket_device)],
+        sse_manager: Annotated[SSEManager, Depends(get_sse_manager)],
+) -> None:
+    """
+    WebSocket route of a device: pushes its events as compact binary frames holding only the changed state fields,
+    and accepts commands as JSON text frames. See `app.codec` for the frame layout.
+    """
+    await websocket.accept()
+    listener_id, listener = await sse_manager.connect(device.id_card)  # type: ignore
+    try:
+        await WebSocketSession(websocket, device, listener).run()
+    finally:
+        await sse_manager.disconnect(device.id_card, listener_id)  # type: ignore
+
+
+@router.get("/sse/stats")
+async def get_sse_stats(
+        sse_manager: Annotated[SSEManager, Depends(get_sse_manager)],
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+) -> SSEStats:
+    """
+    Get the number of SSE clients, their buffered events and the events dropped for slow clients
+    """
+    return sse_manager.stats
 
 
 @cache
@@ -243,32 +353,47 @@ async def get_server_info(
 
 
 @router.get("/ble/device")
-async def get_ble_device(admin: Annotated[Optional[bool], Security(admin_auth)]) -> BLEDevice:
+async def get_ble_device(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        ble_pool: Annotated[BLESessionPool, Depends(get_ble_pool)],
+        discovery: Annotated[DiscoveryService, Depends(get_ble_discovery)],
+) -> BLEDevice:
     """
-    Get the BLE device
+    Get the BLE device: the connected one, or the closest one seen recently, without connecting to it.
     """
-    dev, adv = await AnovaBluetoothClient.scan()
-    if not dev:
-        raise HTTPException(status_code=404, detail="No BLE device found")
+    for client in ble_pool.clients:
+        return BLEDevice(address=client.address, name=client.name or ANOVA_DEVICE_NAME)
+    device, advertisement = await discovery.scan()
+    if device is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No BLE device found")
+    return BLEDevice(address=device.address,
+                     name=(advertisement and advertisement.local_name) or device.name or ANOVA_DEVICE_NAME)
 
-    return BLEDevice(address=dev.address, name=adv.local_name)  # type: ignore
+
+@router.get("/ble/devices")
+async def get_ble_devices(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        discovery: Annotated[DiscoveryService, Depends(get_ble_discovery)],
+) -> List[DiscoveredDevice]:
+    """
+    Get the BLE devices advertising nearby, the closest first, as last seen by the scans.
+    Enable `ble_background_scan` to keep this list fresh.
+    The connected devices don't advertise, see `/ble/device`.
+    """
+    return discovery.devices()
 
 
 @router.post("/ble/connect_wifi")
 async def ble_connect_wifi(
         ssid: Annotated[str, Body(embed=True)],
-        password: Annotated[str, Body(embed=True)]
+        password: Annotated[str, Body(embed=True)],
+        client: Annotated[AnovaBluetoothClient, Depends(get_ble_client)],
 ) -> OkResponse:
     """
     Connect the Anova Precision Cooker to a Wi-Fi network
     """
-    dev, adv = await AnovaBluetoothClient.scan()
-    if not dev:
-        raise HTTPException(status_code=404, detail="No BLE device found")
-
-    async with AnovaBluetoothClient(dev) as client:
-        await client.send_command(SetWifiCredentials(ssid, password))
-        return 'ok'
+    await client.send_command(SetWifiCredentials(ssid, password))
+    return 'ok'
 
 
 @router.post("/ble/config_wifi_server")
@@ -276,6 +401,7 @@ async def patch_ble_device(
         admin: Annotated[Optional[bool], Security(admin_auth)],
         manager: Annotated[AnovaManager, Depends(get_device_manager)],
         settings: Annotated[Settings, Depends(get_settings)],
+        client: Annotated[AnovaBluetoothClient, Depends(get_ble_client)],
         host: Annotated[Optional[str], Body(
             embed=True,
             description="The IP address of the server."
@@ -289,69 +415,193 @@ async def patch_ble_device(
     """
     Patch the Anova Precision Cooker to communicate with our server
     """
-    dev, adv = await AnovaBluetoothClient.scan()
-    if not dev:
-        raise HTTPException(status_code=404, detail="No BLE device found")
-
-    async with AnovaBluetoothClient(dev) as client:
-        host = host or settings.server_host or get_local_host()
-        port = port or manager.server.port
-        if not await client.send_command(SetServerInfo(host, port)):
-            raise ValueError("Failed to set server info")
-        return 'ok'
+    host = host or settings.server_host or get_local_host()
+    port = port or manager.server.port
+    if not await client.send_command(SetServerInfo(host, port)):
+        raise ValueError("Failed to set server info")
+    return 'ok'
 
 
 @router.post("/ble/restore_wifi_server")
-async def restore_ble_device(admin: Annotated[Optional[bool], Security(admin_auth)]) -> OkResponse:
+async def restore_ble_device(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        client: Annotated[AnovaBluetoothClient, Depends(get_ble_client)],
+) -> OkResponse:
     """
     Restore the Anova Precision Cooker to communicate with the Anova Cloud server
     """
-    dev, adv = await AnovaBluetoothClient.scan()
-    if not dev:
-        raise HTTPException(status_code=404, detail="No BLE device found")
-
-    async with AnovaBluetoothClient(dev) as client:
-        if not await client.send_command(SetServerInfo()):
-            raise ValueError("Failed to restore server info")
-        return 'ok'
+    if not await client.send_command(SetServerInfo()):
+        raise ValueError("Failed to restore server info")
+    return 'ok'
 
 
 @router.get("/ble/")
-async def ble_get_info(admin: Annotated[Optional[bool], Security(admin_auth)]) -> BLEDeviceInfo:
+async def ble_get_info(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        client: Annotated[AnovaBluetoothClient, Depends(get_ble_client)],
+) -> BLEDeviceInfo:
     """
     Get the number on the Anova Precision Cooker
     """
-    dev, adv = await AnovaBluetoothClient.scan()
-    if not dev:
-        raise HTTPException(status_code=404, detail="No BLE device found")
-
-    async with AnovaBluetoothClient(dev) as client:
-        id_card = await client.send_command(GetIDCard())
-        ver = await client.send_command(GetVersion())
-        unit = await client.send_command(GetTemperatureUnit())
-        speaker = await client.send_command(GetSpeakerStatus())
-        return BLEDeviceInfo(
-            ble_address=dev.address,
-            ble_name=adv.local_name,  # type: ignore
-            version=ver,
-            id_card=id_card,
-            temperature_unit=unit,
-            speaker_status=speaker
-        )
+    return await read_ble_info(client)
+
+
+async def read_ble_info(client: AnovaBluetoothClient) -> BLEDeviceInfo:
+    id_card, ver, unit, speaker = await client.send_commands(
+        [GetIDCard(), GetVersion(), GetTemperatureUnit(), GetSpeakerStatus()])
+    return BLEDeviceInfo(
+        ble_address=client.address,
+        ble_name=client.name or ANOVA_DEVICE_NAME,
+        version=ver,
+        id_card=id_card,
+        temperature_unit=unit,
+        speaker_status=speaker
+    )
 
 
 @router.post("/ble/secret_key")
-async def ble_new_secret_key(admin: Annotated[Optional[bool], Security(admin_auth)]) -> NewSecretResponse:
+async def ble_new_secret_key(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        client: Annotated[AnovaBluetoothClient, Depends(get_ble_client)],
+) -> NewSecretResponse:
     """
     Set a new secret key on the Anova Precision Cooker
     """
-    dev, adv = await AnovaBluetoothClient.scan()
-    if not dev:
-        raise HTTPException(status_code=404, detail="No BLE device found")
+    secret_key = generate_secret_key()
+    await client.send_command(SetSecretKey(secret_key))
+    return NewSecretResponse(secret_key=secret_key)
+
+
+@router.post("/ble/provision")
+async def ble_provision(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        manager: Annotated[AnovaManager, Depends(get_device_manager)],
+        settings: Annotated[Settings, Depends(get_settings)],
+        client: Annotated[AnovaBluetoothClient, Depends(get_ble_client)],
+        request: ProvisionRequest,
+) -> ProvisionResponse:
+    """
+    Provision the Anova Precision Cooker for our server in a single BLE session: read its info, then set a new
+    secret key, redirect it to the server and connect it to the Wi-Fi network.
+    Each step is verified before running the next one, and the report tells which step failed, if any.
+    """
+    commands = provisioning_commands(request, manager, settings)
+    device = await read_ble_info(client)
+    secret_key = generate_secret_key() if request.new_secret_key else None
+    if secret_key:
+        commands.insert(0, SetSecretKey(secret_key))
+
+    report = await run_pipeline(client, commands)
+    if not report.steps or report.steps[0].error is not None:
+        secret_key = None  # The cooker doesn't have it
+    return ProvisionResponse(device=device, secret_key=secret_key, report=report)
+
+
+def provisioning_commands(request: ProvisionRequest, manager: AnovaManager, settings: Settings) -> List[AnovaCommand]:
+    """
+    :return: The commands redirecting a cooker to the server and connecting it to the Wi-Fi network
+    """
+    if request.ssid is not None and request.password is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="A password is required")
+
+    commands: List[AnovaCommand] = [SetServerInfo(request.host or settings.server_host or get_local_host(),
+                                                  request.port or manager.server.port)]
+    if request.ssid is not None and request.password is not None:
+        commands.append(SetWifiCredentials(request.ssid, request.password))
+    return commands
+
+
+@router.post("/ble/provision/jobs")
+async def create_provisioning_job(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        manager: Annotated[AnovaManager, Depends(get_device_manager)],
+        settings: Annotated[Settings, Depends(get_settings)],
+        ble_pool: Annotated[BLESessionPool, Depends(get_ble_pool)],
+        discovery: Annotated[DiscoveryService, Depends(get_ble_discovery)],
+        jobs: Annotated[Dict[str, ProvisioningJob], Depends(get_provisioning_jobs)],
+        request: BulkProvisionRequest,
+) -> ProvisioningJobState:
+    """
+    Provision many Anova Precision Cookers at once, as `/ble/provision` does for one: all the cookers advertising
+    nearby, or the given ones. They are provisioned concurrently, up to the server's limit of BLE connections.
+    The job runs in the background: follow its progress with `/ble/provision/jobs/{job_id}/sse`.
+    """
+    commands = provisioning_commands(request, manager, settings)
+    max_connections = min(request.max_connections or settings.ble_max_connections, settings.ble_max_connections)
+    if request.addresses is not None:
+        job = ProvisioningJob(ble_pool, request.addresses, commands, request.new_secret_key, max_connections)
+    else:
+        job = ProvisioningJob(ble_pool, await discovery.scan_all(settings.ble_scan_window), commands,
+                              request.new_secret_key, max_connections)
+    if not job.state.devices:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No BLE device found")
+
+    for job_id in [job_id for job_id, old_job in jobs.items() if old_job.done][:-MAX_PROVISIONING_JOBS]:
+        del jobs[job_id]
+    jobs[job.id] = job
+    job.start()
+    return job.state
+
+
+@router.get("/ble/provision/jobs/{job_id}")
+async def get_provisioning_job_state(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        job: Annotated[ProvisioningJob, Depends(get_provisioning_job)],
+) -> ProvisioningJobState:
+    """
+    Get the progress of a provisioning job
+    """
+    return job.state
+
+
+@router.post("/ble/provision/jobs/{job_id}/retry")
+async def retry_provisioning_job(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        job: Annotated[ProvisioningJob, Depends(get_provisioning_job)],
+) -> ProvisioningJobState:
+    """
+    Provision again the cookers of a job that failed, leaving alone the ones that succeeded
+    """
+    if not job.done:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Job is still running")
+    job.start()
+    return job.state
+
+
+@router.get("/ble/provision/jobs/{job_id}/sse", response_model=DeviceProvisioning,
+            response_class=StreamingResponse)
+async def provisioning_job_sse(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        settings: Annotated[Settings, Depends(get_settings)],
+        job: Annotated[ProvisioningJob, Depends(get_provisioning_job)],
+        last_event_id: Annotated[Optional[int], Header()] = None,
+) -> StreamingResponse:
+    """
+    Server-Sent Events route following a provisioning job: an event each time a cooker starts or finishes, then
+    the state of the job once it's done. A client reconnecting with the Last-Event-ID header receives the updates
+    it missed.
+    """
+    async def event_generator() -> AsyncIterator[bytes]:
+        sent = 0 if last_event_id is None else last_event_id + 1
+        while True:
+            while sent < len(job.updates):
+                yield render_event(job.updates[sent], sent)
+                sent += 1
+            if job.done:
+                yield render_event(job.state)
+                return
+            if not await job.wait_for_update(sent, settings.sse_keepalive_interval):
+                yield PING.data
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
 
-    characters = string.ascii_lowercase + string.digits
-    secret_key = ''.join(random.choice(characters) for _ in range(10))
 
-    async with AnovaBluetoothClient(dev) as client:
-        await client.send_command(SetSecretKey(secret_key))
-        return NewSecretResponse(secret_key=secret_key)
+@router.get("/ble/stats")
+async def get_ble_stats(
+        admin: Annotated[Optional[bool], Security(admin_auth)],
+        ble_pool: Annotated[BLESessionPool, Depends(get_ble_pool)],
+) -> BLEPoolStats:
+    """
+    Get the number of open BLE sessions, and how many operations reused one rather than scanning and connecting
+    """
+    return ble_pool.stats
@@ -0,0 +1,96 @@
+"""
+Compact binary encoding of the SSE events, for the WebSocket clients.
+
+Every frame starts with a byte holding the index of its type in `FRAME_TYPES`, followed by:
+- `state_changed`: the state version (uint32), a byte with a bit per field of `STATE_FIELDS` present in the frame,
+  and the value of each present field in the order of `STATE_FIELDS`.
+- `event`: the index of the event type in `EVENT_TYPES`, and of its originator in `EVENT_ORIGINATORS` (a byte each).
+- Any other type has no body.
+All the values are little-endian.
+"""
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+from anova_wifi.device import DeviceStateDelta
+from anova_wifi.event import AnovaEvent, EventType, EventOriginator
+from commands import DeviceStatus, TemperatureUnit
+from .models import SSEEvent, SSEEventType
+
+FRAME_TYPES: Tuple[SSEEventType, ...] = tuple(SSEEventType)
+EVENT_TYPES: Tuple[EventType, ...] = tuple(EventType)
+EVENT_ORIGINATORS: Tuple[EventOriginator, ...] = tuple(EventOriginator)
+DEVICE_STATUSES: Tuple[DeviceStatus, ...] = tuple(DeviceStatus)
+TEMPERATURE_UNITS: Tuple[Optional[TemperatureUnit], ...] = (None, *TemperatureUnit)
+
+# Field -> struct format of its value. Temperatures are single precision, the device reports a single decimal.
+STATE_FIELDS: Dict[str, str] = {
+    "status": "B",  # Index in DEVICE_STATUSES
+    "current_temperature": "f",
+    "target_temperature": "f",
+    "timer_running": "?",
+    "timer_value": "I",  # Minutes
+    "unit": "B",  # Index in TEMPERATURE_UNITS
+    "speaker_status": "?",
+}
+
+_HEADER = struct.Struct("<B")
+_STATE_HEADER = struct.Struct("<BIB")
+_EVENT = struct.Struct("<BBB")
+_FIELDS = {field: struct.Struct(f"<{fmt}") for field, fmt in STATE_FIELDS.items()}
+
+
+def _encode_value(field: str, value: Any) -> Any:
+    if field == "status":
+        return DEVICE_STATUSES.index(value)
+    if field == "unit":
+        return TEMPERATURE_UNITS.index(value)
+    return value
+
+
+def encode_event(event: SSEEvent) -> bytes:
+    """
+    :return: The binary frame of an SSE event
+    """
+    frame_type = FRAME_TYPES.index(event.event_type)
+    payload = event.payload
+    if isinstance(payload, DeviceStateDelta):
+        changes = payload.changes
+        mask = 0
+        values = []
+        for bit, field in enumerate(STATE_FIELDS):
+            if field in changes:
+                mask |= 1 << bit
+                values.append(_FIELDS[field].pack(_encode_value(field, changes[field])))
+        return _STATE_HEADER.pack(frame_type, payload.version, mask) + b"".join(values)
+    if isinstance(payload, AnovaEvent):
+        return _EVENT.pack(frame_type, EVENT_TYPES.index(payload.type), EVENT_ORIGINATORS.index(payload.originator))
+    return _HEADER.pack(frame_type)
+
+
+def decode_event(frame: bytes) -> SSEEvent:
+    """
+    Decode a binary frame, as the clients do.
+    The frames don't hold the device ID, as a WebSocket streams the events of a single device.
+    """
+    event_type = FRAME_TYPES[frame[0]]
+    if event_type == SSEEventType.state_changed:
+        _, version, mask = _STATE_HEADER.unpack_from(frame)
+        offset = _STATE_HEADER.size
+        changes: Dict[str, Any] = {}
+        for bit, field in enumerate(STATE_FIELDS):
+            if mask & (1 << bit):
+                value, = _FIELDS[field].unpack_from(frame, offset)
+                offset += _FIELDS[field].size
+                if field == "status":
+                    value = DEVICE_STATUSES[value]
+                elif field == "unit":
+                    value = TEMPERATURE_UNITS[value]
+                changes[field] = value
+        return SSEEvent(event_type=event_type, payload=DeviceStateDelta(version=version, **changes))
+    if event_type == SSEEventType.event:
+        _, event_type_index, originator_index = _EVENT.unpack(frame)
+        return SSEEvent(event_type=event_type, payload=AnovaEvent(
+            type=EVENT_TYPES[event_type_index],
+            originator=EVENT_ORIGINATORS[originator_index],
+        ))
+    return SSEEvent(event_type=event_type)
@@ -1,34 +1,101 @@
 import ipaddress
 import secrets
-from typing import Annotated, Optional
+from contextlib import AsyncExitStack
+from typing import Annotated, Dict, Optional, AsyncIterator
 
-from fastapi import Request, Depends, Security, HTTPException, status
+from fastapi import Request, Depends, Security, HTTPException, Query, WebSocketException, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyQuery, HTTPBasic, HTTPBasicCredentials
 
+from anova_ble.client import AnovaBluetoothClient, AnovaConnectionError
+from anova_ble.discovery import DiscoveryService
+from anova_ble.pool import BLESessionPool
+from anova_ble.provisioning import ProvisioningJob
 from anova_wifi.device import AnovaDevice
 from anova_wifi.manager import AnovaManager
 from .settings import Settings
 from .sse import SSEManager
 
 
-async def get_device_manager(request: Request) -> AnovaManager:
+async def get_device_manager(request: HTTPConnection) -> AnovaManager:
     if request.app.state.anova_manager is None:
         raise RuntimeError("Manager not initialized. Please wait for application startup to complete.")
     return request.app.state.anova_manager
 
 
-def get_sse_manager(request: Request) -> SSEManager:
+def get_sse_manager(request: HTTPConnection) -> SSEManager:
     if request.app.state.sse_manager is None:
         raise RuntimeError("SSE Manager not initialized. Please wait for application startup to complete.")
     return request.app.state.sse_manager
 
 
+def get_ble_pool(request: Request) -> BLESessionPool:
+    if request.app.state.ble_pool is None:
+        raise RuntimeError("BLE pool not initialized. Please wait for application startup to complete.")
+    return request.app.state.ble_pool
+
+
+def get_ble_discovery(request: Request) -> DiscoveryService:
+    if request.app.state.ble_discovery is None:
+        raise RuntimeError("BLE discovery not initialized. Please wait for application startup to complete.")
+    return request.app.state.ble_discovery
+
+
+def get_provisioning_jobs(request: Request) -> Dict[str, ProvisioningJob]:
+    if request.app.state.provisioning_jobs is None:
+        raise RuntimeError("Provisioning jobs not initialized. Please wait for application startup to complete.")
+    return request.app.state.provisioning_jobs
+
+
+def get_provisioning_job(
+        job_id: str,
+        jobs: Annotated[Dict[str, ProvisioningJob], Depends(get_provisioning_jobs)],
+) -> ProvisioningJob:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+async def get_ble_client(
+        ble_pool: Annotated[BLESessionPool, Depends(get_ble_pool)]
+) -> AsyncIterator[AnovaBluetoothClient]:
+    """
+    A connected client of the nearby cooker, from the BLE session pool, held for the whole request.
+    """
+    async with AsyncExitStack() as stack:
+        try:
+            client = await stack.enter_async_context(ble_pool.session())
+        except AnovaConnectionError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No BLE device found")
+        yield client
+
+
 def get_settings(request: Request) -> Settings:
     if request.app.state.settings is None:
         raise RuntimeError("Settings not initialized. Please wait for application startup to complete.")
     return request.app.state.settings
 
 
+def get_max_age(
+        max_age: Annotated[Optional[int], Query(
+            ge=0, description="Accept a value reported by the device up to `max_age` ms ago. "
+                              "When omitted, the last known value is returned, and 0 always reads from the device.")
+        ] = None,
+        from_state: Annotated[Optional[bool], Query(
+            deprecated=True, description="Use `max_age` instead. `false` is the same as `max_age=0`.")
+        ] = None,
+) -> Optional[float]:
+    """
+    :return: The maximum age of a state value in seconds, or None for any age
+    """
+    if max_age is not None:
+        return max_age / 1000
+    if from_state is False:
+        return 0
+    return None
+
+
 # Define security schemes
 secret_key_query = APIKeyQuery(name="secret_key", auto_error=False, description="Secret key for device authentication")
 secret_key_bearer_scheme = HTTPBearer(auto_error=False, description="Bearer token for device authentication")
@@ -62,6 +129,22 @@ async def get_authenticated_device(
     return device
 
 
+async def get_websocket_device(
+        device_id: str,
+        secret_key: Annotated[str, Query(description="Secret key for device authentication")],
+        manager: Annotated[AnovaManager, Depends(get_device_manager)]
+) -> AnovaDevice:
+    """
+    The authentication of the WebSocket routes, which close the connection rather than answer with an HTTP error.
+    Browsers can't set headers on a WebSocket, so the secret key is a query parameter.
+    """
+    device = manager.get_device(device_id)
+    if not device or not device.secret_key or \
+            not secrets.compare_digest(device.secret_key.encode("utf8"), secret_key.encode("utf8")):
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Unauthorized")
+    return device
+
+
 async def admin_auth(
         request: Request,
         credentials: Annotated[HTTPBasicCredentials|None, Security(basic_auth_scheme)],
@@ -10,6 +10,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 
+from anova_ble.discovery import DiscoveryService
+from anova_ble.pool import BLESessionPool
 from anova_wifi.manager import AnovaManager
 from app.deps import get_settings
 from app.settings import Settings
@@ -26,14 +28,33 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, Never]:
         app.mount('/static', StaticFiles(directory=settings.frontend_dist_dir), name='static')
 
     # Startup
-    app.state.anova_manager = AnovaManager(host="0.0.0.0", port=settings.anova_server_port or 8080)
-    app.state.sse_manager = SSEManager(app.state.anova_manager)
+    app.state.anova_manager = AnovaManager(
+        host="0.0.0.0",
+        port=settings.anova_server_port or 8080,
+        event_queue_size=settings.event_queue_size,
+        overflow_policy=settings.event_overflow_policy,
+        max_concurrent_polls=settings.max_concurrent_polls,
+        subscriber_timeout=settings.subscriber_timeout,
+    )
+    app.state.sse_manager = SSEManager(app.state.anova_manager, settings.sse_max_events,
+                                       settings.sse_slow_consumer_timeout, settings.sse_keepalive_interval,
+                                       settings.sse_replay_size)
+    app.state.sse_manager.register_callbacks()
+    app.state.ble_discovery = DiscoveryService(settings.ble_discovery_ttl, settings.ble_scan_interval,
+                                              settings.ble_scan_window)
+    if settings.ble_background_scan:
+        app.state.ble_discovery.start()
+    app.state.ble_pool = BLESessionPool(settings.ble_idle_timeout, scanner=app.state.ble_discovery.scan)
+    app.state.provisioning_jobs = {}
     startup_task = asyncio.create_task(app.state.anova_manager.start())
     print("Starting up... Manager initialization started in background.")
 
     yield  # The FastAPI application runs here
 
     # Shutdown
+    await app.state.sse_manager.stop()
+    await app.state.ble_pool.close()
+    await app.state.ble_discovery.stop()
     if app.state.anova_manager:
         await app.state.anova_manager.stop()
     startup_task.cancel()
@@ -1,10 +1,13 @@
 import enum
-from typing import Optional, Union, Literal
+from typing import Any, Optional, Union, Literal, Dict, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from anova_wifi.device import DeviceState
+from anova_ble.provisioning import ProvisioningReport
+from anova_wifi.device import DeviceStateDelta
+from anova_wifi.dispatch import DispatchStats
 from anova_wifi.event import AnovaEvent
+from anova_wifi.priority import WaitStats
 from commands import TemperatureUnit
 
 OkResponse = Literal['ok']
@@ -21,12 +24,58 @@ class SSEEventType(enum.StrEnum):
     state_changed = "state_changed"
     event = "event"
     ping = "ping"
+    reset = "reset"  # Events were missed and can't be replayed, the state should be fetched again
 
 
 class SSEEvent(BaseModel):
     event_type: SSEEventType
     device_id: Optional[str] = None
-    payload: Optional[Union[AnovaEvent, DeviceState]] = None
+    payload: Optional[Union[AnovaEvent, DeviceStateDelta]] = None
+
+
+class SSEStats(BaseModel):
+    listeners: int
+    queued: int  # Events waiting to be sent, in all the listeners
+    max_depth: int  # Events waiting to be sent to the slowest listener
+    dropped: int
+    coalesced: int  # State changes merged into a state change that was still waiting to be sent
+    slow_disconnects: int
+
+
+class CommandType(enum.StrEnum):
+    start = "start"
+    stop = "stop"
+    set_target_temperature = "set_target_temperature"
+    set_timer = "set_timer"
+    start_timer = "start_timer"
+    stop_timer = "stop_timer"
+    clear_alarm = "clear_alarm"
+    set_unit = "set_unit"
+
+
+class DeviceCommand(BaseModel):
+    id: Optional[int] = None  # Echoed in the result, to match it with the command
+    command: CommandType
+    value: Any = None
+
+
+class CommandResult(BaseModel):
+    id: Optional[int] = None
+    result: Any = None
+    error: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    device_ids: Optional[List[str]] = None  # All the connected devices when omitted. Duplicates are run once.
+    commands: List[DeviceCommand]
+    concurrency: Optional[int] = Field(default=None, ge=1)  # Devices served at once, up to the server's limit
+
+
+class BatchDeviceResult(BaseModel):
+    device_id: str
+    ok: bool
+    results: List[CommandResult] = []  # The commands after a failed one are not run
+    error: Optional[str] = None
 
 
 class DeviceInfo(BaseModel):
@@ -34,6 +83,11 @@ class DeviceInfo(BaseModel):
     version: Optional[str]
 
 
+class DeviceStats(BaseModel):
+    events: DispatchStats
+    command_wait: Dict[str, WaitStats]  # Priority -> time the commands waited for the device
+
+
 class TemperatureResponse(BaseModel):
     temperature: float
 
@@ -79,3 +133,22 @@ class BLEDeviceInfo(BaseModel):
     id_card: str
     temperature_unit: TemperatureUnit
     speaker_status: bool
+
+
+class ProvisionRequest(BaseModel):
+    ssid: Optional[str] = None  # The Wi-Fi network is left unchanged when omitted
+    password: Optional[str] = None
+    host: Optional[str] = None  # The server's own host and port when omitted
+    port: Optional[int] = None
+    new_secret_key: bool = True
+
+
+class BulkProvisionRequest(ProvisionRequest):
+    addresses: Optional[List[str]] = None  # All the cookers advertising nearby when omitted
+    max_connections: Optional[int] = Field(default=None, ge=1)  # Cookers connected at once, up to the server's limit
+
+
+class ProvisionResponse(BaseModel):
+    device: BLEDeviceInfo
+    secret_key: Optional[str] = None  # The new secret key, if set
+    report: ProvisioningReport
@@ -2,6 +2,16 @@ from typing import Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from anova_ble.discovery import DEFAULT_TTL, DEFAULT_SCAN_INTERVAL, DEFAULT_SCAN_WINDOW
+from anova_ble.pool import DEFAULT_IDLE_TIMEOUT
+from anova_ble.provisioning import DEFAULT_MAX_CONNECTIONS
+from anova_wifi.bus import DEFAULT_SUBSCRIBER_TIMEOUT
+from anova_wifi.dispatch import OverflowPolicy, DEFAULT_EVENT_QUEUE_SIZE
+from anova_wifi.manager import MAX_CONCURRENT_POLLS
+from .actions import DEFAULT_BATCH_CONCURRENCY
+from .sse import DEFAULT_MAX_EVENTS, DEFAULT_SLOW_CONSUMER_TIMEOUT, DEFAULT_KEEPALIVE_INTERVAL, \
+    DEFAULT_REPLAY_SIZE
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -14,6 +24,21 @@ class Settings(BaseSettings):
 
     server_host: Optional[str] = None
     anova_server_port: Optional[int] = None
+    event_queue_size: int = DEFAULT_EVENT_QUEUE_SIZE
+    event_overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+    max_concurrent_polls: int = MAX_CONCURRENT_POLLS
+    subscriber_timeout: float = DEFAULT_SUBSCRIBER_TIMEOUT
+    sse_max_events: int = DEFAULT_MAX_EVENTS
+    sse_slow_consumer_timeout: float = DEFAULT_SLOW_CONSUMER_TIMEOUT
+    sse_keepalive_interval: float = DEFAULT_KEEPALIVE_INTERVAL
+    sse_replay_size: int = DEFAULT_REPLAY_SIZE
+    batch_concurrency: int = DEFAULT_BATCH_CONCURRENCY
+    ble_idle_timeout: float = DEFAULT_IDLE_TIMEOUT
+    ble_discovery_ttl: float = DEFAULT_TTL
+    ble_background_scan: bool = False
+    ble_scan_interval: float = DEFAULT_SCAN_INTERVAL
+    ble_scan_window: float = DEFAULT_SCAN_WINDOW
+    ble_max_connections: int = DEFAULT_MAX_CONNECTIONS
 
     frontend_dist_dir: Optional[str] = None
 
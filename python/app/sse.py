@@ -1,49 +1,352 @@
 import asyncio
+import itertools
+import time
 import uuid
-from typing import Dict, AsyncIterator
+from collections import deque
+from typing import Dict, Deque, Optional, Set, Iterator, Tuple
 
 from pydantic import BaseModel
 
-from anova_wifi.device import AnovaDevice, DeviceState
+from anova_wifi.bus import ALL_DEVICES
+from anova_wifi.device import AnovaDevice, DeviceStateDelta
 from anova_wifi.event import AnovaEvent
 from anova_wifi.manager import AnovaManager
-from .models import SSEEvent, SSEEventType
+from .codec import encode_event
+from .models import SSEEvent, SSEEventType, SSEStats
 
+DEFAULT_MAX_EVENTS = 100
+DEFAULT_SLOW_CONSUMER_TIMEOUT = 30.0  # seconds
+DEFAULT_KEEPALIVE_INTERVAL = 15.0  # seconds
+DEFAULT_REPLAY_SIZE = 1000
 
-async def event_stream(resp: AsyncIterator[BaseModel]) -> AsyncIterator[str]:
-    async for event in resp:
-        evnt = event.__class__.__name__
-        if hasattr(event, "event_type"):
-            evnt = event.event_type
-        yield f"event: {evnt}\ndata: {event.model_dump_json()}\n\n"
+
+def render_event(event: BaseModel, event_id: Optional[int] = None) -> bytes:
+    """
+    :return: The wire format of an SSE event
+    """
+    event_type = getattr(event, "event_type", event.__class__.__name__)
+    data = f"event: {event_type}\ndata: {event.model_dump_json()}\n\n"
+    return (data if event_id is None else f"id: {event_id}\n{data}").encode()
+
+
+class SSEMessage:
+    """
+    An SSE event along with its wire formats.
+    The same message is shared by all the clients it's broadcast to, so it's rendered once however many they are.
+    """
+    __slots__ = ("event", "id", "_data", "_binary")
+
+    def __init__(self, event: SSEEvent, event_id: Optional[int] = None):
+        self.event = event
+        self.id = event_id
+        self._data: Optional[bytes] = None
+        self._binary: Optional[bytes] = None
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data = render_event(self.event, self.id)
+        return self._data
+
+    @property
+    def binary(self) -> bytes:
+        """The binary frame sent to the WebSocket clients"""
+        if self._binary is None:
+            self._binary = encode_event(self.event)
+        return self._binary
+
+
+class SSEFilter(BaseModel):
+    """Selects the events sent to a fleet client. None matches everything."""
+    device_ids: Optional[Set[str]] = None
+    event_types: Optional[Set[SSEEventType]] = None
+
+    def matches(self, event: SSEEvent) -> bool:
+        return ((self.device_ids is None or event.device_id in self.device_ids) and
+                (self.event_types is None or event.event_type in self.event_types))
+
+
+PING = SSEMessage(SSEEvent(event_type=SSEEventType.ping))
+
+
+class SSEListener:
+    """
+    The bounded buffer of the events waiting to be sent to one SSE client.
+
+    The state changes of a device waiting in the buffer are coalesced into a single `state_changed` event, which holds
+    all the changed fields with their latest value. Other events are buffered up to `max_events`, dropping the oldest ones.
+    A client whose buffer stays full for `slow_consumer_timeout` seconds is disconnected.
+    `get` only wakes up when there is a message to send, so an idle client costs nothing until the keepalive pings it.
+    """
+
+    def __init__(self, max_events: int = DEFAULT_MAX_EVENTS,
+                 slow_consumer_timeout: float = DEFAULT_SLOW_CONSUMER_TIMEOUT,
+                 event_filter: Optional[SSEFilter] = None):
+        self.max_events = max_events
+        self.filter = event_filter
+        self.slow_consumer_timeout = slow_consumer_timeout
+        self.closed = False
+        self.dropped = 0
+        self.coalesced = 0
+        self._messages: Deque[SSEMessage] = deque()
+        self._states: Dict[Optional[str], SSEMessage] = {}  # Device ID -> its state_changed message in the buffer
+        self._full_since: Optional[float] = None
+        self._ready = asyncio.Event()
+        self.last_sent = time.monotonic()
+
+    @property
+    def depth(self) -> int:
+        return len(self._messages)
+
+    def put(self, message: SSEMessage) -> bool:
+        """
+        Buffer a message, without blocking.
+        :return: False if the client is too slow and was disconnected
+        """
+        if self.closed:
+            return False
+
+        is_state = message.event.event_type == SSEEventType.state_changed
+        if is_state and message.event.device_id in self._states:
+            self._coalesce_state(message)
+            return True
+
+        if self._buffered_events() >= self.max_events:
+            now = time.monotonic()
+            if self._full_since is None:
+                self._full_since = now
+            elif now - self._full_since >= self.slow_consumer_timeout:
+                self.close()
+                return False
+            self._drop_oldest()
+
+        self._messages.append(message)
+        if is_state:
+            self._states[message.event.device_id] = message
+        self._ready.set()
+        return True
+
+    async def get(self) -> Optional[SSEMessage]:
+        """
+        :return: The next message, or None when the listener was closed
+        """
+        while not self._messages and not self.closed:
+            self._ready.clear()
+            await self._ready.wait()
+        if self.closed:
+            return None
+
+        message = self._messages.popleft()
+        if self._states.get(message.event.device_id) is message:
+            del self._states[message.event.device_id]
+        if self._buffered_events() < self.max_events:
+            self._full_since = None
+        self.last_sent = time.monotonic()
+        return message
+
+    def ping(self) -> None:
+        """
+        Send a keepalive ping, unless messages are already waiting to be sent.
+        """
+        if not self._messages and not self.closed:
+            self._messages.append(PING)
+            self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._messages.clear()
+        self._states.clear()
+        self._ready.set()
+
+    def _buffered_events(self) -> int:
+        return len(self._messages) - len(self._states)
+
+    def _coalesce_state(self, message: SSEMessage) -> None:
+        event = message.event
+        buffered = self._states[event.device_id]
+        assert isinstance(buffered.event.payload, DeviceStateDelta) and isinstance(event.payload, DeviceStateDelta)
+        # The messages are shared by all the listeners, so the buffered one is replaced rather than updated.
+        # The merged message takes the ID of the latest one, as it holds all the changes up to it, and its place at
+        # the end of the buffer, so the IDs are sent in order and a client resuming from it misses nothing.
+        merged = SSEMessage(SSEEvent(
+            event_type=SSEEventType.state_changed,
+            device_id=event.device_id,
+            payload=DeviceStateDelta(version=event.payload.version,
+                                     **{**buffered.event.payload.changes, **event.payload.changes}),
+        ), message.id)
+        for i in range(len(self._messages) - 1, -1, -1):
+            if self._messages[i] is buffered:
+                del self._messages[i]
+                break
+        self._messages.append(merged)
+        self._states[event.device_id] = merged
+        self.coalesced += 1
+
+    def _drop_oldest(self) -> None:
+        for i, message in enumerate(self._messages):
+            if self._states.get(message.event.device_id) is not message:
+                del self._messages[i]
+                self.dropped += 1
+                return
+
+
+class _ReplayBuffer:
+    """
+    The last events of a stream, with the ID of the newest event that is no longer available.
+    """
+
+    def __init__(self, size: int, start_event_id: int):
+        self.events: Deque[Tuple[int, SSEMessage]] = deque()
+        self.size = size
+        self.evicted_event_id = start_event_id
+
+    def append(self, event_id: int, message: SSEMessage) -> None:
+        self.events.append((event_id, message))
+        if len(self.events) > self.size:
+            self.evicted_event_id = self.events.popleft()[0]
 
 
 class SSEManager:
-    _listeners: Dict[str, Dict[str, asyncio.Queue[SSEEvent]]] = {}
+    _listeners: Dict[str, Dict[str, SSEListener]]
+    _keepalive_task: Optional[asyncio.Task[None]]
 
-    def __init__(self, device_manager: AnovaManager):
+    def __init__(self, device_manager: AnovaManager, max_events: int = DEFAULT_MAX_EVENTS,
+                 slow_consumer_timeout: float = DEFAULT_SLOW_CONSUMER_TIMEOUT,
+                 keepalive_interval: float = DEFAULT_KEEPALIVE_INTERVAL, replay_size: int = DEFAULT_REPLAY_SIZE):
+        """
+        :param device_manager: The manager of the devices to stream the events of
+        :param max_events: The number of events buffered per client, besides the coalesced state changes
+        :param slow_consumer_timeout: The time a client's buffer may stay full before it is disconnected, in seconds
+        :param keepalive_interval: The time after which an idle client is pinged, in seconds
+        :param replay_size: The number of past events kept for the clients resuming their stream, for all the devices
+                            and for each device
+        """
         self.device_manager = device_manager
+        self.max_events = max_events
+        self.slow_consumer_timeout = slow_consumer_timeout
+        self.keepalive_interval = keepalive_interval
+        self._keepalive_task = None
+        self._listeners = {}  # Device ID (or ALL_DEVICES for the fleet clients) -> listener ID -> listener
+        # The event IDs start from the current time, so they keep increasing across restarts of the server, and a
+        # client resuming with an ID from before a restart can't be confused with a newer event.
+        self._event_ids = itertools.count(time.time_ns() // 1000)
+        self._last_event_id = next(self._event_ids)
+        self.replay_size = replay_size
+        # The fleet clients replay from the events of all the devices, the device clients from the events of their
+        # device, so a busy fleet doesn't evict the events a quiet device's client missed. The events of a device are
+        # dropped when it disconnects, so the devices that come and go don't pile up.
+        self._history = _ReplayBuffer(replay_size, self._last_event_id)
+        self._device_history: Dict[str, _ReplayBuffer] = {}
+        self._dropped = 0
+        self._coalesced = 0
+        self._slow_disconnects = 0
+
+    @property
+    def stats(self) -> SSEStats:
+        listeners = [listener for listeners in self._listeners.values() for listener in listeners.values()]
+        return SSEStats(
+            listeners=len(listeners),
+            queued=sum(listener.depth for listener in listeners),
+            max_depth=max((listener.depth for listener in listeners), default=0),
+            dropped=self._dropped + sum(listener.dropped for listener in listeners),
+            coalesced=self._coalesced + sum(listener.coalesced for listener in listeners),
+            slow_disconnects=self._slow_disconnects,
+        )
+
+    def start(self) -> None:
+        if not self._keepalive_task:
+            self._keepalive_task = asyncio.create_task(self._keepalive())
 
-    async def connect(self, device_id: str) -> tuple[str, asyncio.Queue[SSEEvent]]:
+    async def stop(self) -> None:
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        for device_listeners in self._listeners.values():
+            for listener in device_listeners.values():
+                listener.close()
+
+    async def _keepalive(self) -> None:
+        """
+        Ping all the idle clients from a single timer, rather than a timer per client.
+        A client is pinged within two intervals of its last message.
+        """
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            idle_since = time.monotonic() - self.keepalive_interval
+            for device_listeners in self._listeners.values():
+                for listener in device_listeners.values():
+                    if listener.last_sent <= idle_since:
+                        listener.ping()
+
+    async def connect(self, device_id: str, last_event_id: Optional[int] = None,
+                      event_filter: Optional[SSEFilter] = None) -> tuple[str, SSEListener]:
+        """
+        Add a client.
+        :param device_id: The device to stream the events of, or ALL_DEVICES for a fleet client
+        :param last_event_id: The ID of the last event the client received, to resume its stream. The events it
+                              missed are replayed, or a `reset` event is sent if they are no longer available.
+        :param event_filter: The events to send to a fleet client
+        :return: The listener ID, used to disconnect, and the listener
+        """
+        self.start()
         if device_id not in self._listeners:
             self._listeners[device_id] = {}
 
         listener_id = str(uuid.uuid4())
-        queue: asyncio.Queue[SSEEvent] = asyncio.Queue()
-        self._listeners[device_id][listener_id] = queue
-        return listener_id, queue
+        listener = SSEListener(self.max_events, self.slow_consumer_timeout, event_filter)
+        if last_event_id is not None:
+            self._replay(listener, device_id, last_event_id)
+        self._listeners[device_id][listener_id] = listener
+        return listener_id, listener
+
+    def _replay(self, listener: SSEListener, device_id: str, last_event_id: int) -> None:
+        if device_id == ALL_DEVICES:
+            history = self._history
+        elif device_id in self._device_history:
+            history = self._device_history[device_id]
+        else:
+            # The events of the device, if any, were dropped: only a client that is up to date can resume
+            history = _ReplayBuffer(self.replay_size, self._last_event_id)
+        if not history.evicted_event_id <= last_event_id <= self._last_event_id:
+            listener.put(SSEMessage(SSEEvent(event_type=SSEEventType.reset)))
+            return
+        for event_id, message in history.events:
+            if event_id > last_event_id and self._wants(device_id, listener, message.event):
+                listener.put(message)
 
     async def disconnect(self, device_id: str, listener_id: str) -> None:
         if device_id in self._listeners and listener_id in self._listeners[device_id]:
-            del self._listeners[device_id][listener_id]
+            listener = self._listeners[device_id].pop(listener_id)
+            listener.close()
+            self._dropped += listener.dropped
+            self._coalesced += listener.coalesced
             if not self._listeners[device_id]:
                 del self._listeners[device_id]
 
     async def broadcast(self, event: SSEEvent) -> None:
-        device_id = event.device_id
-        if device_id in self._listeners:
-            for queue in self._listeners[device_id].values():
-                await queue.put(event)
+        previous_event_id, self._last_event_id = self._last_event_id, next(self._event_ids)
+        message = SSEMessage(event, self._last_event_id)
+        self._history.append(self._last_event_id, message)
+        if event.device_id is not None:
+            if event.device_id not in self._device_history:
+                self._device_history[event.device_id] = _ReplayBuffer(self.replay_size, previous_event_id)
+            self._device_history[event.device_id].append(self._last_event_id, message)
+        for device_id, listener_id, listener in list(self._recipients(event)):
+            if not listener.put(message):
+                self._slow_disconnects += 1
+                await self.disconnect(device_id, listener_id)
+
+    def _recipients(self, event: SSEEvent) -> Iterator[Tuple[str, str, SSEListener]]:
+        for device_id in ((ALL_DEVICES,) if event.device_id is None else (event.device_id, ALL_DEVICES)):
+            for listener_id, listener in self._listeners.get(device_id, {}).items():
+                if self._wants(device_id, listener, event):
+                    yield device_id, listener_id, listener
+
+    @staticmethod
+    def _wants(device_id: str, listener: SSEListener, event: SSEEvent) -> bool:
+        if device_id != ALL_DEVICES:
+            return event.device_id == device_id
+        return listener.filter is None or listener.filter.matches(event)
 
     async def device_connected_callback(self, device: AnovaDevice) -> None:
         event = SSEEvent(
@@ -58,12 +361,13 @@ class SSEManager:
             event_type=SSEEventType.device_disconnected,
         )
         await self.broadcast(event)
+        self._device_history.pop(device_id, None)
 
-    async def device_state_change_callback(self, device_id: str, state: DeviceState) -> None:
+    async def device_state_change_callback(self, device_id: str, delta: DeviceStateDelta) -> None:
         event = SSEEvent(
             device_id=device_id,
             event_type=SSEEventType.state_changed,
-            payload=state
+            payload=delta
         )
         await self.broadcast(event)
 
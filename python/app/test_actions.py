@@ -0,0 +1,157 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, cast
+
+from anova_wifi.device import AnovaDevice
+from anova_wifi.manager import AnovaManager
+from commands import AnovaCommand
+from .actions import run_batch, run_command
+from .models import CommandType, DeviceCommand, CommandResult
+
+
+class FakeDevice:
+    """Stands for a connected device, recording the commands it runs."""
+
+    def __init__(self, id_card: str, log: List[str], delay: float = 0.0, fail: Optional[CommandType] = None,
+                 refuse: Optional[CommandType] = None):
+        self.id_card = id_card
+        self.log = log
+        self.delay = delay
+        self.fail = fail
+        self.refuse = refuse
+        self.state = SimpleNamespace(unit=None)
+        self.running = 0
+        self.max_running = 0
+
+    async def _run(self, command: CommandType) -> Any:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            self.log.append(f"{self.id_card}:{command}")
+            if command == self.fail:
+                raise ConnectionResetError("Connection closed")
+            return command != self.refuse
+        finally:
+            self.running -= 1
+
+    async def start_cooking(self) -> Any:
+        return await self._run(CommandType.start)
+
+    async def stop_cooking(self) -> Any:
+        return await self._run(CommandType.stop)
+
+    async def send_command(self, command: AnovaCommand) -> Any:
+        return await self._run(CommandType.clear_alarm)
+
+
+class FakeManager:
+    def __init__(self, devices: Sequence[FakeDevice]):
+        self.devices: Dict[str, FakeDevice] = {device.id_card: device for device in devices}
+
+    def get_devices(self) -> List[FakeDevice]:
+        return list(self.devices.values())
+
+    def get_device(self, device_id: str) -> Optional[FakeDevice]:
+        return self.devices.get(device_id)
+
+
+def as_manager(*devices: FakeDevice) -> AnovaManager:
+    return cast(AnovaManager, FakeManager(devices))
+
+
+COMMANDS = [DeviceCommand(id=1, command=CommandType.start), DeviceCommand(id=2, command=CommandType.clear_alarm),
+            DeviceCommand(id=3, command=CommandType.stop)]
+
+
+def test_run_command_reports_a_refusal_as_an_error() -> None:
+    async def run() -> None:
+        device = FakeDevice("a", [], refuse=CommandType.start)
+        result = await run_command(cast(AnovaDevice, device), DeviceCommand(id=1, command=CommandType.start))
+        assert result == CommandResult(id=1, error="Command failed")
+
+        result = await run_command(cast(AnovaDevice, device), DeviceCommand(id=2, command=CommandType.stop))
+        assert result == CommandResult(id=2, result=True)
+
+    asyncio.run(run())
+
+
+def test_batch_runs_the_commands_in_order_on_each_device() -> None:
+    async def run() -> None:
+        log: List[str] = []
+        devices = [FakeDevice("a", log, delay=0.01), FakeDevice("b", log, delay=0.003)]
+        results = await run_batch(as_manager(*devices), None, COMMANDS)
+
+        assert [result.device_id for result in results] == ["a", "b"]
+        assert all(result.ok for result in results)
+        assert [result.id for result in results[0].results] == [1, 2, 3]
+        for device in ("a", "b"):
+            assert [entry for entry in log if entry.startswith(device)] == [
+                f"{device}:start", f"{device}:clear_alarm", f"{device}:stop"]
+        assert all(device.max_running == 1 for device in devices)
+
+    asyncio.run(run())
+
+
+def test_failed_command_skips_the_rest_of_its_device() -> None:
+    async def run() -> None:
+        log: List[str] = []
+        manager = as_manager(FakeDevice("a", log, fail=CommandType.clear_alarm), FakeDevice("b", log))
+        failed, ok = await run_batch(manager, ["a", "b"], COMMANDS)
+
+        assert not failed.ok
+        assert [result.id for result in failed.results] == [1, 2]
+        assert failed.results[1].error is not None
+        assert "a:stop" not in log
+        assert ok.ok and len(ok.results) == 3
+
+    asyncio.run(run())
+
+
+def test_unknown_device_is_not_found() -> None:
+    async def run() -> None:
+        unknown, known = await run_batch(as_manager(FakeDevice("a", [])), ["unknown", "a"], COMMANDS)
+
+        assert not unknown.ok
+        assert unknown.error == "Device not found"
+        assert known.ok
+
+    asyncio.run(run())
+
+
+def test_concurrency_is_capped() -> None:
+    async def run() -> None:
+        running = 0
+        max_running = 0
+
+        class CountingDevice(FakeDevice):
+            async def _run(self, command: CommandType) -> Any:
+                nonlocal running, max_running
+                running += 1
+                max_running = max(max_running, running)
+                try:
+                    return await super()._run(command)
+                finally:
+                    running -= 1
+
+        log: List[str] = []
+        manager = as_manager(*(CountingDevice(f"{i}", log, delay=0.005) for i in range(10)))
+        results = await run_batch(manager, None, COMMANDS, concurrency=3)
+
+        assert all(result.ok for result in results)
+        assert max_running == 3
+
+    asyncio.run(run())
+
+
+def test_duplicate_devices_run_once() -> None:
+    async def run() -> None:
+        log: List[str] = []
+        device = FakeDevice("a", log, delay=0.005)
+        results = await run_batch(as_manager(device), ["a", "a"], COMMANDS)
+
+        assert [result.device_id for result in results] == ["a"]
+        assert len(log) == 3
+        assert device.max_running == 1
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import httpx
+from fastapi import FastAPI
+
+from anova_wifi.device import AnovaDevice
+from anova_wifi.event import AnovaEvent, EventType
+from anova_wifi.test_device import make_device, RESPONSES
+from .api import router
+from .deps import get_authenticated_device
+
+STATE_URL = "/api/devices/anova test/state"
+
+
+def run_with_client(test: Callable[[httpx.AsyncClient, AnovaDevice], Awaitable[None]]) -> None:
+    async def run() -> None:
+        device, _ = make_device(RESPONSES.__getitem__)
+        app = FastAPI()
+        app.include_router(router, prefix="/api")
+        app.dependency_overrides[get_authenticated_device] = lambda: device
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await test(client, device)
+        await device.close()
+
+    asyncio.run(run())
+
+
+def test_matching_etag_is_not_modified() -> None:
+    async def test(client: httpx.AsyncClient, device: AnovaDevice) -> None:
+        response = await client.get(STATE_URL)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        for if_none_match in (etag, f'W/"0-0", {etag}', "*"):
+            response = await client.get(STATE_URL, headers={"If-None-Match": if_none_match})
+            assert response.status_code == 304
+            assert response.headers["ETag"] == etag
+            assert response.content == b""
+
+        response = await client.get(STATE_URL, headers={"If-None-Match": 'W/"0-0"'})
+        assert response.status_code == 200
+
+    run_with_client(test)
+
+
+def test_wait_returns_on_change() -> None:
+    async def test(client: httpx.AsyncClient, device: AnovaDevice) -> None:
+        etag = (await client.get(STATE_URL)).headers["ETag"]
+
+        async def start_later() -> None:
+            await asyncio.sleep(0.05)
+            await device.handle_event(AnovaEvent(type=EventType.START))
+
+        task = asyncio.create_task(start_later())
+        start = time.monotonic()
+        response = await client.get(STATE_URL, params={"wait": 5000}, headers={"If-None-Match": etag})
+        await task
+
+        assert response.status_code == 200
+        assert time.monotonic() - start < 1
+        assert response.headers["ETag"] != etag
+        assert response.json()["status"] == "running"
+
+    run_with_client(test)
+
+
+def test_wait_times_out() -> None:
+    async def test(client: httpx.AsyncClient, device: AnovaDevice) -> None:
+        etag = (await client.get(STATE_URL)).headers["ETag"]
+        start = time.monotonic()
+        response = await client.get(STATE_URL, params={"wait": 50}, headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert time.monotonic() - start >= 0.05
+
+    run_with_client(test)
+
+
+def test_etag_changes_on_reconnect() -> None:
+    async def test(client: httpx.AsyncClient, device: AnovaDevice) -> None:
+        etag = (await client.get(STATE_URL)).headers["ETag"]
+
+        # The state versions of the new connection start over, so they could repeat the ETag of the old one
+        device.connected_at += 1
+        response = await client.get(STATE_URL, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    run_with_client(test)
@@ -0,0 +1,47 @@
+from typing import Any, Dict
+
+from anova_wifi.device import DeviceStateDelta
+from anova_wifi.event import AnovaEvent, EventType, EventOriginator
+from commands import DeviceStatus
+from .codec import encode_event, decode_event
+from .models import SSEEvent, SSEEventType
+
+
+def round_trip(event: SSEEvent) -> SSEEvent:
+    return decode_event(encode_event(event))
+
+
+def test_partial_state_round_trip() -> None:
+    changes: Dict[str, Any] = {"status": DeviceStatus.RUNNING, "target_temperature": 60.5, "timer_value": 90}
+    delta = DeviceStateDelta(version=7, **changes)
+    decoded = round_trip(SSEEvent(event_type=SSEEventType.state_changed, device_id="anova", payload=delta))
+
+    assert decoded.event_type == SSEEventType.state_changed
+    assert decoded.device_id is None  # A WebSocket streams a single device
+    assert isinstance(decoded.payload, DeviceStateDelta)
+    assert decoded.payload.version == 7
+    assert decoded.payload.changes == changes
+
+
+def test_unknown_unit_round_trip() -> None:
+    changes: Dict[str, Any] = {"unit": None}
+    delta = DeviceStateDelta(version=1, **changes)
+    decoded = round_trip(SSEEvent(event_type=SSEEventType.state_changed, payload=delta))
+
+    assert isinstance(decoded.payload, DeviceStateDelta)
+    assert decoded.payload.changes == changes
+
+
+def test_event_round_trip() -> None:
+    event = AnovaEvent(type=EventType.LOW_WATER, originator=EventOriginator.WIFI)
+    frame = encode_event(SSEEvent(event_type=SSEEventType.event, payload=event))
+
+    assert len(frame) == 3
+    assert decode_event(frame) == SSEEvent(event_type=SSEEventType.event, payload=event)
+
+
+def test_ping_round_trip() -> None:
+    frame = encode_event(SSEEvent(event_type=SSEEventType.ping))
+
+    assert len(frame) == 1
+    assert decode_event(frame) == SSEEvent(event_type=SSEEventType.ping)
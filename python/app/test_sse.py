@@ -0,0 +1,231 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+
+from anova_wifi.bus import ALL_DEVICES
+from anova_wifi.device import DeviceStateDelta
+from anova_wifi.event import AnovaEvent, EventType
+from anova_wifi.manager import AnovaManager
+from . import sse as sse_module
+from .models import SSEEvent, SSEEventType
+from .sse import SSEListener, SSEManager, SSEMessage, PING
+
+
+def state(device_id: str, version: int, **changes: Any) -> SSEEvent:
+    return SSEEvent(event_type=SSEEventType.state_changed, device_id=device_id,
+                    payload=DeviceStateDelta(version=version, **changes))
+
+
+def start_event(device_id: str) -> SSEEvent:
+    return SSEEvent(event_type=SSEEventType.event, device_id=device_id, payload=AnovaEvent(type=EventType.START))
+
+
+async def drain(listener: SSEListener) -> List[SSEMessage]:
+    messages = []
+    while listener.depth:
+        message = await listener.get()
+        assert message is not None
+        messages.append(message)
+    return messages
+
+
+def test_coalesced_state_is_sent_in_order() -> None:
+    async def run() -> None:
+        manager = SSEManager(AnovaManager())
+        _, listener = await manager.connect("a")
+        await manager.broadcast(state("a", 1, target_temperature=60.0))
+        await manager.broadcast(start_event("a"))
+        await manager.broadcast(state("a", 2, timer_value=30))
+
+        first, merged = await drain(listener)
+        assert first.event.event_type == SSEEventType.event
+        assert merged.event == state("a", 2, target_temperature=60.0, timer_value=30)
+        assert first.id is not None and merged.id is not None and first.id < merged.id
+
+        # Resuming from the last ID received misses nothing
+        _, resumed = await manager.connect("a", merged.id)
+        assert await drain(resumed) == []
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_resume_replays_the_missed_events_of_the_device() -> None:
+    async def run() -> None:
+        manager = SSEManager(AnovaManager())
+        await manager.broadcast(state("a", 1, timer_value=1))
+        last_event_id = manager._last_event_id
+        await manager.broadcast(state("b", 1, timer_value=1))
+        await manager.broadcast(start_event("a"))
+        await manager.broadcast(state("a", 2, timer_value=2))
+
+        _, listener = await manager.connect("a", last_event_id)
+        assert [message.event for message in await drain(listener)] == [start_event("a"), state("a", 2, timer_value=2)]
+
+        _, fleet = await manager.connect(ALL_DEVICES, last_event_id)
+        assert len(await drain(fleet)) == 3
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_busy_fleet_does_not_reset_a_quiet_device() -> None:
+    async def run() -> None:
+        manager = SSEManager(AnovaManager(), replay_size=2)
+        await manager.broadcast(start_event("quiet"))
+        last_event_id = manager._last_event_id
+        await manager.broadcast(state("quiet", 1, timer_value=1))
+        for version in range(10):
+            await manager.broadcast(state("busy", version, timer_value=version))
+
+        _, listener = await manager.connect("quiet", last_event_id)
+        assert [message.event for message in await drain(listener)] == [state("quiet", 1, timer_value=1)]
+
+        # The fleet clients replay from the events of all the devices, which no longer hold it
+        _, fleet = await manager.connect(ALL_DEVICES, last_event_id)
+        assert [message.event.event_type for message in await drain(fleet)] == [SSEEventType.reset]
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_resume_resets_once_the_events_are_gone() -> None:
+    async def run() -> None:
+        manager = SSEManager(AnovaManager(), replay_size=2)
+        await manager.broadcast(start_event("a"))
+        last_event_id = manager._last_event_id
+        for version in range(3):
+            await manager.broadcast(state("a", version, timer_value=version))
+
+        _, listener = await manager.connect("a", last_event_id)
+        assert [message.event.event_type for message in await drain(listener)] == [SSEEventType.reset]
+
+        # An ID from before a restart of the server
+        _, listener = await manager.connect("a", last_event_id - 10 ** 9)
+        assert [message.event.event_type for message in await drain(listener)] == [SSEEventType.reset]
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_events_of_a_disconnected_device_are_dropped() -> None:
+    async def run() -> None:
+        manager = SSEManager(AnovaManager())
+        await manager.broadcast(start_event("a"))
+        last_event_id = manager._last_event_id
+        await manager.device_disconnected_callback("a")
+        assert manager._device_history == {}
+
+        # The device comes back: the client missed its disconnection, which is gone
+        await manager.broadcast(state("a", 1, timer_value=1))
+        _, listener = await manager.connect("a", last_event_id)
+        assert [message.event.event_type for message in await drain(listener)] == [SSEEventType.reset]
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_full_listener_drops_the_oldest_events() -> None:
+    async def run() -> None:
+        listener = SSEListener(max_events=2)
+        for device_id in ("a", "b", "c"):
+            assert listener.put(SSEMessage(start_event(device_id)))
+
+        assert [message.event.device_id for message in await drain(listener)] == ["b", "c"]
+        assert listener.dropped == 1
+
+    asyncio.run(run())
+
+
+def test_listener_coalesces_the_state_changes_of_a_device() -> None:
+    async def run() -> None:
+        listener = SSEListener(max_events=1)
+        listener.put(SSEMessage(state("a", 1, target_temperature=60.0)))
+        listener.put(SSEMessage(state("b", 1, timer_value=5)))
+        listener.put(SSEMessage(state("a", 2, timer_value=30)))
+        listener.put(SSEMessage(start_event("a")))  # The states don't count towards max_events
+
+        assert [message.event for message in await drain(listener)] == [
+            state("b", 1, timer_value=5),
+            state("a", 2, target_temperature=60.0, timer_value=30),
+            start_event("a"),
+        ]
+        assert listener.coalesced == 1
+        assert listener.dropped == 0
+
+    asyncio.run(run())
+
+
+def test_slow_consumer_is_disconnected() -> None:
+    async def run() -> None:
+        manager = SSEManager(AnovaManager(), max_events=1, slow_consumer_timeout=0)
+        _, listener = await manager.connect("a")
+        await manager.broadcast(start_event("a"))
+        await manager.broadcast(start_event("a"))  # Full since now
+        assert not listener.closed
+
+        await manager.broadcast(start_event("a"))
+        assert listener.closed
+        assert await listener.get() is None
+        assert manager.stats.slow_disconnects == 1
+        assert manager.stats.listeners == 0
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_events_are_rendered_once_per_broadcast(monkeypatch: pytest.MonkeyPatch) -> None:
+    rendered = 0
+    render_event = sse_module.render_event
+
+    def counting_render_event(*args: Any) -> bytes:
+        nonlocal rendered
+        rendered += 1
+        return render_event(*args)
+
+    monkeypatch.setattr(sse_module, "render_event", counting_render_event)
+
+    async def run() -> None:
+        manager = SSEManager(AnovaManager())
+        listeners = [(await manager.connect("a"))[1] for _ in range(3)]
+        listeners.append((await manager.connect(ALL_DEVICES))[1])
+        await manager.broadcast(start_event("a"))
+
+        messages = [(await drain(listener))[0] for listener in listeners]
+        assert all(message is messages[0] for message in messages)
+        assert len({message.data for message in messages}) == 1
+        assert messages[0].data.startswith(f"id: {messages[0].id}\nevent: event\n".encode())
+        assert rendered == 1
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_listener_is_pinged_only_when_idle() -> None:
+    listener = SSEListener()
+    listener.ping()
+    listener.ping()
+    assert listener.depth == 1  # A single ping waits
+
+    busy = SSEListener()
+    busy.put(SSEMessage(start_event("a")))
+    busy.ping()
+    assert busy.depth == 1
+
+
+def test_keepalive_pings_the_idle_listeners() -> None:
+    async def run() -> None:
+        manager = SSEManager(AnovaManager(), keepalive_interval=0.05)
+        _, idle = await manager.connect("a")
+        _, active = await manager.connect("b")
+        for _ in range(12):  # Longer than two intervals
+            await asyncio.sleep(0.01)
+            await manager.broadcast(start_event("b"))
+            await drain(active)
+
+        assert await idle.get() is PING
+        assert manager.stats.queued == 0  # The active listener was never pinged
+        await manager.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Set
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from anova_wifi.device import AnovaDevice, DeviceStateDelta
+from .actions import run_command
+from .codec import STATE_FIELDS
+from .models import SSEEvent, SSEEventType, DeviceCommand, CommandResult
+from .sse import SSEListener, SSEMessage
+
+logger = logging.getLogger(__name__)
+
+
+class WebSocketSession:
+    """
+    A WebSocket client of a device.
+
+    The whole state of the device is sent first, then its events are pushed as binary frames (see `codec`), from an
+    SSE listener, so they are buffered, coalesced and kept alive like those of the SSE clients. The client sends
+    commands as JSON text frames, which run concurrently, and are answered with a `CommandResult` text frame holding
+    the ID of the command.
+    """
+
+    def __init__(self, websocket: WebSocket, device: AnovaDevice, listener: SSEListener):
+        self.websocket = websocket
+        self.device = device
+        self.listener = listener
+        self._send_lock = asyncio.Lock()
+        self._commands: Set[asyncio.Task[None]] = set()
+
+    async def run(self) -> None:
+        """
+        Serve the client until it disconnects, or is disconnected for being too slow.
+        """
+        sender = asyncio.create_task(self._send_events())
+        try:
+            async for text in self.websocket.iter_text():
+                task = asyncio.create_task(self._run_command(text))
+                self._commands.add(task)
+                task.add_done_callback(self._commands.discard)
+        finally:
+            sender.cancel()
+            for task in self._commands:
+                task.cancel()
+
+    async def _send_events(self) -> None:
+        # The listener was connected before the whole state is sent, so no change is missed in between.
+        # The client ignores the changes of the versions it already has.
+        state = SSEMessage(SSEEvent(
+            event_type=SSEEventType.state_changed,
+            device_id=self.device.id_card,
+            payload=DeviceStateDelta(version=self.device.state.version,
+                                     **self.device.state.model_dump(include=set(STATE_FIELDS))),
+        ))
+        try:
+            await self.websocket.send_bytes(state.binary)
+            while message := await self.listener.get():
+                async with self._send_lock:
+                    await self.websocket.send_bytes(message.binary)
+            await self.websocket.close()
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # The client is gone
+        except Exception:
+            # e.g. an event the codec can't encode: close the socket rather than leave the client without events
+            logger.exception(f"Failed to send the events of {self.device} to a WebSocket client")
+            try:
+                await self.websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+
+    async def _run_command(self, text: str) -> None:
+        try:
+            command = DeviceCommand.model_validate_json(text)
+        except ValidationError as e:
+            await self._send_result(CommandResult(error=str(e)))
+            return
+
+        await self._send_result(await run_command(self.device, command))
+
+    async def _send_result(self, result: CommandResult) -> None:
+        try:
+            async with self._send_lock:
+                await self.websocket.send_text(result.model_dump_json())
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # The client is gone
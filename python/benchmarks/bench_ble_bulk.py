@@ -0,0 +1,46 @@
+"""
+Time to provision a site of cookers over BLE, one at a time versus concurrently under a cap on connections.
+
+Every cooker gets a new secret key and the server info, through a provisioning job of `anova_ble.provisioning`.
+Runs against the fake bleak backend, with the timings of a real link.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_ble_bulk.py
+"""
+import asyncio
+import time
+
+from anova_ble.fake import FakeAnova, FakeBLEBackend
+from anova_ble.pool import BLESessionPool
+from anova_ble.provisioning import ProvisioningJob, ProvisioningStatus
+from commands import SetServerInfo
+
+COOKERS = 12
+CONNECT_DELAY = 1.5  # seconds
+GATT_DELAY = 0.03  # seconds per GATT round trip
+
+
+async def provision(max_connections: int) -> None:
+    anovas = [FakeAnova(f"00:00:00:00:00:{i:02x}", connect_delay=CONNECT_DELAY, gatt_delay=GATT_DELAY)
+              for i in range(COOKERS)]
+    backend = FakeBLEBackend(anovas)
+    pool = BLESessionPool(client_factory=backend.client_factory)
+    job = ProvisioningJob(pool, [anova.ble_device for anova in anovas], [SetServerInfo("192.168.1.10", 8080)],
+                          max_connections=max_connections)
+
+    start = time.perf_counter()
+    job.start()
+    state = await job.wait()
+    elapsed = time.perf_counter() - start
+    await pool.close()
+
+    succeeded = sum(device.status == ProvisioningStatus.SUCCEEDED for device in state.devices)
+    print(f"{max_connections:2d} connections: {elapsed:5.1f} s for {succeeded}/{COOKERS} cookers")
+
+
+async def main() -> None:
+    for max_connections in (1, 4, 8):
+        await provision(max_connections)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
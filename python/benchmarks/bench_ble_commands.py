@@ -0,0 +1,73 @@
+"""
+Latency of a BLE command, subscribing to the notifications around every command versus once per connection.
+
+Subscribing per command adds the `start_notify` and `stop_notify` GATT round trips to the write and the notified
+response. Runs against the fake bleak backend, with the timings of a real link.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_ble_commands.py
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.uuids import normalize_uuid_str
+
+from anova_ble.client import AnovaBluetoothClient, ANOVA_CHARACTERISTIC_UUID, COMMAND_DELIMITER, encode_command
+from anova_ble.fake import FakeAnova, FakeBLEBackend, FakeBleakClient
+from commands import AnovaCommand, GetIDCard, GetVersion, GetTemperatureUnit, GetSpeakerStatus, SetServerInfo
+
+GATT_DELAY = 0.03  # seconds per GATT round trip
+ROUNDS = 10
+
+COMMANDS: List[AnovaCommand] = [
+    GetIDCard(), GetVersion(), GetTemperatureUnit(), GetSpeakerStatus(), SetServerInfo("192.168.1.10", 8080),
+]
+
+
+async def send_subscribing(client: FakeBleakClient, command: AnovaCommand) -> str:
+    """A command as `AnovaBluetoothClient.send_command` used to send it"""
+    uuid = normalize_uuid_str(ANOVA_CHARACTERISTIC_UUID)
+    queue: asyncio.Queue[bytearray] = asyncio.Queue()
+
+    async def on_notification(sender: BleakGATTCharacteristic, data: bytearray) -> None:
+        await queue.put(data)
+
+    await client.start_notify(uuid, on_notification)
+    try:
+        for chunk in encode_command(command):
+            await client.write_gatt_char(uuid, chunk)
+        response = bytearray()
+        while COMMAND_DELIMITER.encode() not in response:
+            response.extend(await queue.get())
+        return response.decode().strip()
+    finally:
+        await client.stop_notify(uuid)
+
+
+async def measure(name: str, anova: FakeAnova, send: Callable[[AnovaCommand], Awaitable[object]]) -> None:
+    anova.gatt_operations = 0
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for command in COMMANDS:
+            await send(command)
+    commands = ROUNDS * len(COMMANDS)
+    elapsed = (time.perf_counter() - start) / commands
+    print(f"{name:>14}: {elapsed * 1000:6.1f} ms per command, {anova.gatt_operations / commands:.1f} GATT operations")
+
+
+async def main() -> None:
+    anova = FakeAnova(connect_delay=0, gatt_delay=GATT_DELAY)
+    backend = FakeBLEBackend([anova])
+
+    fake_client = backend.client_factory(anova.address)
+    await fake_client.connect()
+    await measure("per command", anova, lambda command: send_subscribing(fake_client, command))
+    await fake_client.disconnect()
+
+    async with AnovaBluetoothClient(anova.address, backend.client_factory) as client:
+        await measure("persistent", anova, client.send_command)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
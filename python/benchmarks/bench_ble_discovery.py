@@ -0,0 +1,49 @@
+"""
+Time to find a cooker over BLE: a scan for the whole window, a scan stopping at the first advertisement, and the
+discovery cache kept warm by the background scanner.
+Runs against the fake bleak backend, with cookers advertising every 100 ms as real ones do.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_ble_discovery.py
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+from anova_ble.client import AnovaBluetoothClient
+from anova_ble.discovery import DiscoveryService
+from anova_ble.fake import FakeAnova, FakeBLEBackend
+
+SCAN_TIMEOUT = 5.0  # seconds
+ADVERTISE_INTERVAL = 0.1  # seconds
+LOOKUPS = 5
+
+
+async def measure(name: str, backend: FakeBLEBackend,
+                  scan: Callable[[], Awaitable[Tuple[Optional[BLEDevice], Optional[AdvertisementData]]]]) -> None:
+    backend.scans = 0
+    start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        device, _ = await scan()
+        assert device is not None
+    elapsed = (time.perf_counter() - start) / LOOKUPS
+    print(f"{name:>12}: {elapsed * 1000:9.3f} ms per lookup, {backend.scans} scans for {LOOKUPS} lookups")
+
+
+async def main() -> None:
+    backend = FakeBLEBackend([FakeAnova(advertise_interval=ADVERTISE_INTERVAL)])
+
+    await measure("full window", backend, lambda: backend.scan(SCAN_TIMEOUT))
+    await measure("early exit", backend, lambda: AnovaBluetoothClient.scan(SCAN_TIMEOUT, backend.scanner_factory))
+
+    discovery = DiscoveryService(scan_window=SCAN_TIMEOUT, scanner_factory=backend.scanner_factory)
+    discovery.start()
+    await asyncio.sleep(1.0)  # The background scanner warms the cache
+    await measure("cached", backend, discovery.scan)
+    await discovery.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
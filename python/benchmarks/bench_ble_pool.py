@@ -0,0 +1,79 @@
+"""
+Provisioning time of a cooker over BLE, scanning and connecting per request versus the BLE session pool, versus
+the provisioning pipeline.
+
+Provisioning is three API requests: reading the device info, setting the server info and setting a secret key.
+Per request, each one scans for the whole scan window, connects, runs its commands and disconnects, as the BLE
+endpoints did before the pool. Pooled, the first request scans and connects, and the others reuse its connection.
+The pipeline is the single request of `POST /ble/provision`: a scan stopping at the first advertisement, one
+connection, the info commands pipelined, then the verified settings.
+Runs against the fake bleak backend, with the timings of a real link.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_ble_pool.py
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Callable, List
+
+from anova_ble.client import AnovaBluetoothClient
+from anova_ble.fake import FakeAnova, FakeBLEBackend
+from anova_ble.pool import BLESessionPool
+from anova_ble.provisioning import run_pipeline
+from commands import AnovaCommand, GetIDCard, GetVersion, GetTemperatureUnit, GetSpeakerStatus, SetServerInfo, \
+    SetSecretKey
+
+SCAN_TIMEOUT = 5.0  # seconds
+CONNECT_DELAY = 1.5  # seconds
+GATT_DELAY = 0.03  # seconds per GATT round trip
+
+REQUESTS: List[List[AnovaCommand]] = [
+    [GetIDCard(), GetVersion(), GetTemperatureUnit(), GetSpeakerStatus()],
+    [SetServerInfo("192.168.1.10", 8080)],
+    [SetSecretKey("abcdefghij")],
+]
+
+
+async def provision(session: Callable[[], AsyncContextManager[AnovaBluetoothClient]]) -> float:
+    start = time.perf_counter()
+    for commands in REQUESTS:
+        async with session() as client:
+            for command in commands:
+                await client.send_command(command)
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    anova = FakeAnova(connect_delay=CONNECT_DELAY, gatt_delay=GATT_DELAY)
+    backend = FakeBLEBackend([anova])
+
+    @asynccontextmanager
+    async def per_request_session() -> AsyncIterator[AnovaBluetoothClient]:
+        device, _ = await backend.scan(SCAN_TIMEOUT)
+        assert device is not None
+        async with AnovaBluetoothClient(device, backend.client_factory) as client:
+            yield client
+
+    per_request = await provision(per_request_session)
+    print(f"  per request: {per_request:5.1f} s, {backend.scans} scans, {anova.connects} connections")
+
+    backend.scans = anova.connects = 0
+    pool = BLESessionPool(client_factory=backend.client_factory, scanner=lambda: backend.scan(SCAN_TIMEOUT))
+    pooled = await provision(pool.session)
+    print(f"       pooled: {pooled:5.1f} s, {backend.scans} scans, {anova.connects} connections")
+    await pool.close()
+
+    backend.scans = anova.connects = 0
+    start = time.perf_counter()
+    device, _ = await AnovaBluetoothClient.scan(SCAN_TIMEOUT, backend.scanner_factory)
+    assert device is not None
+    async with AnovaBluetoothClient(device, backend.client_factory) as client:
+        await client.send_commands(REQUESTS[0])
+        report = await run_pipeline(client, [command for commands in REQUESTS[1:] for command in commands])
+        assert report.ok
+    pipeline = time.perf_counter() - start
+    print(f"     pipeline: {pipeline:5.1f} s, {backend.scans} scans, {anova.connects} connections")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark of the WiFi wire codec.
+
+Compares `anova_wifi.encoding.Encoder` against the original per-byte loop implementation, using the heartbeat
+traffic of a single device (6 requests + 6 responses).
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_encoding.py
+"""
+import timeit
+from typing import List, Type, Union
+
+from anova_wifi.encoding import Encoder
+
+HEARTBEAT = [
+    ("status", "running"),
+    ("read set temp", "57.5"),
+    ("read temp", "28.6"),
+    ("read unit", "c"),
+    ("read timer", "0 stopped"),
+    ("speaker status", "speaker is on"),
+]
+
+
+class LegacyEncoder:
+    """The per-byte implementation the table-driven codec replaced, kept as a baseline."""
+
+    @staticmethod
+    def encode(message: str) -> bytes:
+        if not message.endswith('\r'):
+            message += '\r'
+        message_bytes = message.encode('utf-8')
+        result = bytearray([ord('h'), len(message_bytes)])
+        checksum = 0
+        for i, byte in enumerate(message_bytes):
+            encoded_byte = Encoder.roll_shift(byte, (i + 1) % 7)
+            result.append(encoded_byte)
+            checksum += encoded_byte
+        result.append(checksum & 0xFF)
+        return bytes(result)
+
+    @staticmethod
+    def decode(data: bytes) -> str:
+        if data[-1:] == b'\x16':
+            data = data[:-1]
+        length = data[1]
+        payload = data[2:2 + length + 1]
+        chars: List[str] = []
+        calculated_checksum = 0
+        for i, byte in enumerate(payload[:-1]):
+            calculated_checksum += byte
+            chars.append(chr(Encoder.reverse_roll_shift(byte, (i + 1) % 7)))
+        if payload[-1] != calculated_checksum & 0xFF:
+            raise ValueError("Checksum mismatch")
+        return ''.join(chars).rstrip('\r')
+
+
+def run_heartbeat(encoder: Union[Type[Encoder], Type[LegacyEncoder]]) -> None:
+    for request, response in HEARTBEAT:
+        encoder.encode(request)
+        encoder.decode(encoded_responses[response])
+
+
+encoded_responses = {response: Encoder.encode(response) + b'\x16' for _, response in HEARTBEAT}
+
+
+def main(number: int = 20_000) -> None:
+    for request, response in HEARTBEAT:
+        assert Encoder.encode(request) == LegacyEncoder.encode(request)
+        assert Encoder.decode(encoded_responses[response]) == LegacyEncoder.decode(encoded_responses[response])
+
+    results = {}
+    for name, encoder in (("legacy", LegacyEncoder), ("table", Encoder)):
+        best = min(timeit.repeat(lambda: run_heartbeat(encoder), number=number, repeat=5))
+        results[name] = best
+        print(f"{name:>8}: {best / number * 1e6:8.2f} µs per heartbeat (12 frames)")
+
+    print(f" speedup: {results['legacy'] / results['table']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
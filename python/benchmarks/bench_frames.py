@@ -0,0 +1,77 @@
+"""
+Allocation benchmark of the heartbeat loop's command path.
+
+Compares building and writing the 6 heartbeat commands the way it was done before the frame cache (new command
+instances, `encode()` and `Encoder.encode` every time, then a separate write for the SYN terminator) with the
+cached singleton frames. Reports the objects created and writes issued per heartbeat, the peak memory allocated
+while building a heartbeat, and the time it takes.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_frames.py
+"""
+import timeit
+import tracemalloc
+from typing import Callable
+
+from anova_wifi.device import HEARTBEAT_COMMANDS
+from anova_wifi.encoding import Encoder
+from anova_wifi.framing import command_frame
+from commands import AnovaCommand
+
+ITERATIONS = 20_000
+HEARTBEAT_CLASSES = [type(command) for command in HEARTBEAT_COMMANDS]
+
+
+class Counters:
+    def __init__(self) -> None:
+        self.commands = 0
+        self.encodes = 0
+        self.writes = 0
+
+    def write(self, data: bytes) -> None:
+        self.writes += 1
+
+
+def legacy_heartbeat(counters: Counters) -> None:
+    for cls in HEARTBEAT_CLASSES:
+        command: AnovaCommand = object.__new__(cls)  # Commands used to be re-instantiated for every poll
+        counters.commands += 1
+        encoded = Encoder.encode(command.encode())
+        counters.encodes += 1
+        counters.write(encoded)
+        counters.write(b'\x16')
+
+
+def cached_heartbeat(counters: Counters) -> None:
+    counters.write(b''.join([command_frame(cls()) for cls in HEARTBEAT_CLASSES]))
+
+
+def peak_allocation(heartbeat: Callable[[Counters], None]) -> int:
+    counters = Counters()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    heartbeat(counters)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - baseline
+
+
+def run(name: str, heartbeat: Callable[[Counters], None]) -> None:
+    heartbeat(Counters())  # Warm up the caches
+
+    counters = Counters()
+    heartbeat(counters)
+    peak = peak_allocation(heartbeat)
+    best = min(timeit.repeat(lambda: heartbeat(Counters()), number=ITERATIONS, repeat=5))
+
+    print(f"{name:>8}: {counters.commands} new commands, {counters.encodes} codec calls, {counters.writes} writes, "
+          f"{peak} bytes peak, {best / ITERATIONS * 1e6:.2f} µs per heartbeat")
+
+
+def main() -> None:
+    run("legacy", legacy_heartbeat)
+    run("cached", cached_heartbeat)
+
+
+if __name__ == "__main__":
+    main()
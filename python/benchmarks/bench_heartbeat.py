@@ -0,0 +1,90 @@
+"""
+Heartbeat latency benchmark: pipelined batch versus one round trip per command.
+
+Measures the duration of a heartbeat (6 polls), and how long a user command issued in the middle of a heartbeat
+waits for its response.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_heartbeat.py
+"""
+import asyncio
+import statistics
+import time
+from typing import Callable, Coroutine, List
+
+from anova_wifi.connection import AnovaConnection
+from anova_wifi.device import AnovaDevice, HEARTBEAT_COMMANDS
+from anova_wifi.priority import CommandPriority
+from anova_wifi.server import AnovaServer
+from commands import GetDeviceStatus, GetTargetTemperature, GetCurrentTemperature, GetTemperatureUnit, \
+    GetTimerStatus, GetSpeakerStatus, StopDevice
+from benchmarks.simulator import SimulatedDevice
+
+HOST = "127.0.0.1"
+PORT = 18081
+RTT = 0.020  # seconds
+LATENCY = 0.001  # seconds of processing per command
+ROUNDS = 20
+
+
+async def serial_heartbeat(device: AnovaDevice) -> None:
+    for command in (GetDeviceStatus(), GetTargetTemperature(), GetCurrentTemperature(), GetTemperatureUnit(),
+                    GetTimerStatus(), GetSpeakerStatus()):
+        await device.send_command(command)
+
+
+async def pipelined_heartbeat(device: AnovaDevice) -> None:
+    await device.send_commands(HEARTBEAT_COMMANDS, CommandPriority.POLL)
+
+
+async def measure(device: AnovaDevice, heartbeat: Callable[[AnovaDevice], Coroutine[None, None, None]]) -> None:
+    durations: List[float] = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        await heartbeat(device)
+        durations.append(time.perf_counter() - start)
+
+    waits: List[float] = []
+    for _ in range(ROUNDS):
+        beat = asyncio.create_task(heartbeat(device))
+        await asyncio.sleep(RTT / 2)  # The user command arrives once the heartbeat is on the wire
+
+        start = time.perf_counter()
+        await device.send_command(StopDevice())
+        waits.append(time.perf_counter() - start)
+        await beat
+
+    print(f"  heartbeat: {statistics.median(durations) * 1000:7.1f} ms median")
+    print(f"  user command during heartbeat: {statistics.median(waits) * 1000:7.1f} ms median")
+
+
+async def main() -> None:
+    connected: asyncio.Queue[AnovaDevice] = asyncio.Queue()
+
+    async def on_connection(connection: AnovaConnection) -> None:
+        device = AnovaDevice(connection)
+        await device.perform_handshake()
+        await connected.put(device)
+
+    server = AnovaServer(HOST, PORT)
+    server.on_connection(on_connection)
+    server_task = asyncio.create_task(server.start())
+    await asyncio.sleep(0.1)
+
+    simulated = SimulatedDevice(latency=LATENCY, rtt=RTT)
+    await simulated.connect(HOST, PORT)
+    device = await connected.get()
+
+    print(f"RTT: {RTT * 1000:.0f} ms, processing: {LATENCY * 1000:.0f} ms per command")
+    print("serial:")
+    await measure(device, serial_heartbeat)
+    print("pipelined:")
+    await measure(device, pipelined_heartbeat)
+
+    await simulated.close()
+    await device.close()
+    server_task.cancel()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Multi-device command throughput benchmark.
+
+Connects a growing number of simulated devices to an `AnovaServer`, then keeps several commands in flight per
+device for a fixed duration. Since every connection is an independent command channel, the throughput should
+scale linearly with the number of devices.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_multi_device.py
+"""
+import asyncio
+import time
+from typing import List
+
+from anova_wifi.connection import AnovaConnection
+from anova_wifi.device import AnovaDevice
+from anova_wifi.server import AnovaServer
+from commands import GetCurrentTemperature
+from benchmarks.simulator import connect_devices
+
+HOST = "127.0.0.1"
+PORT = 18080
+LATENCY = 0.005  # seconds per command on the device side
+DURATION = 2.0  # seconds
+CLIENTS_PER_DEVICE = 4
+
+
+async def run(device_count: int) -> float:
+    devices: List[AnovaDevice] = []
+    connected = asyncio.Event()
+
+    async def on_connection(connection: AnovaConnection) -> None:
+        device = AnovaDevice(connection)
+        await device.perform_handshake()
+        devices.append(device)
+        if len(devices) == device_count:
+            connected.set()
+
+    server = AnovaServer(HOST, PORT)
+    server.on_connection(on_connection)
+    server_task = asyncio.create_task(server.start())
+    await asyncio.sleep(0.1)
+
+    simulated = await connect_devices(device_count, HOST, PORT, latency=LATENCY)
+    await connected.wait()
+
+    completed = 0
+    deadline = time.perf_counter() + DURATION
+
+    async def client(device: AnovaDevice) -> None:
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            await device.send_command(GetCurrentTemperature())
+            completed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(device) for device in devices for _ in range(CLIENTS_PER_DEVICE)))
+    elapsed = time.perf_counter() - start
+
+    for sim in simulated:
+        await sim.close()
+    for device in devices:
+        await device.close()
+    server_task.cancel()
+    await server.stop()
+
+    return completed / elapsed
+
+
+async def main() -> None:
+    print(f"device latency: {LATENCY * 1000:.0f} ms, {CLIENTS_PER_DEVICE} concurrent clients per device")
+    baseline = None
+    for device_count in (1, 2, 5, 10, 20, 50):
+        throughput = await run(device_count)
+        baseline = baseline or throughput
+        print(f"{device_count:>4} devices: {throughput:9.1f} commands/s  "
+              f"({throughput / baseline:5.1f}x single device)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""
+Wire traffic of the adaptive polling policy versus the fixed full heartbeat.
+
+Simulates an hour of polling for a device in each phase of a cook, and counts the commands sent. The fixed
+heartbeat sent all 6 polls every 3 seconds.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_polling.py
+"""
+from anova_wifi.device import DeviceState
+from anova_wifi.polling import PollingPolicy
+from commands import DeviceStatus
+
+DURATION = 3600  # seconds
+TICK = 0.5  # seconds
+FIXED_HEARTBEAT = 6 / 3  # commands per second
+
+PHASES = {
+    "idle": DeviceState(status=DeviceStatus.STOPPED, current_temperature=21.0, target_temperature=57.5),
+    "heating": DeviceState(status=DeviceStatus.RUNNING, current_temperature=35.0, target_temperature=57.5),
+    "cooking": DeviceState(status=DeviceStatus.RUNNING, current_temperature=57.4, target_temperature=57.5,
+                           timer_running=True, timer_value=120),
+}
+
+
+def simulate(state: DeviceState) -> int:
+    policy = PollingPolicy()
+    commands = 0
+    now = 0.0
+    while now < DURATION:
+        fields = policy.due(state, now)
+        commands += len(fields)
+        policy.mark_polled(fields, now)
+        now += TICK
+    return commands
+
+
+def main() -> None:
+    fixed = int(FIXED_HEARTBEAT * DURATION)
+    print(f"fixed heartbeat: {fixed} commands per device-hour")
+    for phase, state in PHASES.items():
+        commands = simulate(state)
+        print(f"{phase:>15}: {commands:5} commands per device-hour ({fixed / commands:4.1f}x less)")
+
+
+if __name__ == "__main__":
+    main()
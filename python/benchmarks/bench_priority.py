@@ -0,0 +1,88 @@
+"""
+User command latency under polling load, with and without command priorities.
+
+Keeps a growing number of heartbeats in flight on a single device, and measures the latency of start/stop commands
+issued meanwhile. Without priorities, the heartbeats are sent with the same priority as the user commands, so the
+connection serves them FIFO. With priorities, a user command waits for at most the batch on the wire.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_priority.py
+"""
+import asyncio
+import time
+from typing import List
+
+from anova_wifi.connection import AnovaConnection
+from anova_wifi.device import AnovaDevice, HEARTBEAT_COMMANDS
+from anova_wifi.priority import CommandPriority
+from anova_wifi.server import AnovaServer
+from commands import StartDevice, StopDevice
+from benchmarks.simulator import SimulatedDevice
+
+HOST = "127.0.0.1"
+PORT = 18082
+RTT = 0.020  # seconds
+LATENCY = 0.001  # seconds of processing per command
+ROUNDS = 50
+LOADS = (0, 1, 4, 16)  # Concurrent heartbeats
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+async def measure(device: AnovaDevice, load: int, priority: CommandPriority) -> List[float]:
+    done = asyncio.Event()
+
+    async def poll() -> None:
+        while not done.is_set():
+            await device.send_commands(HEARTBEAT_COMMANDS, priority)
+
+    pollers = [asyncio.create_task(poll()) for _ in range(load)]
+    await asyncio.sleep(RTT * 2)
+
+    latencies: List[float] = []
+    for i in range(ROUNDS):
+        start = time.perf_counter()
+        await device.send_command(StartDevice() if i % 2 else StopDevice())
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(RTT / 3)
+
+    done.set()
+    await asyncio.gather(*pollers)
+    return latencies
+
+
+async def main() -> None:
+    connected: asyncio.Queue[AnovaDevice] = asyncio.Queue()
+
+    async def on_connection(connection: AnovaConnection) -> None:
+        device = AnovaDevice(connection)
+        await device.perform_handshake()
+        await connected.put(device)
+
+    server = AnovaServer(HOST, PORT)
+    server.on_connection(on_connection)
+    server_task = asyncio.create_task(server.start())
+    await asyncio.sleep(0.1)
+
+    simulated = SimulatedDevice(latency=LATENCY, rtt=RTT)
+    await simulated.connect(HOST, PORT)
+    device = await connected.get()
+
+    print(f"RTT: {RTT * 1000:.0f} ms, processing: {LATENCY * 1000:.0f} ms per command")
+    for name, priority in (("FIFO", CommandPriority.INTERACTIVE), ("priority", CommandPriority.POLL)):
+        print(f"{name}:")
+        for load in LOADS:
+            latencies = await measure(device, load, priority)
+            print(f"  {load:2} heartbeats in flight: start/stop p50 {percentile(latencies, 0.5) * 1000:6.1f} ms, "
+                  f"p99 {percentile(latencies, 0.99) * 1000:6.1f} ms")
+
+    await simulated.close()
+    await device.close()
+    server_task.cancel()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+SSE fan-out benchmark: events per second broadcast to a growing number of clients of a single device.
+
+Every client is drained by its own task, like the streaming response of a browser tab. The per-client rendering
+serializes the event for every client, as before the messages were shared; the shared rendering is the current
+`SSEManager`.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_sse_fanout.py
+"""
+import asyncio
+import time
+from typing import List
+
+from anova_wifi.device import DeviceStateDelta
+from anova_wifi.manager import AnovaManager
+from app.models import SSEEvent, SSEEventType
+from app.sse import SSEManager, SSEListener, render_event
+from commands import DeviceStatus
+
+DEVICE_ID = "anova bench"
+LISTENERS = (1, 100, 1000)
+EVENTS = 200
+
+
+def make_event(version: int) -> SSEEvent:
+    return SSEEvent(
+        event_type=SSEEventType.event if version % 2 else SSEEventType.state_changed,
+        device_id=DEVICE_ID,
+        payload=DeviceStateDelta(version=version,
+                                 **{"status": DeviceStatus.RUNNING, "current_temperature": 50 + version / 10}),
+    )
+
+
+async def run(listener_count: int, shared: bool) -> float:
+    sse = SSEManager(AnovaManager(), max_events=EVENTS)
+    listeners: List[SSEListener] = [(await sse.connect(DEVICE_ID))[1] for _ in range(listener_count)]
+    sent = 0
+
+    async def drain(listener: SSEListener) -> None:
+        nonlocal sent
+        while message := await listener.get():
+            data = message.data if shared else render_event(message.event)
+            sent += len(data)
+
+    # Every other event is a state change, so the coalescing doesn't skip rendering
+    events = [make_event(i) for i in range(EVENTS)]
+    tasks = [asyncio.create_task(drain(listener)) for listener in listeners]
+    start = time.perf_counter()
+    for event in events:
+        await sse.broadcast(event)
+        await asyncio.sleep(0)  # Let the clients send the event
+    while any(listener.depth for listener in listeners):
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    for listener in listeners:
+        listener.close()
+    await asyncio.gather(*tasks)
+    return EVENTS / elapsed
+
+
+def main() -> None:
+    for listener_count in LISTENERS:
+        per_client = asyncio.run(run(listener_count, shared=False))
+        shared = asyncio.run(run(listener_count, shared=True))
+        print(f"{listener_count:5} listeners: per-client rendering {per_client:9.0f} events/s, "
+              f"shared rendering {shared:9.0f} events/s ({shared / per_client:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
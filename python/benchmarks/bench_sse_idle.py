@@ -0,0 +1,121 @@
+"""
+Idle SSE load test: CPU used by thousands of open, idle SSE streams.
+
+Serves an SSE route with uvicorn, opens 5k streams that receive no events, and measures the CPU time of the process
+over an idle window. The polling route is the previous stream loop: it checks for a disconnect on every iteration
+and wakes up every second to send a ping. The keepalive route is the current one: streams sleep until a message
+arrives, the shared keepalive timer pings the idle ones, and disconnects come from the ASGI disconnect message.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_sse_idle.py
+"""
+import asyncio
+import time
+from typing import AsyncIterator, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from anova_wifi.manager import AnovaManager
+from app.sse import SSEManager, PING
+
+HOST = "127.0.0.1"
+PORT = 18083
+CONNECTIONS = 5000
+IDLE_WINDOW = 10.0  # seconds
+DEVICE_ID = "anova bench"
+
+app = FastAPI()
+sse_manager = SSEManager(AnovaManager())
+
+
+@app.get("/polling")
+async def polling_stream(request: Request) -> StreamingResponse:
+    listener_id, listener = await sse_manager.connect(DEVICE_ID)
+
+    async def event_generator() -> AsyncIterator[bytes]:
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    async with asyncio.timeout(1.0):
+                        message = await listener.get()
+                except asyncio.TimeoutError:
+                    yield PING.data
+                    continue
+                if message is None:
+                    break
+                yield message.data
+        finally:
+            await sse_manager.disconnect(DEVICE_ID, listener_id)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@app.get("/keepalive")
+async def keepalive_stream() -> StreamingResponse:
+    listener_id, listener = await sse_manager.connect(DEVICE_ID)
+
+    async def event_generator() -> AsyncIterator[bytes]:
+        try:
+            while message := await listener.get():
+                yield message.data
+        finally:
+            await sse_manager.disconnect(DEVICE_ID, listener_id)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+async def open_stream(path: str, received: List[int]) -> asyncio.StreamWriter:
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+
+    async def drain() -> None:
+        while data := await reader.read(1024):
+            received[0] += len(data)
+
+    asyncio.create_task(drain())
+    return writer
+
+
+async def measure(path: str) -> None:
+    received = [0]
+    writers: List[asyncio.StreamWriter] = []
+    for _ in range(0, CONNECTIONS, 500):
+        writers += await asyncio.gather(*(open_stream(path, received) for _ in range(500)))
+    await asyncio.sleep(1)
+
+    received[0] = 0
+    cpu = time.process_time()
+    await asyncio.sleep(IDLE_WINDOW)
+    cpu = time.process_time() - cpu
+
+    print(f"{path:>10}: {len(writers)} idle streams, CPU {cpu / IDLE_WINDOW * 100:5.1f}% of a core, "
+          f"{received[0] / IDLE_WINDOW / 1024:7.1f} KiB/s of pings")
+
+    for writer in writers:
+        writer.close()
+    await asyncio.sleep(2)
+
+
+async def main() -> None:
+    config = uvicorn.Config(app, host=HOST, port=PORT, log_level="warning", backlog=CONNECTIONS)
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.1)
+
+    await measure("/polling")
+    await measure("/keepalive")
+    print(f"listeners left open: {sse_manager.stats.listeners}")
+
+    server.should_exit = True
+    await sse_manager.stop()
+    await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
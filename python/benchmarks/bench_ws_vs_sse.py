@@ -0,0 +1,158 @@
+"""
+WebSocket vs SSE: bytes on the wire and server CPU per state update, for many clients of a single device.
+
+Serves the SSE and the WebSocket streams with uvicorn, and opens the clients in a separate process, so the CPU time
+of the server process is the server's alone. Every update changes the current temperature, and every fifth one the
+timer too, like the polls of a running device. The full state mode sends the whole state on every update as JSON,
+as the SSE stream did before the state deltas.
+
+Usage: PYTHONPATH=src:. python benchmarks/bench_ws_vs_sse.py
+"""
+import asyncio
+import base64
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import Connection
+from typing import Any, AsyncIterator, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from anova_wifi.device import DeviceState, DeviceStateDelta
+from anova_wifi.manager import AnovaManager
+from app.models import SSEEvent, SSEEventType
+from app.sse import SSEManager
+from commands import DeviceStatus
+
+HOST = "127.0.0.1"
+PORT = 18084
+CLIENTS = 500
+UPDATES = 200
+UPDATE_INTERVAL = 0.01  # seconds
+DEVICE_ID = "anova bench"
+
+app = FastAPI()
+sse_manager = SSEManager(AnovaManager())
+
+
+@app.get("/sse")
+async def sse_stream() -> StreamingResponse:
+    listener_id, listener = await sse_manager.connect(DEVICE_ID)
+
+    async def event_generator() -> AsyncIterator[bytes]:
+        try:
+            while message := await listener.get():
+                yield message.data
+        finally:
+            await sse_manager.disconnect(DEVICE_ID, listener_id)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@app.websocket("/ws")
+async def ws_stream(websocket: WebSocket) -> None:
+    await websocket.accept()
+    listener_id, listener = await sse_manager.connect(DEVICE_ID)
+    try:
+        while message := await listener.get():
+            await websocket.send_bytes(message.binary)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await sse_manager.disconnect(DEVICE_ID, listener_id)
+
+
+async def open_stream(path: str, received: List[int]) -> asyncio.StreamWriter:
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    request = f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n"
+    if path == "/ws":
+        key = base64.b64encode(os.urandom(16)).decode()
+        request += f"Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n" \
+                   f"Sec-WebSocket-Version: 13\r\n"
+    writer.write(f"{request}\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+
+    async def drain() -> None:
+        while data := await reader.read(4096):
+            received[0] += len(data)
+
+    asyncio.create_task(drain())
+    return writer
+
+
+def run_clients(path: str, pipe: Connection) -> None:
+    async def run() -> None:
+        received = [0]
+        writers: List[asyncio.StreamWriter] = []
+        for _ in range(0, CLIENTS, 100):
+            writers += await asyncio.gather(*(open_stream(path, received) for _ in range(100)))
+        pipe.send("connected")
+        while not pipe.poll():
+            await asyncio.sleep(0.1)
+        pipe.send(received[0])
+
+    asyncio.run(run())
+
+
+def make_update(version: int, full_state: bool) -> SSEEvent:
+    changes: Dict[str, Any] = {"current_temperature": 50 + version / 10}
+    if version % 5 == 0:
+        changes["timer_value"] = 90 - version // 5
+    if full_state:
+        state = DeviceState(status=DeviceStatus.RUNNING, target_temperature=57.5, unit=None, timer_running=True,
+                            speaker_status=True, version=version, **changes)
+        changes = state.model_dump(exclude={"version"})
+    return SSEEvent(
+        event_type=SSEEventType.state_changed,
+        device_id=DEVICE_ID,
+        payload=DeviceStateDelta(version=version, **changes),
+    )
+
+
+async def measure(name: str, path: str, full_state: bool = False) -> None:
+    pipe, child_pipe = multiprocessing.Pipe()
+    clients = multiprocessing.get_context("spawn").Process(target=run_clients, args=(path, child_pipe))
+    clients.start()
+    while not pipe.poll():
+        await asyncio.sleep(0.1)
+    pipe.recv()
+
+    cpu = time.process_time()
+    for version in range(1, UPDATES + 1):
+        await sse_manager.broadcast(make_update(version, full_state))
+        await asyncio.sleep(UPDATE_INTERVAL)
+    await asyncio.sleep(1)  # Let the clients receive the last updates
+    cpu = time.process_time() - cpu
+
+    pipe.send("stop")
+    received = pipe.recv()
+    clients.terminate()
+    clients.join()
+    await asyncio.sleep(1)  # Let the server drop the connections
+
+    updates = UPDATES * CLIENTS
+    print(f"{name:>15}: {received / updates:6.1f} bytes/update, "
+          f"{cpu / updates * 1e6:5.1f} µs of server CPU/update ({CLIENTS} clients)")
+
+
+async def main() -> None:
+    config = uvicorn.Config(app, host=HOST, port=PORT, log_level="warning", backlog=CLIENTS)
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.1)
+
+    await measure("SSE full state", "/sse", full_state=True)
+    await measure("SSE delta", "/sse")
+    await measure("WebSocket delta", "/ws")
+
+    server.should_exit = True
+    await sse_manager.stop()
+    await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+A simulated Anova Precision Cooker speaking the WiFi protocol, for benchmarks.
+
+Like the real hardware, a simulated device answers one command at a time. `latency` is the firmware processing
+time of every command, and `rtt` the network round trip, paid once per received packet.
+"""
+import asyncio
+import random
+import string
+from typing import List, Optional
+
+from anova_wifi.encoding import Encoder
+from anova_wifi.framing import FrameDecoder
+
+
+class SimulatedDevice:
+    def __init__(self, device_id: Optional[str] = None, latency: float = 0.005, rtt: float = 0.0):
+        self.device_id = device_id or ''.join(random.choices(string.ascii_lowercase + string.digits, k=22))
+        self.secret_key = ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
+        self.latency = latency
+        self.rtt = rtt
+        self.commands_received = 0
+        self.bytes_received = 0
+        self.status = "stopped"
+        self.target_temperature = 57.5
+        self.current_temperature = 28.6
+        self.unit = "c"
+        self.timer = 0
+        self.timer_running = False
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def respond(self, command: str) -> str:
+        if command == "get id card":
+            return f"anova {self.device_id}"
+        if command == "version":
+            return "ver 2.7.7"
+        if command == "get number":
+            return self.secret_key
+        if command == "status":
+            return self.status
+        if command == "read set temp":
+            return f"{self.target_temperature:.1f}"
+        if command == "read temp":
+            return f"{self.current_temperature:.1f}"
+        if command == "read unit":
+            return self.unit
+        if command == "read timer":
+            return f"{self.timer} {'running' if self.timer_running else 'stopped'}"
+        if command == "speaker status":
+            return "speaker is on"
+        if command.startswith("set temp "):
+            self.target_temperature = float(command[9:])
+            return f"{self.target_temperature:.1f}"
+        if command.startswith("set timer "):
+            self.timer = int(command[10:])
+            return str(self.timer)
+        if command.startswith("set unit "):
+            self.unit = command[9:]
+            return self.unit
+        if command in ("start", "stop"):
+            self.status = "running" if command == "start" else "stopped"
+            return command
+        if command in ("start time", "stop time"):
+            self.timer_running = command == "start time"
+            return command
+        if command == "clear alarm":
+            return command
+        return "Invalid Command"
+
+    async def connect(self, host: str, port: int) -> None:
+        reader, self._writer = await asyncio.open_connection(host, port)
+        self._task = asyncio.create_task(self._serve(reader))
+
+    async def send_event(self, event: str) -> None:
+        assert self._writer is not None
+        self._writer.write(Encoder.encode(event) + b'\x16')
+        await self._writer.drain()
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+        if self._writer:
+            self._writer.close()
+
+    async def _serve(self, reader: asyncio.StreamReader) -> None:
+        assert self._writer is not None
+        decoder = FrameDecoder()
+        try:
+            while data := await reader.read(1024):
+                self.bytes_received += len(data)
+                if self.rtt:
+                    await asyncio.sleep(self.rtt)
+                for command in decoder.feed(data):
+                    self.commands_received += 1
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self._writer.write(Encoder.encode(self.respond(command)) + b'\x16')
+                await self._writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+
+
+async def connect_devices(count: int, host: str, port: int, latency: float = 0.005,
+                          rtt: float = 0.0) -> List[SimulatedDevice]:
+    devices = [SimulatedDevice(latency=latency, rtt=rtt) for _ in range(count)]
+    await asyncio.gather(*(device.connect(host, port) for device in devices))
+    return devices
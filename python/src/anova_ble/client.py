@@ -1,6 +1,9 @@
 import asyncio
+import logging
+from collections import deque
 from types import TracebackType
-from typing import Optional, Any, Union, Type, Tuple
+from typing import Optional, Any, Union, Type, Tuple, Protocol, Callable, Awaitable, Coroutine, Deque, List, \
+    Sequence
 
 from bleak import BleakClient, BleakScanner
 from bleak.backends.characteristic import BleakGATTCharacteristic
@@ -8,8 +11,11 @@ from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
 from bleak.uuids import normalize_uuid_str
 
+from anova_wifi.event import AnovaEvent
 from commands import AnovaCommand
 
+logger = logging.getLogger(__name__)
+
 # Bluetooth Constants
 ANOVA_SERVICE_UUID = "ffe0"
 ANOVA_CHARACTERISTIC_UUID = "ffe1"
@@ -33,35 +39,138 @@ class AnovaCommandError(AnovaException):
     """Raised when there's an error executing a command."""
 
 
+class GATTClient(Protocol):
+    """The part of `BleakClient` used by the Anova client"""
+
+    @property
+    def is_connected(self) -> bool: ...
+
+    async def connect(self) -> None: ...
+
+    async def disconnect(self) -> None: ...
+
+    async def start_notify(self, char_specifier: str,
+                           callback: Callable[[BleakGATTCharacteristic, bytearray], Awaitable[None]]) -> None: ...
+
+    async def stop_notify(self, char_specifier: str) -> None: ...
+
+    async def write_gatt_char(self, char_specifier: str, data: bytes) -> None: ...
+
+
+# Creates the GATT client of a device: BleakClient, or the fake backend of `anova_ble.fake` in tests and benchmarks
+ClientFactory = Callable[[Union[BLEDevice, str]], GATTClient]
+
+
+class Scanner(Protocol):
+    """The part of `BleakScanner` used to discover the cookers"""
+
+    async def start(self) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+# Creates a scanner calling its detection callback with every advertisement: BleakScanner, or the fake backend
+ScannerFactory = Callable[[Callable[[BLEDevice, AdvertisementData], None]], Scanner]
+
+
+def encode_command(command: Union[AnovaCommand, str]) -> List[bytes]:
+    """
+    :return: The writes of a command, as a single GATT write can't carry more than `MAX_COMMAND_LENGTH` bytes
+    """
+    data = f"{command}{COMMAND_DELIMITER}".encode()
+    return [data[i:i + MAX_COMMAND_LENGTH] for i in range(0, len(data), MAX_COMMAND_LENGTH)]
+
+
+def is_anova(advertisement: AdvertisementData) -> bool:
+    return advertisement.local_name == ANOVA_DEVICE_NAME and \
+        normalize_uuid_str(ANOVA_SERVICE_UUID) in advertisement.service_uuids
+
+
 class AnovaBluetoothClient:
-    _client: Optional[BleakClient]
+    _client: Optional[GATTClient]
     command_lock: asyncio.Lock
     device: Union[BLEDevice, str]
+    event_callback: Optional[Callable[[AnovaEvent], Coroutine[None, None, None]]]
+    _pending: Deque[asyncio.Future[str]]
 
-    def __init__(self, device: Union[BLEDevice, str]):
+    def __init__(self, device: Union[BLEDevice, str], client_factory: ClientFactory = BleakClient):
         self.command_lock = asyncio.Lock()
         self.device = device
+        self.client_factory = client_factory
+        self.event_callback = None
+        self._client = None
+
+        # The notifications are subscribed to once per connection. They carry the responses in chunks, reassembled
+        # in the buffer until the delimiter, and the events the cooker sends on its own. The cooker answers in order,
+        # so responses are matched to the pending commands FIFO.
+        self._buffer = bytearray()
+        self._pending = deque()
+        # The deadlines of the responses still due to the commands given up on, which are discarded as they arrive.
+        # The cooker may never answer, so a response not received within the timeout of its command is no longer
+        # expected.
+        self._abandoned: Deque[float] = deque()
+
+    @property
+    def address(self) -> str:
+        return self.device.address if isinstance(self.device, BLEDevice) else self.device
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.device.name if isinstance(self.device, BLEDevice) else None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None and self._client.is_connected
 
     @staticmethod
-    async def scan(timeout: float = 5.0) -> Tuple[Optional[BLEDevice], Optional[AdvertisementData]]:
+    async def scan(timeout: float = 5.0, scanner_factory: ScannerFactory = BleakScanner
+                   ) -> Tuple[Optional[BLEDevice], Optional[AdvertisementData]]:
         """
-        Scan for Anova devices.
+        Scan for an Anova device, until the first one advertises.
 
-        :param timeout: Scan duration in seconds
+        :param timeout: Maximum scan duration in seconds
+        :param scanner_factory: Creates the scanner, BleakScanner unless testing
         :return: BLEDevice and AdvertisementData of the device if found
         """
-        devs = await BleakScanner.discover(timeout=timeout, return_adv=True)
-        for dev, adv in devs.values():
-            if adv.local_name == ANOVA_DEVICE_NAME:
-                for uuid in adv.service_uuids:
-                    if normalize_uuid_str(ANOVA_SERVICE_UUID) == uuid:
-                        return dev, adv
+        found: asyncio.Future[Tuple[BLEDevice, AdvertisementData]] = asyncio.get_running_loop().create_future()
 
-        return None, None
+        def on_advertisement(device: BLEDevice, advertisement: AdvertisementData) -> None:
+            if not found.done() and is_anova(advertisement):
+                found.set_result((device, advertisement))
 
-    async def __aenter__(self) -> 'AnovaBluetoothClient':
-        self._client = BleakClient(self.device)
+        scanner = scanner_factory(on_advertisement)
+        await scanner.start()
+        try:
+            async with asyncio.timeout(timeout):
+                return await found
+        except TimeoutError:
+            return None, None
+        finally:
+            await scanner.stop()
+
+    def set_event_callback(self, callback: Callable[[AnovaEvent], Coroutine[None, None, None]]) -> None:
+        """
+        Receive the events the cooker notifies on its own, such as a button press or the low water alarm.
+        """
+        self.event_callback = callback
+
+    async def connect(self) -> None:
+        self._client = self.client_factory(self.device)
+        self._buffer.clear()
+        self._abandoned.clear()
         await self._client.connect()
+        await self._client.start_notify(normalize_uuid_str(ANOVA_CHARACTERISTIC_UUID), self._on_notification)
+
+    async def disconnect(self) -> None:
+        if self._client:
+            for future in self._pending:
+                if not future.done():
+                    future.set_exception(AnovaConnectionError("Disconnected from Anova device"))
+            await self._client.disconnect()
+            self._client = None
+
+    async def __aenter__(self) -> 'AnovaBluetoothClient':
+        await self.connect()
         return self
 
     async def __aexit__(
@@ -70,39 +179,109 @@ class AnovaBluetoothClient:
             exc_val: BaseException,
             exc_tb: TracebackType,
     ) -> None:
-        if self._client:
-            await self._client.disconnect()
-            self._client = None
+        await self.disconnect()
 
     async def send_command(self, command: Union[AnovaCommand, str], timeout: float = 5.0) -> Any:
-        if isinstance(command, AnovaCommand) and not command.supports_ble():
-            raise AnovaCommandError(f"Command '{command}' is not supported over BLE")
+        return (await self.send_commands([command], timeout))[0]
+
+    async def send_commands(self, commands: Sequence[Union[AnovaCommand, str]], timeout: float = 5.0) -> List[Any]:
+        """
+        Send several commands, and return their decoded responses in order.
+        The commands are all written before waiting for the responses, which are matched to the commands as they
+        arrive, so a batch of commands takes a single round trip rather than one per command.
+        :param commands: The commands, or raw command strings whose responses aren't decoded
+        :param timeout: Maximum time to wait for all the responses, in seconds
+        :raises AnovaCommandError: If a command isn't supported over BLE, or the responses timed out
+        """
+        for command in commands:
+            if isinstance(command, AnovaCommand) and not command.supports_ble():
+                raise AnovaCommandError(f"Command '{command}' is not supported over BLE")
         if not self._client:
             raise AnovaConnectionError("Not connected to Anova device")
 
         async with self.command_lock:
-            q: asyncio.Queue[bytearray] = asyncio.Queue()
-
-            async def response_callback(sender: BleakGATTCharacteristic, data: bytearray) -> None:
-                nonlocal q
-                await q.put(data)
-
+            loop = asyncio.get_running_loop()
+            futures: List[asyncio.Future[str]] = [loop.create_future() for _ in commands]
+            self._pending.extend(futures)
+            written = 0  # The commands written whole
+            partially_written = False
             try:
-                await self._client.start_notify(normalize_uuid_str(ANOVA_CHARACTERISTIC_UUID), response_callback)
-                await self._client.write_gatt_char(normalize_uuid_str(ANOVA_CHARACTERISTIC_UUID),
-                                                   f"{command}\r".encode())
-
-                response_buffer = bytearray()
                 async with asyncio.timeout(timeout):
-                    while chunk := await q.get():
-                        response_buffer.extend(chunk)
-                        if b'\r' in chunk:
-                            break
-
-                if isinstance(command, str):
-                    return response_buffer.decode().strip()
-                return command.decode(response_buffer.decode().strip())
+                    for command in commands:
+                        partially_written = True
+                        for chunk in encode_command(command):
+                            await self._client.write_gatt_char(normalize_uuid_str(ANOVA_CHARACTERISTIC_UUID), chunk)
+                        partially_written = False
+                        written += 1
+                    responses = [await future for future in futures]
             except asyncio.TimeoutError:
-                raise AnovaCommandError(f"Command '{command}' timed out")
+                unanswered = next((i for i, future in enumerate(futures) if not future.done()), 0)
+                if partially_written:
+                    # The cooker got the start of a command, which would garble the next one: start afresh
+                    try:
+                        await self.disconnect()
+                    except Exception as e:
+                        logger.debug(f"Disconnecting {self.address} failed: {repr(e)}")
+                raise AnovaCommandError(f"Command '{commands[unanswered]}' timed out")
             finally:
-                await self._client.stop_notify(normalize_uuid_str(ANOVA_CHARACTERISTIC_UUID))
+                # The responses of the commands written but not answered may still arrive: skip them, rather than
+                # matching them to the next commands
+                deadline = loop.time() + timeout
+                self._abandoned.extend(deadline for _ in range(len(self._pending) - (len(commands) - written)))
+                self._pending.clear()
+                for future in futures:
+                    if not future.done():
+                        future.cancel()
+                    elif not future.cancelled():
+                        future.exception()  # Mark the failures of the abandoned commands as retrieved
+
+        return [response if isinstance(command, str) else command.decode(response)
+                for command, response in zip(commands, responses)]
+
+    async def _on_notification(self, sender: BleakGATTCharacteristic, data: bytearray) -> None:
+        self._buffer.extend(data)
+        events: List[AnovaEvent] = []
+        while (end := self._buffer.find(COMMAND_DELIMITER.encode())) != -1:
+            message = self._buffer[:end].decode(errors="replace").strip()
+            del self._buffer[:end + 1]
+            if message:
+                event = self._handle_message(message)
+                if event is not None:
+                    events.append(event)
+
+        # The messages are routed before awaiting anything, so the notifications are handled in order
+        for event in events:
+            if self.event_callback:
+                await self.event_callback(event)
+            else:
+                logger.debug(f"Received event but no event callback set: {event.type}")
+
+    def _handle_message(self, message: str) -> Optional[AnovaEvent]:
+        if AnovaEvent.is_event(message):
+            try:
+                return AnovaEvent.parse_event(message)
+            except ValueError as e:
+                logger.warning(f"Failed to parse event, skipping: {e}")
+                return None
+
+        if self._discard_late_response():
+            logger.debug(f"Discarded the late response of an abandoned command: {message}")
+        elif self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_result(message)
+        else:
+            logger.warning(f"Received unexpected message while not waiting for a response: {message}")
+        return None
+
+    def _discard_late_response(self) -> bool:
+        """
+        :return: Whether a response is still due to an abandoned command, and was accounted for
+        """
+        now = asyncio.get_running_loop().time()
+        while self._abandoned and self._abandoned[0] <= now:
+            self._abandoned.popleft()
+        if not self._abandoned:
+            return False
+        self._abandoned.popleft()
+        return True
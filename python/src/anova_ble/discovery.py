@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from pydantic import BaseModel
+
+from .client import AnovaBluetoothClient, ScannerFactory, is_anova
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60.0  # seconds
+DEFAULT_SCAN_INTERVAL = 30.0  # seconds
+DEFAULT_SCAN_WINDOW = 5.0  # seconds
+MAX_SCAN_BACKOFF = 600.0  # seconds
+
+
+class DiscoveredDevice(BaseModel):
+    address: str
+    name: str
+    rssi: int
+    last_seen: float  # Unix time
+
+
+class _Sighting:
+    def __init__(self, device: BLEDevice, advertisement: AdvertisementData):
+        self.device = device
+        self.advertisement = advertisement
+        self.last_seen = time.time()
+
+
+class DiscoveryService:
+    """
+    The Anova devices advertising nearby.
+
+    The devices seen in the last `ttl` seconds are cached, and once started, a background scanner keeps the cache warm
+    by scanning for `scan_window` seconds every `scan_interval` seconds, so discovery queries are answered instantly.
+    The background scans back off exponentially while they fail, e.g. on a host without a Bluetooth adapter. When the
+    cache is empty, `scan` scans until the first device advertises, rather than for a whole window.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, scan_interval: float = DEFAULT_SCAN_INTERVAL,
+                 scan_window: float = DEFAULT_SCAN_WINDOW, scanner_factory: ScannerFactory = BleakScanner):
+        """
+        :param ttl: The time a device stays in the cache after it was last seen, in seconds
+        :param scan_interval: The time between the starts of the background scans, in seconds
+        :param scan_window: The duration of a scan, in seconds
+        :param scanner_factory: Creates the scanners, BleakScanner unless testing
+        """
+        self.ttl = ttl
+        self.scan_interval = scan_interval
+        self.scan_window = scan_window
+        self.scanner_factory = scanner_factory
+        self._sightings: Dict[str, _Sighting] = {}  # BLE address -> last sighting
+        self._scan_lock = asyncio.Lock()  # A single scan at a time, most adapters can't run two
+        self._scanning = False  # Whether the background scan is running
+        self._sighted = asyncio.Event()  # Set and replaced on every sighting, and at the end of the background scans
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._scan_periodically())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task  # Stops the scanner
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def devices(self) -> List[DiscoveredDevice]:
+        """
+        :return: The devices seen in the last `ttl` seconds, the closest first
+        """
+        return [
+            DiscoveredDevice(
+                address=sighting.device.address,
+                name=sighting.advertisement.local_name or sighting.device.name or "",
+                rssi=sighting.advertisement.rssi,
+                last_seen=sighting.last_seen,
+            )
+            for sighting in sorted(self._fresh_sightings(), key=lambda sighting: -sighting.advertisement.rssi)
+        ]
+
+    async def scan(self, timeout: float = DEFAULT_SCAN_WINDOW
+                   ) -> Tuple[Optional[BLEDevice], Optional[AdvertisementData]]:
+        """
+        Find a device: the closest one in the cache, or the first one to advertise.
+        :param timeout: Maximum scan duration in seconds, when the cache is empty
+        :return: BLEDevice and AdvertisementData of the device if found
+        """
+        if not self._fresh_sightings() and self._scanning:
+            # The background scan is running, and reports the devices as soon as they advertise
+            try:
+                async with asyncio.timeout(timeout):
+                    while not self._fresh_sightings() and self._scanning:
+                        await self._sighted.wait()
+            except TimeoutError:
+                return None, None
+
+        sightings = sorted(self._fresh_sightings(), key=lambda sighting: -sighting.advertisement.rssi)
+        if sightings:
+            return sightings[0].device, sightings[0].advertisement
+
+        async with self._scan_lock:
+            device, advertisement = await AnovaBluetoothClient.scan(timeout, self.scanner_factory)
+        if device is not None and advertisement is not None:
+            self._sightings[device.address] = _Sighting(device, advertisement)
+        return device, advertisement
+
+    async def scan_all(self, timeout: float = DEFAULT_SCAN_WINDOW) -> List[BLEDevice]:
+        """
+        Find all the devices: scan for a whole window, rather than until the first device advertises.
+        :param timeout: Scan duration in seconds
+        :return: The devices seen in the last `ttl` seconds, including the ones found by this scan, the closest first
+        """
+        async with self._scan_lock:
+            scanner = self.scanner_factory(self._on_advertisement)
+            await scanner.start()
+            try:
+                await asyncio.sleep(timeout)
+            finally:
+                await scanner.stop()
+        return [sighting.device
+                for sighting in sorted(self._fresh_sightings(), key=lambda sighting: -sighting.advertisement.rssi)]
+
+    def _fresh_sightings(self) -> List[_Sighting]:
+        expired_before = time.time() - self.ttl
+        for address in [address for address, sighting in self._sightings.items()
+                        if sighting.last_seen < expired_before]:
+            del self._sightings[address]
+        return list(self._sightings.values())
+
+    def _on_advertisement(self, device: BLEDevice, advertisement: AdvertisementData) -> None:
+        if is_anova(advertisement):
+            self._sightings[device.address] = _Sighting(device, advertisement)
+            self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        self._sighted.set()
+        self._sighted = asyncio.Event()
+
+    async def _scan_periodically(self) -> None:
+        failures = 0
+        while True:
+            delay = max(self.scan_interval - self.scan_window, 0)
+            try:
+                async with self._scan_lock:
+                    scanner = self.scanner_factory(self._on_advertisement)
+                    await scanner.start()
+                    self._scanning = True
+                    try:
+                        await asyncio.sleep(self.scan_window)
+                    finally:
+                        self._scanning = False
+                        self._wake_waiters()
+                        await scanner.stop()
+            except Exception as e:
+                # e.g. no Bluetooth adapter: the on-demand scans will report it. Log it once, and back off rather than
+                # retrying forever at the scan interval.
+                if failures == 0:
+                    logger.warning(f"Background BLE scan failed, backing off: {repr(e)}")
+                else:
+                    logger.debug(f"Background BLE scan failed again: {repr(e)}")
+                failures += 1
+                delay = min(self.scan_interval * 2 ** failures, MAX_SCAN_BACKOFF)
+            else:
+                if failures:
+                    logger.info("Background BLE scan recovered")
+                failures = 0
+            await asyncio.sleep(delay)
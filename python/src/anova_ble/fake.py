@@ -0,0 +1,218 @@
+"""
+A fake bleak backend: simulated cookers, reachable through a `BleakClient` look-alike, to test and benchmark the BLE
+code without radios.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union, cast
+
+from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from bleak.uuids import normalize_uuid_str
+
+from .client import ANOVA_DEVICE_NAME, ANOVA_SERVICE_UUID, COMMAND_DELIMITER, MAX_COMMAND_LENGTH
+
+NotifyCallback = Callable[[BleakGATTCharacteristic, bytearray], Awaitable[None]]
+
+
+class FakeAnova:
+    """
+    A simulated cooker, answering the BLE commands.
+    Every GATT operation takes `gatt_delay`, as a round trip over the BLE link, and responses are notified in
+    chunks of `MAX_COMMAND_LENGTH` bytes.
+    """
+
+    def __init__(self, address: str = "00:00:00:00:00:01", name: str = ANOVA_DEVICE_NAME, rssi: int = -60,
+                 connect_delay: float = 1.0, gatt_delay: float = 0.03, advertise_interval: float = 0.1):
+        self.address = address
+        self.name = name
+        self.rssi = rssi
+        self.advertise_interval = advertise_interval  # A connected cooker doesn't advertise
+        self.connect_delay = connect_delay
+        self.gatt_delay = gatt_delay
+        self.id_card = f"anova f56-{address.replace(':', '').lower()}"
+        self.unit = "c"
+        self.secret_key = ""
+        self.wifi: Optional[Tuple[str, str]] = None
+        self.server = ("pc.anovaculinary.com", 8080)
+        self.connects = 0  # GATT connections established
+        self.gatt_operations = 0
+        self.commands: List[str] = []
+        self.client: Optional["FakeBleakClient"] = None  # The connected client
+        self._notify_lock = asyncio.Lock()  # A message is notified whole, one after the other
+
+    @property
+    def ble_device(self) -> BLEDevice:
+        return BLEDevice(self.address, self.name, None)
+
+    @property
+    def advertisement(self) -> AdvertisementData:
+        return AdvertisementData(
+            local_name=self.name,
+            manufacturer_data={},
+            service_data={},
+            service_uuids=[normalize_uuid_str(ANOVA_SERVICE_UUID)],
+            tx_power=None,
+            rssi=self.rssi,
+            platform_data=(),
+        )
+
+    def respond(self, command: str) -> str:
+        self.commands.append(command)
+        if command == "get id card":
+            return self.id_card
+        if command == "version":
+            return "ver 2.7.7"
+        if command == "read unit":
+            return self.unit
+        if command == "speaker status":
+            return "speaker is on"
+        if command.startswith("set unit "):
+            self.unit = command[9:]
+            return self.unit
+        if command.startswith("set number "):
+            self.secret_key = command[11:]
+            return self.secret_key
+        if command.startswith("wifi para 2 "):
+            ssid, password = command[12:].split(" ")[:2]
+            self.wifi = (ssid, password)
+            return "ok"
+        if command.startswith("server para "):
+            host, port = command[12:].split(" ")
+            self.server = (host, int(port))
+            return f"{host} {port}"
+        return "Invalid Command"
+
+    async def notify(self, message: str) -> None:
+        """
+        Notify a message to the connected client, if it subscribed.
+        """
+        data = f"{message}{COMMAND_DELIMITER}".encode()
+        async with self._notify_lock:
+            for i in range(0, len(data), MAX_COMMAND_LENGTH):
+                await asyncio.sleep(self.gatt_delay / 2)
+                client = self.client
+                if client is None or client.notify_callback is None:
+                    return  # Nobody listens, the notification is lost
+                await client.notify_callback(client.characteristic, bytearray(data[i:i + MAX_COMMAND_LENGTH]))
+
+
+class FakeBleakClient:
+    """The subset of `BleakClient` used by `AnovaBluetoothClient`, connected to a `FakeAnova`"""
+
+    def __init__(self, anova: FakeAnova):
+        self.anova = anova
+        self.notify_callback: Optional[NotifyCallback] = None
+        self.characteristic = cast(BleakGATTCharacteristic, None)  # The notification callbacks don't use it
+        self._connected = False
+        self._buffer = ""
+        self._responses: List[asyncio.Task[None]] = []
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def connect(self) -> None:
+        if self.anova.client is not None:
+            raise ConnectionError(f"{self.anova.address} is already connected")
+        await asyncio.sleep(self.anova.connect_delay)
+        self.anova.client = self
+        self.anova.connects += 1
+        self._connected = True
+
+    async def disconnect(self) -> None:
+        await self._gatt_operation()
+        self.drop()
+
+    def drop(self) -> None:
+        """Lose the connection, as when the cooker goes out of range"""
+        if self.anova.client is self:
+            self.anova.client = None
+        self._connected = False
+        self.notify_callback = None
+        for task in self._responses:
+            task.cancel()
+
+    async def start_notify(self, char_specifier: str, callback: NotifyCallback) -> None:
+        await self._gatt_operation()
+        self.notify_callback = callback
+
+    async def stop_notify(self, char_specifier: str) -> None:
+        await self._gatt_operation()
+        self.notify_callback = None
+
+    async def write_gatt_char(self, char_specifier: str, data: bytes) -> None:
+        if len(data) > MAX_COMMAND_LENGTH:
+            raise ValueError(f"Write of {len(data)} bytes exceeds the {MAX_COMMAND_LENGTH} bytes of the characteristic")
+        await self._gatt_operation()
+        self._buffer += bytes(data).decode()
+        while COMMAND_DELIMITER in self._buffer:
+            command, self._buffer = self._buffer.split(COMMAND_DELIMITER, 1)
+            task = asyncio.create_task(self.anova.notify(self.anova.respond(command.strip())))
+            self._responses.append(task)
+            task.add_done_callback(self._responses.remove)
+
+    async def _gatt_operation(self) -> None:
+        if not self._connected:
+            raise ConnectionError("Not connected")
+        await asyncio.sleep(self.anova.gatt_delay)
+        self.anova.gatt_operations += 1
+
+
+class FakeBleakScanner:
+    """The subset of `BleakScanner` used to discover the cookers, receiving the advertisements of `FakeAnova`s"""
+
+    def __init__(self, anovas: Sequence[FakeAnova], detection_callback: Callable[[BLEDevice, AdvertisementData], None]):
+        self.anovas = anovas
+        self.detection_callback = detection_callback
+        self._tasks: List[asyncio.Task[None]] = []
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._advertise(anova)) for anova in self.anovas]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def _advertise(self, anova: FakeAnova) -> None:
+        while True:
+            await asyncio.sleep(anova.advertise_interval)
+            if anova.client is None:
+                self.detection_callback(anova.ble_device, anova.advertisement)
+
+
+class FakeBLEBackend:
+    """
+    Simulated cookers, along with the client factory and the scanner to reach them.
+    """
+
+    def __init__(self, anovas: Sequence[FakeAnova]):
+        self.anovas: Dict[str, FakeAnova] = {anova.address: anova for anova in anovas}
+        self.scans = 0
+
+    def client_factory(self, device: Union[BLEDevice, str]) -> FakeBleakClient:
+        address = device.address if isinstance(device, BLEDevice) else device
+        return FakeBleakClient(self.anovas[address])
+
+    def scanner_factory(self, detection_callback: Callable[[BLEDevice, AdvertisementData], None]) -> FakeBleakScanner:
+        self.scans += 1
+        return FakeBleakScanner(list(self.anovas.values()), detection_callback)
+
+    async def scan(self, timeout: float = 5.0) -> Tuple[Optional[BLEDevice], Optional[AdvertisementData]]:
+        """
+        Scan like `BleakScanner.discover`, which waits for the whole timeout, as the BLE endpoints used to.
+        """
+        self.scans += 1
+        await asyncio.sleep(timeout)
+        for anova in self.anovas.values():
+            return anova.ble_device, anova.advertisement
+        return None, None
+
+    def drop(self, address: str) -> None:
+        """
+        Break the connection of a cooker.
+        """
+        client = self.anovas[address].client
+        if client is not None:
+            client.drop()
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bleak import BleakClient
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from bleak.exc import BleakError
+from pydantic import BaseModel
+
+from .client import AnovaBluetoothClient, ClientFactory, AnovaConnectionError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_TIMEOUT = 60.0  # seconds
+
+Scanner = Callable[[], Awaitable[Tuple[Optional[BLEDevice], Optional[AdvertisementData]]]]
+
+
+class BLEPoolStats(BaseModel):
+    sessions: int  # Open sessions
+    connects: int  # GATT connections established, including the reconnections
+    reuses: int  # Sessions served by an open connection
+    scans: int
+    idle_closes: int
+
+
+class _Session:
+    def __init__(self, client: AnovaBluetoothClient):
+        self.client = client
+        self.lock = asyncio.Lock()  # A session serves one user at a time, so a multi-step sequence isn't interleaved
+        self.last_used = time.monotonic()
+
+
+class BLESessionPool:
+    """
+    The BLE connections to the cookers, shared by all the BLE operations.
+
+    A session keeps its GATT connection open after use, so the next operation on the same cooker skips the scan and
+    the connection setup. A session that lost its connection is reconnected when it's used again, and one left idle
+    for `idle_timeout` seconds is disconnected, as a connected cooker stops advertising and can't be used by others.
+    """
+
+    def __init__(self, idle_timeout: float = DEFAULT_IDLE_TIMEOUT, client_factory: ClientFactory = BleakClient,
+                 scanner: Scanner = AnovaBluetoothClient.scan):
+        """
+        :param idle_timeout: The time after which an unused connection is closed, in seconds
+        :param client_factory: Creates the GATT clients, BleakClient unless testing
+        :param scanner: Finds a cooker when no address is given and no session is open
+        """
+        self.idle_timeout = idle_timeout
+        self.client_factory = client_factory
+        self.scanner = scanner
+        self._sessions: Dict[str, _Session] = {}  # BLE address -> session
+        self._reaper_task: Optional[asyncio.Task[None]] = None
+        self._connects = 0
+        self._reuses = 0
+        self._scans = 0
+        self._idle_closes = 0
+
+    @property
+    def stats(self) -> BLEPoolStats:
+        return BLEPoolStats(
+            sessions=len(self._sessions),
+            connects=self._connects,
+            reuses=self._reuses,
+            scans=self._scans,
+            idle_closes=self._idle_closes,
+        )
+
+    @property
+    def clients(self) -> List[AnovaBluetoothClient]:
+        """
+        The clients of the open sessions, whose cookers don't advertise while connected.
+        """
+        return [session.client for session in self._sessions.values()]
+
+    @asynccontextmanager
+    async def session(self, device: Optional[BLEDevice | str] = None) -> AsyncIterator[AnovaBluetoothClient]:
+        """
+        Use a connected client of a cooker, exclusively.
+        :param device: The cooker, or its address. When omitted, the cooker of an open session is used, or one is
+                       scanned for.
+        :raises AnovaConnectionError: If no cooker was found
+        """
+        if self._reaper_task is None:
+            self._reaper_task = asyncio.create_task(self._close_idle())
+
+        session = await self._get_session(device)
+        await session.lock.acquire()
+        while self._sessions.get(session.client.address) is not session:
+            # Closed while waiting for it, e.g. released: connecting it would leave a connection the pool doesn't track
+            session.lock.release()
+            session = await self._get_session(device)
+            await session.lock.acquire()
+        try:
+            if not session.client.is_connected:
+                await self._connect(session.client)
+            else:
+                self._reuses += 1
+            yield session.client
+        except (BleakError, OSError):
+            # The connection is broken, start from a fresh one next time
+            await self._close(session)
+            raise
+        finally:
+            session.last_used = time.monotonic()
+            session.lock.release()
+
+    async def release(self, device: BLEDevice | str) -> None:
+        """
+        Disconnect a cooker now rather than once it's idle, to bound the number of connections. Waits for the
+        session to be free.
+        """
+        address = device.address if isinstance(device, BLEDevice) else device
+        session = self._sessions.get(address)
+        if session is not None:
+            async with session.lock:
+                await self._close(session)
+
+    async def _get_session(self, device: Optional[BLEDevice | str]) -> _Session:
+        if device is None:
+            if self._sessions:
+                return next(iter(self._sessions.values()))
+            self._scans += 1
+            device, _ = await self.scanner()
+            if device is None:
+                raise AnovaConnectionError("No BLE device found")
+
+        address = device.address if isinstance(device, BLEDevice) else device
+        if address not in self._sessions:
+            self._sessions[address] = _Session(AnovaBluetoothClient(device, self.client_factory))
+        return self._sessions[address]
+
+    async def _connect(self, client: AnovaBluetoothClient) -> None:
+        try:
+            await client.disconnect()  # Drop the broken connection, if any
+        except Exception as e:
+            logger.debug(f"Disconnecting {client.address} failed: {repr(e)}")
+        await client.connect()
+        self._connects += 1
+
+    async def _close(self, session: _Session) -> None:
+        if self._sessions.get(session.client.address) is session:
+            del self._sessions[session.client.address]
+        try:
+            await session.client.disconnect()
+        except Exception as e:
+            logger.debug(f"Disconnecting {session.client.address} failed: {repr(e)}")
+
+    async def _close_idle(self) -> None:
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            idle_since = time.monotonic() - self.idle_timeout
+            for session in list(self._sessions.values()):
+                if session.last_used <= idle_since and not session.lock.locked():
+                    self._idle_closes += 1
+                    await self._close(session)
+
+    async def close(self) -> None:
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        for session in list(self._sessions.values()):
+            await self._close(session)
@@ -0,0 +1,220 @@
+import asyncio
+import enum
+import logging
+import random
+import string
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from bleak.backends.device import BLEDevice
+from pydantic import BaseModel
+
+from commands import AnovaCommand, SetSecretKey
+from .client import AnovaBluetoothClient, AnovaCommandError
+from .pool import BLESessionPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STEP_TIMEOUT = 5.0  # seconds
+DEFAULT_MAX_CONNECTIONS = 4  # Most adapters handle a handful of simultaneous connections at most
+
+
+class ProvisioningStep(BaseModel):
+    command: str  # The command class, as the command itself can hold credentials
+    result: Any = None  # The decoded response
+    error: Optional[str] = None
+    duration: float  # seconds
+
+
+class ProvisioningReport(BaseModel):
+    address: str
+    ok: bool
+    steps: List[ProvisioningStep] = []  # The commands after a failed one are not run
+    duration: float  # seconds
+
+
+async def run_pipeline(client: AnovaBluetoothClient, commands: Sequence[AnovaCommand],
+                       timeout: float = DEFAULT_STEP_TIMEOUT) -> ProvisioningReport:
+    """
+    Run a list of commands in order on a connected cooker, verifying each one before running the next.
+    A command fails if it raises, if the cooker doesn't know it, or if its decoded response is False, as when the
+    echo of `SetServerInfo` doesn't match the server. A failing command skips the remaining commands.
+    :param client: The connected client of the cooker
+    :param commands: The commands to run
+    :param timeout: Maximum time to wait for the response of each command, in seconds
+    :return: The result of each command that ran
+    """
+    start = time.perf_counter()
+    steps: List[ProvisioningStep] = []
+    for command in commands:
+        step_start = time.perf_counter()
+        result: Any = None
+        error: Optional[str] = None
+        try:
+            if not command.supports_ble():
+                raise AnovaCommandError(f"Command '{type(command).__name__}' is not supported over BLE")
+            response = await client.send_command(command.encode(), timeout)
+            if "invalid command" in response.lower():
+                error = "Invalid command"
+            else:
+                result = command.decode(response)
+                if result is False:
+                    error = "Verification failed"
+        except Exception as e:
+            logger.warning(f"Provisioning {client.address} failed at {type(command).__name__}: {repr(e)}")
+            error = repr(e)
+
+        steps.append(ProvisioningStep(command=type(command).__name__, result=result, error=error,
+                                      duration=time.perf_counter() - step_start))
+        if error is not None:
+            break
+
+    return ProvisioningReport(address=client.address, ok=all(step.error is None for step in steps), steps=steps,
+                              duration=time.perf_counter() - start)
+
+
+def generate_secret_key() -> str:
+    characters = string.ascii_lowercase + string.digits
+    return ''.join(random.choice(characters) for _ in range(10))
+
+
+class ProvisioningStatus(enum.StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class DeviceProvisioning(BaseModel):
+    address: str
+    status: ProvisioningStatus = ProvisioningStatus.PENDING
+    attempts: int = 0
+    secret_key: Optional[str] = None  # The new secret key, once the cooker has it
+    report: Optional[ProvisioningReport] = None  # The report of the last attempt
+    error: Optional[str] = None  # Why the last attempt couldn't run the commands, e.g. the cooker is out of range
+
+
+class ProvisioningJobState(BaseModel):
+    id: str
+    done: bool
+    devices: List[DeviceProvisioning]
+
+
+class ProvisioningJob:
+    """
+    Provisions many cookers concurrently, with at most `max_connections` of them connected at once.
+
+    Every cooker gets a new secret key, if enabled, then the commands. The changes of the cookers' progress are
+    recorded in order in `updates`, for the clients following the job. Once the job is done, starting it again
+    retries the cookers that failed, leaving alone the ones that succeeded.
+    """
+
+    def __init__(self, pool: BLESessionPool, devices: Sequence[Union[BLEDevice, str]], commands: Sequence[AnovaCommand],
+                 new_secret_key: bool = True, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 timeout: float = DEFAULT_STEP_TIMEOUT):
+        """
+        :param pool: The BLE session pool the cookers are connected with
+        :param devices: The cookers, or their addresses
+        :param commands: The commands run on every cooker, after setting its secret key
+        :param new_secret_key: Set a new secret key on every cooker
+        :param max_connections: The maximum number of cookers connected at once
+        :param timeout: Maximum time to wait for the response of each command, in seconds
+        """
+        self.id = uuid.uuid4().hex
+        self.pool = pool
+        self.commands = commands
+        self.new_secret_key = new_secret_key
+        self.timeout = timeout
+        self.done = False
+        self.updates: List[DeviceProvisioning] = []  # Every change of the progress of a cooker, in order
+        self._devices: Dict[str, Union[BLEDevice, str]] = {
+            device.address if isinstance(device, BLEDevice) else device: device for device in devices
+        }
+        self._progress = {address: DeviceProvisioning(address=address) for address in self._devices}
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._updated = asyncio.Event()  # Set and replaced on every update, and when the job is done
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def state(self) -> ProvisioningJobState:
+        return ProvisioningJobState(id=self.id, done=self.done, devices=list(self._progress.values()))
+
+    def start(self) -> None:
+        """
+        Provision the cookers not provisioned yet: all of them at first, then the ones that failed.
+        Does nothing while the job is running.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self.done = False
+        for progress in self._progress.values():
+            if progress.status == ProvisioningStatus.FAILED:
+                progress.status = ProvisioningStatus.PENDING
+                self._update(progress)
+        self._task = asyncio.create_task(self._run())
+
+    async def wait(self) -> ProvisioningJobState:
+        if self._task is not None:
+            await self._task
+        return self.state
+
+    async def wait_for_update(self, count: int, timeout: float) -> bool:
+        """
+        Wait until there are more than `count` updates, or the job is done.
+        :return: False if the timeout elapsed first
+        """
+        if len(self.updates) > count or self.done:
+            return True
+        try:
+            async with asyncio.timeout(timeout):
+                await self._updated.wait()
+            return True
+        except TimeoutError:
+            return False
+
+    async def _run(self) -> None:
+        try:
+            await asyncio.gather(*(self._provision(address) for address, progress in self._progress.items()
+                                   if progress.status == ProvisioningStatus.PENDING))
+        finally:
+            self.done = True
+            self._wake_waiters()
+
+    async def _provision(self, address: str) -> None:
+        progress = self._progress[address]
+        async with self._semaphore:
+            progress.status = ProvisioningStatus.RUNNING
+            progress.attempts += 1
+            progress.report = None
+            progress.error = None
+            self._update(progress)
+
+            secret_key = generate_secret_key() if self.new_secret_key else None
+            commands = ([SetSecretKey(secret_key)] if secret_key else []) + list(self.commands)
+            try:
+                async with self.pool.session(self._devices[address]) as client:
+                    progress.report = await run_pipeline(client, commands, self.timeout)
+                if secret_key and progress.report.steps and progress.report.steps[0].error is None:
+                    # The cooker has the new key, even if a later command fails
+                    progress.secret_key = secret_key
+            except Exception as e:
+                logger.warning(f"Provisioning {address} failed: {repr(e)}")
+                progress.error = repr(e)
+            finally:
+                # Make room for the next cooker
+                await self.pool.release(address)
+
+        if progress.report is not None and progress.report.ok:
+            progress.status = ProvisioningStatus.SUCCEEDED
+        else:
+            progress.status = ProvisioningStatus.FAILED
+        self._update(progress)
+
+    def _update(self, progress: DeviceProvisioning) -> None:
+        self.updates.append(progress.model_copy(deep=True))
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        self._updated.set()
+        self._updated = asyncio.Event()
@@ -0,0 +1,123 @@
+import asyncio
+from typing import List, Tuple
+
+import pytest
+
+from anova_wifi.event import AnovaEvent, EventType, EventOriginator
+from commands import GetIDCard, GetVersion, SetServerInfo
+from .client import AnovaBluetoothClient, AnovaCommandError
+from .fake import FakeAnova, FakeBLEBackend
+
+ADDRESS = "00:00:00:00:00:01"
+
+
+def make_client() -> Tuple[AnovaBluetoothClient, FakeAnova]:
+    anova = FakeAnova(ADDRESS, connect_delay=0.001, gatt_delay=0.001)
+    return AnovaBluetoothClient(ADDRESS, FakeBLEBackend([anova]).client_factory), anova
+
+
+def test_notifications_are_subscribed_once() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        async with client:
+            assert await client.send_command(GetIDCard()) == "f56-000000000001"
+            assert await client.send_command(GetVersion()) == "ver 2.7.7"
+            assert await client.send_command("read unit") == "c"
+            assert anova.gatt_operations == 4  # The subscription, then a write per command
+
+    asyncio.run(run())
+
+
+def test_chunked_responses_are_reassembled() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        async with client:
+            # "pc.anovaculinary.com 8080\r" takes two notifications
+            assert await client.send_command(SetServerInfo("pc.anovaculinary.com", 8080))
+            assert anova.commands == ["server para pc.anovaculinary.com 8080"]
+
+    asyncio.run(run())
+
+
+def test_events_are_surfaced_separately() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        events: List[AnovaEvent] = []
+
+        async def on_event(event: AnovaEvent) -> None:
+            events.append(event)
+
+        client.set_event_callback(on_event)
+        async with client:
+            await anova.notify("event ble stop")
+            # An event notified while a command waits for its response doesn't answer the command
+            event_task = asyncio.create_task(anova.notify("event ble low water"))
+            assert await client.send_command(GetVersion()) == "ver 2.7.7"
+            await event_task
+
+        assert [event.type for event in events] == [EventType.STOP, EventType.LOW_WATER]
+        assert all(event.originator == EventOriginator.BLE for event in events)
+
+    asyncio.run(run())
+
+
+def test_late_response_is_not_matched_to_the_next_command() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        async with client:
+            # The write takes 50 ms, and the response 50 ms more, in 2 notifications
+            anova.gatt_delay = 0.05
+            with pytest.raises(AnovaCommandError):
+                await client.send_command(GetIDCard(), timeout=0.06)
+            # The late response arrives while the next command waits for its own
+            assert await client.send_command(GetVersion()) == "ver 2.7.7"
+            assert await client.send_command("read unit") == "c"
+
+    asyncio.run(run())
+
+
+def test_unanswered_command_is_no_longer_expected() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        respond = anova.respond
+
+        def never_answer_id_card(command: str) -> str:
+            return "" if command == "get id card" else respond(command)
+
+        anova.respond = never_answer_id_card  # type: ignore[method-assign]
+        async with client:
+            with pytest.raises(AnovaCommandError):
+                await client.send_command(GetIDCard(), timeout=0.05)
+            await asyncio.sleep(0.06)  # The response of GetIDCard is no longer expected
+            assert await client.send_command(GetVersion()) == "ver 2.7.7"
+
+    asyncio.run(run())
+
+
+def test_partially_written_command_reconnects() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        async with client:
+            anova.gatt_delay = 0.05
+            with pytest.raises(AnovaCommandError):
+                # Written in 2 chunks, timing out after the first one
+                await client.send_command(SetServerInfo("pc.anovaculinary.com", 8080), timeout=0.07)
+            assert not client.is_connected
+
+            anova.gatt_delay = 0.001
+            await client.connect()
+            assert await client.send_command(GetVersion()) == "ver 2.7.7"
+
+    asyncio.run(run())
+
+
+def test_commands_are_pipelined() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        async with client:
+            responses = await client.send_commands([GetIDCard(), GetVersion(), "read unit"])
+
+        assert responses == ["f56-000000000001", "ver 2.7.7", "c"]
+        assert anova.commands == ["get id card", "version", "read unit"]
+
+    asyncio.run(run())
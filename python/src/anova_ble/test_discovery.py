@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Tuple
+
+import pytest
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+from .client import AnovaBluetoothClient, Scanner
+from .discovery import DiscoveryService
+from .fake import FakeAnova, FakeBLEBackend
+
+
+def make_discovery(ttl: float = 60.0, scan_interval: float = 30.0, scan_window: float = 5.0
+                   ) -> Tuple[DiscoveryService, FakeBLEBackend]:
+    backend = FakeBLEBackend([
+        FakeAnova("00:00:00:00:00:01", rssi=-70, advertise_interval=0.01),
+        FakeAnova("00:00:00:00:00:02", rssi=-50, advertise_interval=0.02),
+    ])
+    return DiscoveryService(ttl, scan_interval, scan_window, backend.scanner_factory), backend
+
+
+def test_scan_returns_on_first_advertisement() -> None:
+    async def run() -> None:
+        backend = FakeBLEBackend([FakeAnova(advertise_interval=0.01)])
+        start = time.monotonic()
+        device, advertisement = await AnovaBluetoothClient.scan(5.0, backend.scanner_factory)
+        assert device is not None and device.address == "00:00:00:00:00:01"
+        assert advertisement is not None and advertisement.rssi == -60
+        assert time.monotonic() - start < 1.0
+
+    asyncio.run(run())
+
+
+def test_scan_times_out_without_devices() -> None:
+    async def run() -> None:
+        backend = FakeBLEBackend([])
+        assert await AnovaBluetoothClient.scan(0.05, backend.scanner_factory) == (None, None)
+
+    asyncio.run(run())
+
+
+def test_scans_are_cached() -> None:
+    async def run() -> None:
+        discovery, backend = make_discovery()
+        device, _ = await discovery.scan()
+        assert device is not None and device.address == "00:00:00:00:00:01"
+
+        again, _ = await discovery.scan()
+        assert again is not None and again.address == device.address
+        assert backend.scans == 1
+        assert [found.address for found in discovery.devices()] == ["00:00:00:00:00:01"]
+
+    asyncio.run(run())
+
+
+def test_cached_devices_expire() -> None:
+    async def run() -> None:
+        discovery, backend = make_discovery(ttl=0.05)
+        await discovery.scan()
+        await asyncio.sleep(0.1)
+        assert discovery.devices() == []
+
+        await discovery.scan()
+        assert backend.scans == 2
+
+    asyncio.run(run())
+
+
+def test_background_scan_fills_the_cache() -> None:
+    async def run() -> None:
+        discovery, backend = make_discovery(scan_interval=0.2, scan_window=0.1)
+        discovery.start()
+        await asyncio.sleep(0)  # Let the background scan start
+        device, _ = await discovery.scan()  # Waits for the background scan rather than scanning
+        assert device is not None
+        await asyncio.sleep(0.15)
+
+        # The closest first
+        assert [found.address for found in discovery.devices()] == ["00:00:00:00:00:02", "00:00:00:00:00:01"]
+        device, _ = await discovery.scan()
+        assert device is not None and device.address == "00:00:00:00:00:02"
+        assert backend.scans == 1
+        await discovery.stop()
+
+    asyncio.run(run())
+
+
+def test_failing_background_scan_backs_off(caplog: pytest.LogCaptureFixture) -> None:
+    attempts = 0
+
+    def no_adapter(callback: Callable[[BLEDevice, AdvertisementData], None]) -> Scanner:
+        nonlocal attempts
+        attempts += 1
+        raise OSError("No Bluetooth adapter")
+
+    async def run() -> None:
+        discovery = DiscoveryService(scan_interval=0.01, scan_window=0.0, scanner_factory=no_adapter)
+        discovery.start()
+        await asyncio.sleep(0.2)
+        await discovery.stop()
+
+    with caplog.at_level(logging.WARNING, logger="anova_ble.discovery"):
+        asyncio.run(run())
+
+    # Retried after 0.02, 0.04, 0.08 s...: without the back-off, it would have retried 20 times
+    assert 2 <= attempts <= 5
+    assert len(caplog.records) == 1
+
+
+def test_scan_all_finds_every_device() -> None:
+    async def run() -> None:
+        discovery, backend = make_discovery()
+        devices = await discovery.scan_all(timeout=0.1)
+        assert [device.address for device in devices] == ["00:00:00:00:00:02", "00:00:00:00:00:01"]
+
+    asyncio.run(run())
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Tuple
+
+from commands import GetIDCard, GetVersion
+from .fake import FakeAnova, FakeBLEBackend
+from .pool import BLESessionPool
+
+ADDRESS = "00:00:00:00:00:01"
+
+
+def make_pool(idle_timeout: float = 60.0) -> Tuple[BLESessionPool, FakeBLEBackend, FakeAnova]:
+    anova = FakeAnova(ADDRESS, connect_delay=0.01, gatt_delay=0.001)
+    backend = FakeBLEBackend([anova])
+    pool = BLESessionPool(idle_timeout, backend.client_factory, lambda: backend.scan(timeout=0.01))
+    return pool, backend, anova
+
+
+def test_sessions_are_reused() -> None:
+    async def run() -> None:
+        pool, backend, anova = make_pool()
+        async with pool.session() as client:
+            assert await client.send_command(GetIDCard()) == "f56-000000000001"
+        async with pool.session() as client:
+            assert await client.send_command(GetVersion()) == "ver 2.7.7"
+        async with pool.session(ADDRESS) as client:
+            assert client.address == ADDRESS
+
+        assert backend.scans == 1
+        assert anova.connects == 1
+        assert pool.stats.reuses == 2
+        await pool.close()
+        assert anova.client is None
+
+    asyncio.run(run())
+
+
+def test_lost_connection_is_reconnected() -> None:
+    async def run() -> None:
+        pool, backend, anova = make_pool()
+        async with pool.session(ADDRESS) as client:
+            await client.send_command(GetIDCard())
+        backend.drop(ADDRESS)
+
+        async with pool.session(ADDRESS) as client:
+            assert await client.send_command(GetIDCard()) == "f56-000000000001"
+        assert anova.connects == 2
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_idle_sessions_are_closed() -> None:
+    async def run() -> None:
+        pool, backend, anova = make_pool(idle_timeout=0.05)
+        async with pool.session(ADDRESS):
+            await asyncio.sleep(0.1)  # In use, so not idle
+        assert anova.client is not None
+
+        await asyncio.sleep(0.15)
+        assert anova.client is None
+        assert pool.stats.sessions == 0
+        assert pool.stats.idle_closes == 1
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_session_released_while_waiting_is_not_orphaned() -> None:
+    async def run() -> None:
+        pool, backend, anova = make_pool()
+        in_use = asyncio.Event()
+        done = asyncio.Event()
+
+        async def use() -> None:
+            async with pool.session(ADDRESS):
+                in_use.set()
+                await done.wait()
+
+        async def use_again() -> None:
+            async with pool.session(ADDRESS) as client:
+                assert await client.send_command(GetIDCard()) == "f56-000000000001"
+
+        user = asyncio.create_task(use())
+        await in_use.wait()
+        release = asyncio.create_task(pool.release(ADDRESS))
+        await asyncio.sleep(0)  # Waits for the session, before the next user
+        next_user = asyncio.create_task(use_again())
+        await asyncio.sleep(0)
+        done.set()
+        await asyncio.gather(user, release, next_user)
+
+        assert anova.client is not None
+        assert pool.stats.sessions == 1  # The new connection is tracked
+        await pool.close()
+        assert anova.client is None
+
+    asyncio.run(run())
@@ -0,0 +1,129 @@
+import asyncio
+from typing import List, Tuple
+
+from commands import GetIDCard, SetServerInfo, SetSecretKey, SetWifiCredentials, SetLED
+from .fake import FakeAnova, FakeBLEBackend, FakeBleakClient
+from .pool import BLESessionPool
+from .provisioning import run_pipeline, ProvisioningJob, ProvisioningStatus
+from .test_client import ADDRESS, make_client
+
+
+def test_pipeline_runs_the_commands_in_order() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        async with client:
+            report = await run_pipeline(client, [
+                SetSecretKey("abcdefghij"),
+                SetServerInfo("192.168.1.10", 8080),
+                SetWifiCredentials("my-network-name", "a-long-wifi-password"),  # Over several writes
+            ])
+
+        assert report.ok
+        assert [step.command for step in report.steps] == ["SetSecretKey", "SetServerInfo", "SetWifiCredentials"]
+        assert report.steps[1].result is True
+        assert anova.secret_key == "abcdefghij"
+        assert anova.server == ("192.168.1.10", 8080)
+        assert anova.wifi == ("my-network-name", "a-long-wifi-password")
+
+    asyncio.run(run())
+
+
+def test_pipeline_stops_at_a_failed_verification() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        anova.respond = lambda command: "pc.anovaculinary.com 8080"  # type: ignore[method-assign]
+        async with client:
+            report = await run_pipeline(client, [SetServerInfo("192.168.1.10", 8080), SetSecretKey("abcdefghij")])
+
+        assert not report.ok
+        assert len(report.steps) == 1
+        assert report.steps[0].error == "Verification failed"
+
+    asyncio.run(run())
+
+
+def test_pipeline_stops_at_an_invalid_command() -> None:
+    async def run() -> None:
+        client, anova = make_client()
+        async with client:
+            report = await run_pipeline(client, [GetIDCard(), SetLED(0, 0, 255), SetSecretKey("abcdefghij")])
+
+        assert not report.ok
+        assert report.steps[0].result == "f56-000000000001"
+        assert report.steps[1].error == "Invalid command"
+        assert len(report.steps) == 2
+        assert anova.secret_key == ""
+
+    asyncio.run(run())
+
+
+def make_job(count: int, max_connections: int) -> Tuple[ProvisioningJob, List[FakeAnova]]:
+    anovas = [FakeAnova(f"00:00:00:00:00:{i:02x}", connect_delay=0.01, gatt_delay=0.001) for i in range(count)]
+    backend = FakeBLEBackend(anovas)
+    pool = BLESessionPool(client_factory=backend.client_factory)
+    job = ProvisioningJob(pool, [anova.ble_device for anova in anovas], [SetServerInfo("192.168.1.10", 8080)],
+                          max_connections=max_connections)
+    return job, anovas
+
+
+def test_job_provisions_the_cookers_concurrently() -> None:
+    async def run() -> None:
+        job, anovas = make_job(6, max_connections=2)
+        connected = 0
+
+        async def watch_connections() -> None:
+            nonlocal connected
+            while True:
+                connected = max(connected, sum(anova.client is not None for anova in anovas))
+                await asyncio.sleep(0.001)
+
+        watcher = asyncio.create_task(watch_connections())
+        job.start()
+        state = await job.wait()
+        watcher.cancel()
+
+        assert state.done
+        assert all(device.status == ProvisioningStatus.SUCCEEDED for device in state.devices)
+        assert all(anova.server == ("192.168.1.10", 8080) for anova in anovas)
+        assert [device.secret_key for device in state.devices] == [anova.secret_key for anova in anovas]
+        assert connected == 2
+        # Each cooker went running, then succeeded
+        assert len(job.updates) == 12
+
+    asyncio.run(run())
+
+
+def test_job_retries_the_failed_cookers() -> None:
+    async def run() -> None:
+        job, anovas = make_job(3, max_connections=3)
+        out_of_range = anovas[1]
+        out_of_range.client = FakeBleakClient(out_of_range)  # Connected elsewhere, so it can't be connected
+        job.start()
+        state = await job.wait()
+        assert [device.status for device in state.devices] == [
+            ProvisioningStatus.SUCCEEDED, ProvisioningStatus.FAILED, ProvisioningStatus.SUCCEEDED]
+        assert state.devices[1].error is not None
+
+        out_of_range.client = None
+        job.start()
+        state = await job.wait()
+        assert all(device.status == ProvisioningStatus.SUCCEEDED for device in state.devices)
+        assert [device.attempts for device in state.devices] == [1, 2, 1]
+        assert [anova.connects for anova in anovas] == [1, 1, 1]
+
+    asyncio.run(run())
+
+
+def test_job_records_the_secret_key_of_a_failed_cooker() -> None:
+    async def run() -> None:
+        anova = FakeAnova(ADDRESS, connect_delay=0.001, gatt_delay=0.001)
+        pool = BLESessionPool(client_factory=FakeBLEBackend([anova]).client_factory)
+        job = ProvisioningJob(pool, [anova.ble_device], [SetLED(0, 0, 255)])
+        job.start()
+        state = await job.wait()
+
+        assert state.devices[0].status == ProvisioningStatus.FAILED
+        assert anova.secret_key != ""
+        assert state.devices[0].secret_key == anova.secret_key
+
+    asyncio.run(run())
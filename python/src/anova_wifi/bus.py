@@ -0,0 +1,117 @@
+import asyncio
+import itertools
+import logging
+from enum import Enum
+from typing import Any, Callable, Coroutine, Dict, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+ALL_DEVICES = "*"
+DEFAULT_SUBSCRIBER_TIMEOUT = 5.0  # seconds
+
+Subscriber = Callable[..., Coroutine[Any, Any, None]]
+
+
+class Topic(str, Enum):
+    DEVICE_CONNECTED = "device_connected"
+    DEVICE_DISCONNECTED = "device_disconnected"
+    STATE_CHANGED = "state_changed"
+    EVENT = "event"
+
+
+class BusStats(BaseModel):
+    subscriptions: int
+    published: int
+    failures: int
+    timeouts: int
+
+
+class EventBus:
+    """
+    Publish/subscribe of the device notifications.
+
+    Any number of subscribers can subscribe to a topic, either for a single device or for all of them. A message is
+    delivered to all its subscribers concurrently, each with its own timeout, so a slow or failing subscriber
+    doesn't delay or break the others. Subscribing returns a token, which is used to unsubscribe.
+    """
+
+    def __init__(self, timeout: float = DEFAULT_SUBSCRIBER_TIMEOUT):
+        self.timeout = timeout
+        self._subscribers: Dict[Tuple[Topic, str], Dict[int, Subscriber]] = {}
+        self._subscriptions: Dict[int, Tuple[Topic, str]] = {}
+        self._tokens = itertools.count(1)
+        self._published = 0
+        self._failures = 0
+        self._timeouts = 0
+
+    @property
+    def stats(self) -> BusStats:
+        return BusStats(
+            subscriptions=len(self._subscriptions),
+            published=self._published,
+            failures=self._failures,
+            timeouts=self._timeouts,
+        )
+
+    def subscribe(self, topic: Topic, device_id: str, callback: Subscriber) -> int:
+        """
+        Subscribe to a topic.
+        :param topic: The topic
+        :param device_id: The device ID, or `ALL_DEVICES`
+        :param callback: The coroutine function called with the arguments of the published messages
+        :return: The subscription token
+        """
+        token = next(self._tokens)
+        self._subscribers.setdefault((topic, device_id), {})[token] = callback
+        self._subscriptions[token] = (topic, device_id)
+        return token
+
+    def unsubscribe(self, token: int) -> None:
+        key = self._subscriptions.pop(token, None)
+        if key is None:
+            return
+        subscribers = self._subscribers[key]
+        del subscribers[token]
+        if not subscribers:
+            del self._subscribers[key]
+
+    def unsubscribe_device(self, device_id: str) -> None:
+        """
+        Remove all the subscriptions to a single device.
+        """
+        for topic in Topic:
+            self.unsubscribe_topic(topic, device_id)
+
+    def unsubscribe_topic(self, topic: Topic, device_id: str) -> None:
+        """
+        Remove all the subscriptions to a topic for a device, or for `ALL_DEVICES`.
+        """
+        for token in list(self._subscribers.get((topic, device_id), ())):
+            self.unsubscribe(token)
+
+    async def publish(self, topic: Topic, device_id: str, *args: Any) -> None:
+        """
+        Deliver a message to the subscribers of the device and of all the devices, and wait for all of them.
+        """
+        callbacks = [
+            *self._subscribers.get((topic, ALL_DEVICES), {}).values(),
+            *self._subscribers.get((topic, device_id), {}).values(),
+        ]
+        self._published += 1
+        if len(callbacks) == 1:
+            await self._deliver(topic, callbacks[0], args)
+        elif callbacks:
+            await asyncio.gather(*(self._deliver(topic, callback, args) for callback in callbacks))
+
+    async def _deliver(self, topic: Topic, callback: Subscriber, args: Tuple[Any, ...]) -> None:
+        try:
+            async with asyncio.timeout(self.timeout):
+                await callback(*args)
+        except TimeoutError:
+            self._timeouts += 1
+            logger.warning(f"Subscriber {callback} of {topic.value} timed out")
+        except Exception as e:
+            self._failures += 1
+            logger.error(f"Subscriber {callback} of {topic.value} failed: {repr(e)}")
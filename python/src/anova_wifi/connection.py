@@ -1,73 +1,191 @@
 import asyncio
 import logging
-from typing import Optional, Callable, Coroutine
+from collections import deque
+from typing import Optional, Callable, Coroutine, Deque, List, Dict
 
+from .dispatch import EventDispatcher, OverflowPolicy, DispatchStats, DEFAULT_EVENT_QUEUE_SIZE
 from .encoding import Encoder
 from .event import AnovaEvent
+from .framing import FrameDecoder, encode_frame
+from .priority import CommandPriority, PriorityLock, WaitStats, DEFAULT_AGING
 
 logger = logging.getLogger(__name__)
 
+COMMAND_TIMEOUT = 10  # seconds
 
-class AnovaConnection:
-    event_callback: Optional[Callable[[AnovaEvent], Coroutine[None, None, None]]] = None
-    listen_task: Optional[asyncio.Task[None]] = None
-    response_queue: asyncio.Queue[str] = asyncio.Queue(maxsize=1)
-    cmd_lock = asyncio.Lock()
 
-    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+class PipelineInterruptedError(Exception):
+    """Raised when the device sent an event while a batch of pipelined commands was in flight."""
+
+    def __init__(self, responses: List[str]):
+        super().__init__("Event received in the middle of a pipelined batch")
+        self.responses = responses
+
+
+class AnovaConnection:
+    event_callback: Optional[Callable[[AnovaEvent], Coroutine[None, None, None]]]
+    listen_task: Optional[asyncio.Task[None]]
+    cmd_lock: PriorityLock
+    _pending: Deque[asyncio.Future[str]]
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 event_queue_size: int = DEFAULT_EVENT_QUEUE_SIZE,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST, priority_aging: float = DEFAULT_AGING):
         self.reader = reader
         self.writer = writer
-
-    async def send_command(self, message: str) -> str:
-        async with self.cmd_lock:
-            async with asyncio.timeout(10):
-                encoded = Encoder.encode(message)
-                self.writer.write(encoded)
-                self.writer.write(b'\x16')
-                await self.writer.drain()
-                logger.debug(f"--> Sent message: {message}")
-                resp = await self.response_queue.get()
-                logger.debug(f"<-- Received response: {resp}")
-                return resp
+        self.framer = FrameDecoder()
+        self.event_callback = None
+        self.listen_task = None
+        self.dispatcher = EventDispatcher(self._deliver_event, event_queue_size, overflow_policy)
+
+        # Each device is an independent command channel: a response can only be matched to the command that was
+        # sent on the same connection. The device answers in order, so responses are matched to the pending
+        # commands FIFO. The commands of users go ahead of the background polls waiting for the connection.
+        self.cmd_lock = PriorityLock(priority_aging)
+        self._pending = deque()
+        # The deadlines of the responses still due to the commands given up on, which are discarded as they arrive.
+        # A device may never answer, so a response not received within COMMAND_TIMEOUT is no longer expected.
+        self._abandoned: Deque[float] = deque()
+        self._interrupted = False
+
+    async def send_command(self, message: str, priority: CommandPriority = CommandPriority.INTERACTIVE) -> str:
+        return (await self.send_frames([encode_frame(message)], pipelined=False, priority=priority))[0]
+
+    async def send_commands(self, messages: List[str], pipelined: bool = True,
+                            priority: CommandPriority = CommandPriority.INTERACTIVE) -> List[str]:
+        return await self.send_frames([encode_frame(message) for message in messages], pipelined, priority)
+
+    async def send_frames(self, frames: List[bytes], pipelined: bool = True,
+                          priority: CommandPriority = CommandPriority.INTERACTIVE) -> List[str]:
+        """
+        Send several encoded commands, and return their responses in order.
+        :param frames: The wire bytes of the commands to send, see `framing.command_frame`
+        :param pipelined: Write all the commands in a single flush while holding the command lock, and correlate
+                          the responses as they arrive instead of waiting a full round trip for each command.
+                          Otherwise, the lock is acquired for each command, so commands of a higher priority can
+                          go in between.
+        :param priority: The priority of the commands waiting for the command lock
+        :return: The responses, in the order of the commands
+        :raises PipelineInterruptedError: If an event arrived while a pipelined batch was in flight. The device
+                                          state may have changed between the responses, which are attached to
+                                          the error.
+        """
+        if not pipelined:
+            return [(await self._send_locked([frame], priority))[0] for frame in frames]
+        return await self._send_locked(frames, priority)
+
+    @property
+    def command_stats(self) -> Dict[CommandPriority, WaitStats]:
+        """
+        :return: The time commands waited for the command lock, per priority
+        """
+        return self.cmd_lock.stats
+
+    async def _send_locked(self, frames: List[bytes], priority: CommandPriority) -> List[str]:
+        async with self.cmd_lock.acquire(priority):
+            async with asyncio.timeout(COMMAND_TIMEOUT):
+                self._interrupted = False
+                responses = await self._send_batch(frames)
+                if self._interrupted and len(frames) > 1:
+                    raise PipelineInterruptedError(responses)
+                return responses
+
+    async def _send_batch(self, frames: List[bytes]) -> List[str]:
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in frames]
+        self._pending.extend(futures)
+        try:
+            self.writer.write(frames[0] if len(frames) == 1 else b''.join(frames))
+            await self.writer.drain()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"--> Sent messages: {[Encoder.decode(frame) for frame in frames]}")
+            responses = [await future for future in futures]
+            logger.debug(f"<-- Received responses: {responses}")
+            return responses
+        finally:
+            # The commands still pending were given up on, after a timeout or a failed command of the batch.
+            # Their responses may still arrive: skip them, rather than matching them to the next commands.
+            deadline = asyncio.get_running_loop().time() + COMMAND_TIMEOUT
+            self._abandoned.extend(deadline for _ in self._pending)
+            self._pending.clear()
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+                elif not future.cancelled():
+                    future.exception()  # Mark the failures of the abandoned commands as retrieved
+
+    @property
+    def event_stats(self) -> DispatchStats:
+        return self.dispatcher.stats
 
     def start_listening(self) -> None:
         if not self.listen_task:
+            self.dispatcher.start()
             self.listen_task = asyncio.create_task(self._listen())
 
     async def _listen(self) -> None:
         try:
-            while True:
-                await self.receive()
+            async for message in self.framer.messages(self.reader):
+                self._handle_message(message)
         except ConnectionResetError:
             logger.debug("Connection closed by remote host")
         except asyncio.CancelledError:
             logger.debug("Listening task cancelled")
         except Exception as e:
             logger.error(f"Error in listening task: {e}")
+        finally:
+            for future in self._pending:
+                if not future.done():
+                    future.set_exception(ConnectionResetError("Connection closed"))
 
-    async def receive(self) -> Optional[str]:
-        data = await self.reader.read(1024)
-        if not data:
-            logger.error("Connection closed by remote host")
-            raise ConnectionResetError("Connection closed by remote host")
-
-        msg = Encoder.decode(data)
-
+    def _handle_message(self, msg: str) -> None:
         if "invalid command" in msg.lower():
-            logger.error(f"Received invalid command, skipping: {msg}")
-            return None
+            logger.error(f"Received invalid command: {msg}")
+            # It's the answer to the oldest pending command, fail it rather than shifting the next responses
+            if self._discard_late_response():
+                logger.debug(f"Discarded the late response of an abandoned command: {msg}")
+            elif self._pending:
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(ValueError(f"Invalid command: {msg}"))
+            return
 
         if AnovaEvent.is_event(msg):
-            if self.event_callback:
-                await self.event_callback(AnovaEvent.parse_event(msg))
-            else:
-                logger.warning(f"Received event message but no event callback set: {msg}")
-        elif self.cmd_lock.locked():
-            await self.response_queue.put(msg)
+            try:
+                event = AnovaEvent.parse_event(msg)
+            except ValueError as e:
+                logger.warning(f"Failed to parse event, skipping: {e}")
+                return
+
+            if self._pending:
+                self._interrupted = True
+            self.dispatcher.submit(event)
+        elif self._discard_late_response():
+            logger.debug(f"Discarded the late response of an abandoned command: {msg}")
+        elif self._pending:
+            future = self._pending.popleft()
+            if not future.done():  # Cancelled by the timeout in the meantime
+                future.set_result(msg)
         else:
-            logger.warning(f"Received unexpected message while not locked: {msg}")
-
-        return msg
+            logger.warning(f"Received unexpected message while not waiting for a response: {msg}")
+
+    def _discard_late_response(self) -> bool:
+        """
+        :return: Whether a response is still due to an abandoned command, and was accounted for
+        """
+        now = asyncio.get_running_loop().time()
+        while self._abandoned and self._abandoned[0] <= now:
+            self._abandoned.popleft()
+        if not self._abandoned:
+            return False
+        self._abandoned.popleft()
+        return True
+
+    async def _deliver_event(self, event: AnovaEvent) -> None:
+        if self.event_callback:
+            await self.event_callback(event)
+        else:
+            logger.warning(f"Received event message but no event callback set: {event.type}")
 
     def set_event_callback(self, callback: Callable[[AnovaEvent], Coroutine[None, None, None]]) -> None:
         self.event_callback = callback
@@ -79,6 +197,7 @@ class AnovaConnection:
                 await self.listen_task
             except asyncio.CancelledError:
                 pass
+        await self.dispatcher.close()
 
         self.writer.close()
         await self.writer.wait_closed()
@@ -1,7 +1,9 @@
+import asyncio
 import logging
-from typing import Callable, Coroutine, Type, Optional, Any
+import time
+from typing import Callable, Coroutine, Type, Optional, Any, List, Sequence, Dict, Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from commands import (
     AnovaCommand,
@@ -22,11 +24,37 @@ from commands import (
     StopDevice,
     DeviceStatus,
 )
-from .connection import AnovaConnection
+from .connection import AnovaConnection, PipelineInterruptedError
+from .dispatch import DispatchStats
 from .event import AnovaEvent, EventType
+from .framing import command_frame
+from .polling import PollingPolicy, PollingIntervals, FIELD_COMMANDS
+from .priority import CommandPriority, WaitStats
 
 logger = logging.getLogger(__name__)
 
+HEARTBEAT_COMMANDS: Sequence[AnovaCommand] = (
+    GetDeviceStatus(),
+    GetTargetTemperature(),
+    GetCurrentTemperature(),
+    GetTemperatureUnit(),
+    GetTimerStatus(),
+    GetSpeakerStatus(),
+)
+
+# The state fields returned by the read commands
+READ_FIELDS: Dict[Type[AnovaCommand], Tuple[str, ...]] = {
+    GetDeviceStatus: ("status",),
+    GetCurrentTemperature: ("current_temperature",),
+    GetTargetTemperature: ("target_temperature",),
+    GetTemperatureUnit: ("unit",),
+    GetTimerStatus: ("timer_value", "timer_running"),
+    GetSpeakerStatus: ("speaker_status",),
+}
+
+# Setters where only the last value matters, so pending writes of the same command are collapsed into one
+COALESCED_WRITES: Tuple[Type[AnovaCommand], ...] = (SetTargetTemperature, SetTimer, SetTemperatureUnit)
+
 
 class DeviceState(BaseModel):
     status: DeviceStatus = DeviceStatus.STOPPED
@@ -36,17 +64,59 @@ class DeviceState(BaseModel):
     timer_value: int = 0
     unit: Optional[TemperatureUnit] = None
     speaker_status: bool = False
+    version: int = 0  # Bumped on every change of the state
+
+
+class DeviceStateDelta(BaseModel):
+    """
+    The fields of the device state that changed, along with the version of the state after the change.
+    The changed fields are extra fields of the model, so it serializes to a partial `DeviceState`.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    version: int
+
+    @property
+    def changes(self) -> Dict[str, Any]:
+        return dict(self.model_extra or {})
+
+
+class _PendingWrite:
+    def __init__(self, command: AnovaCommand):
+        self.command = command
+        self.waiters: List[asyncio.Future[Any]] = []
 
 
 class AnovaDevice:
     id_card: Optional[str]
     version: Optional[str]
     secret_key: Optional[str]
-    _state_change_callback: Optional[Callable[[str, DeviceState], Coroutine[None, None, None]]]
-    _state: DeviceState = DeviceState()
+    _state_change_callback: Optional[Callable[[str, DeviceStateDelta], Coroutine[None, None, None]]]
+    _state: DeviceState
     _event_callback: Optional[Callable[[str, AnovaEvent], Coroutine[None, None, None]]]
+    _poll_request_callback: Optional[Callable[[], None]]
+    _updated_at: Dict[str, float]
+    _inflight_reads: Dict[str, asyncio.Future[Any]]
+    _pending_writes: Dict[Type[AnovaCommand], _PendingWrite]
+    _write_tasks: Dict[Type[AnovaCommand], asyncio.Task[None]]
+
+    def __init__(self, connection: AnovaConnection, polling_intervals: Optional[PollingIntervals] = None):
+        self.id_card = None
+        self.version = None
+        self.secret_key = None
+        self._state_change_callback = None
+        self._state = DeviceState()
+        self._updated_at = {}  # The time each field was last reported by the device, even if unchanged
+        self._state_changed = asyncio.Event()
+        # Tells apart the state versions of the successive connections of the device, which all start from 0
+        self.connected_at = time.time()
+        self._event_callback = None
+        self.polling = PollingPolicy(polling_intervals)
+        self._poll_request_callback = None
+        self._inflight_reads = {}
+        self._pending_writes = {}
+        self._write_tasks = {}
 
-    def __init__(self, connection: AnovaConnection):
         self.connection = connection
         self.connection.set_event_callback(self.handle_event)
 
@@ -54,7 +124,16 @@ class AnovaDevice:
     def state(self) -> DeviceState:
         return self._state
 
-    def add_state_change_callback(self, callback: Callable[[str, DeviceState], Coroutine[None, None, None]]) -> None:
+    @property
+    def event_stats(self) -> DispatchStats:
+        return self.connection.event_stats
+
+    @property
+    def command_stats(self) -> Dict[CommandPriority, WaitStats]:
+        return self.connection.command_stats
+
+    def add_state_change_callback(self,
+                                  callback: Callable[[str, DeviceStateDelta], Coroutine[None, None, None]]) -> None:
         self._state_change_callback = callback
 
     def remove_state_change_callback(self) -> None:
@@ -66,6 +145,16 @@ class AnovaDevice:
     def remove_event_callback(self) -> None:
         self._event_callback = None
 
+    def add_poll_request_callback(self, callback: Callable[[], None]) -> None:
+        """
+        Register a callback for when an event invalidated part of the state, and the device should be polled
+        right away.
+        """
+        self._poll_request_callback = callback
+
+    def remove_poll_request_callback(self) -> None:
+        self._poll_request_callback = None
+
     async def perform_handshake(self) -> None:
         try:
             self.id_card = await self.send_command(GetIDCard())
@@ -84,82 +173,245 @@ class AnovaDevice:
             raise
 
     async def heartbeat(self) -> None:
-        logger.debug("❤️Heartbeat -- start")
-        try:
-            await self.send_command(GetDeviceStatus())
-            await self.send_command(GetTargetTemperature())
-            await self.send_command(GetCurrentTemperature())
-            await self.send_command(GetTemperatureUnit())
-            await self.send_command(GetTimerStatus())
-            await self.send_command(GetSpeakerStatus())
-        except ConnectionResetError as e:
-            logger.error(f"Connection reset during heartbeat: {repr(e)}")
-        except Exception as e:
-            logger.error(f"Error during heartbeat: {repr(e)}")
-            raise
-        logger.debug("❤️Heartbeat -- end")
+        """
+        Refresh the fields of the state that are due, like `poll`, which the manager's scheduler calls.
+        """
+        await self.poll()
+
+    async def poll(self) -> float:
+        """
+        Refresh the fields of the state that are due according to the polling policy.
+        :return: The number of seconds until the next poll is due
+        """
+        fields = self.polling.due(self.state)
+        if fields:
+            logger.debug(f"Polling {[field.value for field in fields]}")
+            now = time.monotonic()
+            await self.send_commands([FIELD_COMMANDS[field] for field in fields], CommandPriority.POLL)
+            self.polling.mark_polled(fields, now)
+        return self.polling.delay(self.state)
 
-    async def send_command(self, command: AnovaCommand) -> Any:
+    async def send_command(self, command: AnovaCommand,
+                           priority: CommandPriority = CommandPriority.INTERACTIVE) -> Any:
         if not command.supports_wifi():
             raise ValueError(f"Command {command} does not support WiFi")
 
-        response_data = await self.connection.send_command(command.encode())
+        response_data = (await self.connection.send_frames([command_frame(command)], False, priority))[0]
         response = command.decode(response_data)
-        await self._update_state(type(command), response)
+        await self._apply_changes(self._state_changes(type(command), response))
         return response
 
+    async def read(self, command: AnovaCommand, max_age: Optional[float] = None) -> Any:
+        """
+        Read a value of the device state.
+        Concurrent identical reads share a single request to the device.
+        :param command: The read command, one of `READ_FIELDS`
+        :param max_age: Return the value from the state if the device reported it less than `max_age` seconds ago.
+                        When None, the value is always returned from the state.
+        :return: The decoded response
+        """
+        fields = READ_FIELDS.get(type(command))
+        if fields is None:
+            raise ValueError(f"Command {command} is not a read command")
+
+        if max_age is None or all(self.age(field) < max_age for field in fields):
+            values = tuple(getattr(self._state, field) for field in fields)
+            return values if len(values) > 1 else values[0]
+
+        key = command.encode()
+        inflight = self._inflight_reads.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self.send_command(command))
+            self._inflight_reads[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight_reads.pop(key, None))
+        # One of the readers giving up must not cancel the request for the others
+        return await asyncio.shield(inflight)
+
+    async def write(self, command: AnovaCommand) -> Any:
+        """
+        Send a setter command, last writer wins.
+        The writes of one of the `COALESCED_WRITES` commands that arrive while a previous write of the same command
+        is in flight are collapsed into a single command with the latest value. Every writer is resolved with the
+        value finally applied by the device.
+        :param command: The setter command
+        :return: The decoded response of the last applied command
+        """
+        key = type(command)
+        if key not in COALESCED_WRITES:
+            return await self.send_command(command)
+
+        pending = self._pending_writes.get(key)
+        if pending is None:
+            pending = self._pending_writes[key] = _PendingWrite(command)
+        pending.command = command
+        waiter: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        pending.waiters.append(waiter)
+
+        if key not in self._write_tasks:
+            self._write_tasks[key] = asyncio.create_task(self._flush_writes(key))
+        return await waiter
+
+    async def _flush_writes(self, key: Type[AnovaCommand]) -> None:
+        waiters: List[asyncio.Future[Any]] = []
+        try:
+            while key in self._pending_writes:
+                pending = self._pending_writes.pop(key)
+                waiters.extend(pending.waiters)
+                try:
+                    response = await self.send_command(pending.command)
+                except Exception as e:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                    waiters = []
+                    continue
+
+                # Writes that arrived meanwhile supersede this value, so their writers wait for the next one too
+                if key not in self._pending_writes:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_result(response)
+                    waiters = []
+        finally:
+            self._write_tasks.pop(key, None)
+            for waiter in waiters:  # Only when the device is closed during the write
+                if not waiter.done():
+                    waiter.set_exception(ConnectionResetError("Device closed"))
+
+    def age(self, field: str) -> float:
+        """
+        :return: The number of seconds since the device last reported a field of the state
+        """
+        updated_at = self._updated_at.get(field)
+        return float("inf") if updated_at is None else time.time() - updated_at
+
+    async def send_commands(self, commands: Sequence[AnovaCommand],
+                            priority: CommandPriority = CommandPriority.INTERACTIVE) -> List[Any]:
+        """
+        Send several commands in a single pipelined batch.
+        Falls back to sending them one by one when the batch is interrupted by an event, or when the responses
+        don't match the commands.
+        :param commands: The commands to send
+        :param priority: The priority of the commands, see `CommandPriority`
+        :return: The decoded responses, in the order of the commands
+        """
+        for command in commands:
+            if not command.supports_wifi():
+                raise ValueError(f"Command {command} does not support WiFi")
+
+        try:
+            responses_data = await self.connection.send_frames([command_frame(command) for command in commands],
+                                                               priority=priority)
+            responses = [command.decode(data) for command, data in zip(commands, responses_data)]
+        except (PipelineInterruptedError, ValueError) as e:
+            logger.debug(f"Pipelined batch failed, falling back to serial commands: {repr(e)}")
+            return [await self.send_command(command, priority) for command in commands]
+
+        changes: Dict[str, Any] = {}
+        for command, response in zip(commands, responses):
+            changes.update(self._state_changes(type(command), response))
+        await self._apply_changes(changes)
+        return responses
+
     async def handle_event(self, event: AnovaEvent) -> None:
-        await self._update_state_from_event(event)
-        await self._notify_state_change()
+        if self.polling.invalidate_for_event(event) and self._poll_request_callback is not None:
+            self._poll_request_callback()
+        await self._apply_changes(self._event_changes(event))
         if self.id_card is None:
             logger.warning("Device ID is None when notifying state change")
             return
         if self._event_callback is not None:
             await self._event_callback(self.id_card, event)
 
-    async def _update_state_from_event(self, event: AnovaEvent) -> None:
+    def _event_changes(self, event: AnovaEvent) -> Dict[str, Any]:
         if event.type == EventType.TEMP_REACHED:
-            self.state.current_temperature = self.state.target_temperature
+            return {"current_temperature": self._state.target_temperature}
         elif event.type == EventType.LOW_WATER:
-            self.state.status = DeviceStatus.LOW_WATER
+            return {"status": DeviceStatus.LOW_WATER}
         elif event.type == EventType.STOP:
-            self.state.status = DeviceStatus.STOPPED
+            return {"status": DeviceStatus.STOPPED}
         elif event.type == EventType.START:
-            self.state.status = DeviceStatus.RUNNING
+            return {"status": DeviceStatus.RUNNING}
         elif event.type == EventType.TIME_START:
-            self.state.timer_running = True
-        elif event.type == EventType.TIME_STOP:
-            self.state.timer_running = False
-        elif event.type == EventType.TIME_FINISH:
-            self.state.timer_running = False
+            return {"timer_running": True}
+        elif event.type in (EventType.TIME_STOP, EventType.TIME_FINISH):
+            return {"timer_running": False}
+        return {}
 
     async def get_id_card(self) -> str:
         return await self.send_command(GetIDCard())
 
-    async def _update_state(self, command_class: Type[AnovaCommand], response: Any) -> None:
+    @staticmethod
+    def _state_changes(command_class: Type[AnovaCommand], response: Any) -> Dict[str, Any]:
         if command_class == GetDeviceStatus:
-            self._state.status = response
+            return {"status": response}
         elif command_class == GetCurrentTemperature:
-            self._state.current_temperature = response
+            return {"current_temperature": response}
         elif command_class in (GetTargetTemperature, SetTargetTemperature):
-            self._state.target_temperature = response
+            return {"target_temperature": response}
         elif command_class in (SetTemperatureUnit, GetTemperatureUnit):
-            self._state.unit = response
+            return {"unit": response}
         elif command_class == GetTimerStatus:
-            self._state.timer_value, self._state.timer_running = response
+            timer_value, timer_running = response
+            return {"timer_value": timer_value, "timer_running": timer_running}
         elif command_class == SetTimer:
-            self._state.timer_value = response
+            return {"timer_value": response}
         elif command_class == GetSpeakerStatus:
-            self._state.speaker_status = response
+            return {"speaker_status": response}
+        return {}
+
+    async def _apply_changes(self, changes: Dict[str, Any]) -> None:
+        """
+        Apply changes to the state. If any field actually changed, bump the state version and notify the
+        subscribers with the delta.
+        """
+        now = time.time()
+        for field in changes:
+            self._updated_at[field] = now
+
+        delta = {field: value for field, value in changes.items() if getattr(self._state, field) != value}
+        if not delta:
+            return
+
+        for field, value in delta.items():
+            setattr(self._state, field, value)
+        self._state.version += 1
+        self._state_changed.set()
+        self._state_changed = asyncio.Event()
+        await self._notify_state_change(DeviceStateDelta(version=self._state.version, **delta))
+
+    async def wait_for_change(self, version: int, timeout: float) -> bool:
+        """
+        Wait for the state to change past a version.
+        :param version: The version of the state known to the caller
+        :param timeout: The maximum time to wait, in seconds
+        :return: True if the state is newer than `version`, False if the timeout passed first
+        """
+        try:
+            async with asyncio.timeout(timeout):
+                while self._state.version <= version:
+                    await self._state_changed.wait()
+        except TimeoutError:
+            return False
+        return True
 
-    async def _notify_state_change(self) -> None:
+    async def _notify_state_change(self, delta: DeviceStateDelta) -> None:
         if self.id_card is None:
             logger.warning("Device ID is None when notifying state change")
             return
         if self._state_change_callback is not None:
-            await self._state_change_callback(self.id_card, self.state)
+            await self._state_change_callback(self.id_card, delta)
 
     async def close(self) -> None:
+        for pending in self._pending_writes.values():
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_exception(ConnectionResetError("Device closed"))
+        self._pending_writes.clear()
+        write_tasks = list(self._write_tasks.values())
+        for task in write_tasks:
+            task.cancel()
+        await asyncio.gather(*write_tasks, return_exceptions=True)
         await self.connection.close()
 
     async def start_cooking(self) -> bool:
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from enum import Enum
+from typing import Callable, Coroutine, Optional
+
+from pydantic import BaseModel
+
+from .event import AnovaEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_QUEUE_SIZE = 64
+
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+
+
+class DispatchStats(BaseModel):
+    depth: int
+    max_size: int
+    dispatched: int
+    dropped: int
+
+
+class EventDispatcher:
+    """
+    Delivers the events of a device from a bounded queue, in a dedicated consumer task.
+
+    The connection's read loop only enqueues the events and never waits for the downstream handlers, so a slow
+    subscriber can't delay the command responses. When the queue is full, events are dropped according to the
+    overflow policy.
+    """
+    _task: Optional[asyncio.Task[None]]
+
+    def __init__(self, handler: Callable[[AnovaEvent], Coroutine[None, None, None]],
+                 max_size: int = DEFAULT_EVENT_QUEUE_SIZE,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST):
+        self.handler = handler
+        self.overflow_policy = overflow_policy
+        self._queue: asyncio.Queue[AnovaEvent] = asyncio.Queue(maxsize=max_size)
+        self._task = None
+        self.dispatched = 0
+        self.dropped = 0
+
+    @property
+    def stats(self) -> DispatchStats:
+        return DispatchStats(
+            depth=self._queue.qsize(),
+            max_size=self._queue.maxsize,
+            dispatched=self.dispatched,
+            dropped=self.dropped,
+        )
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._consume())
+
+    def submit(self, event: AnovaEvent) -> None:
+        """
+        Enqueue an event for delivery, without blocking.
+        :param event: The event to deliver
+        """
+        if self._queue.full():
+            self.dropped += 1
+            if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                logger.warning(f"Event queue is full, dropping event: {event.type}")
+                return
+
+            dropped = self._queue.get_nowait()
+            self._queue.task_done()
+            logger.warning(f"Event queue is full, dropping oldest event: {dropped.type}")
+
+        self._queue.put_nowait(event)
+
+    async def join(self) -> None:
+        """Wait until all the queued events were delivered."""
+        await self._queue.join()
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            if task is asyncio.current_task():
+                return  # Closed by one of the handlers
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _consume(self) -> None:
+        while True:
+            event = await self._queue.get()
+            try:
+                await self.handler(event)
+                self.dispatched += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error dispatching event {event.type}: {repr(e)}")
+            finally:
+                self._queue.task_done()
@@ -1,3 +1,47 @@
+from operator import getitem
+from typing import Tuple, Union
+
+# The cipher rotates the i-th payload byte by ((i + 1) % 7) bits, so there are only 7 distinct rotations.
+# Each one is precomputed as a 256-byte translation table, and the codec never calls a Python function per byte:
+# - short frames (every command and response of the protocol) map each byte through the table of its position;
+# - long frames translate the 7 strided slices of the payload in place, one `bytearray.translate` call each.
+_SHIFT_PERIOD = 7
+_MAX_PAYLOAD = 255
+_STRIDED_THRESHOLD = 64  # Below this payload size, the fixed cost of slicing 7 times outweighs the per-byte lookup
+
+
+def _roll_shift(byte: int, n: int) -> int:
+    return ((byte << n) | (byte >> (8 - n))) & 0xFF
+
+
+def _reverse_roll_shift(byte: int, n: int) -> int:
+    return (byte >> n) | ((byte & ((1 << n) - 1)) << (8 - n))
+
+
+_ENCODE_TABLES: Tuple[bytes, ...] = tuple(
+    bytes(_roll_shift(b, (k + 1) % _SHIFT_PERIOD) for b in range(256)) for k in range(_SHIFT_PERIOD)
+)
+_DECODE_TABLES: Tuple[bytes, ...] = tuple(
+    bytes(_reverse_roll_shift(b, (k + 1) % _SHIFT_PERIOD) for b in range(256)) for k in range(_SHIFT_PERIOD)
+)
+
+# The table to use for the byte at each payload position
+_ENCODE_BY_POSITION = tuple(_ENCODE_TABLES[i % _SHIFT_PERIOD] for i in range(_MAX_PAYLOAD))
+_DECODE_BY_POSITION = tuple(_DECODE_TABLES[i % _SHIFT_PERIOD] for i in range(_MAX_PAYLOAD))
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _translate(payload: Buffer, tables: Tuple[bytes, ...], by_position: Tuple[bytes, ...]) -> bytearray:
+    if len(payload) < _STRIDED_THRESHOLD:
+        return bytearray(map(getitem, by_position, payload))
+
+    result = bytearray(payload)
+    for k in range(_SHIFT_PERIOD):
+        result[k::_SHIFT_PERIOD] = result[k::_SHIFT_PERIOD].translate(tables[k])
+    return result
+
+
 class Encoder:
     @staticmethod
     def encode(message: str) -> bytes:
@@ -7,44 +51,33 @@ class Encoder:
         :param message: The message to encode
         :return: The encoded message as bytes
         """
-        # Ensure the message ends with \n
+        # Ensure the message ends with \r
         if not message.endswith('\r'):
             message += '\r'
 
-        # Convert message to bytes
         message_bytes = message.encode('utf-8')
-
-        # Calculate length
         length = len(message_bytes)
+        if length > _MAX_PAYLOAD:
+            raise ValueError(f"Message too long: {length} bytes")
 
-        # Initialize result with header and length
-        result = bytearray([ord('h'), length])
-
-        # Initialize checksum
-        checksum = 0
-
-        # Process each byte of the message
-        for i, byte in enumerate(message_bytes):
-            n = (i + 1) % 7
-            encoded_byte = Encoder.roll_shift(byte, n)
-            result.append(encoded_byte)
-            checksum += encoded_byte
-
-        # Append checksum
-        result.append(checksum & 0xFF)
+        payload = _translate(message_bytes, _ENCODE_TABLES, _ENCODE_BY_POSITION)
+        checksum = sum(payload) & 0xFF
 
-        return bytes(result)
+        # header + length + payload + checksum
+        payload[0:0] = (ord('h'), length)
+        payload.append(checksum)
+        return bytes(payload)
 
     @staticmethod
     def roll_shift(byte: int, n: int) -> int:
-        return ((byte << n) | (byte >> (8 - n))) & 0xFF
+        return _roll_shift(byte, n)
 
     @staticmethod
     def reverse_roll_shift(byte: int, n: int) -> int:
-        return (byte >> n) | ((byte & ((1 << n) - 1)) << (8 - n))
+        return _reverse_roll_shift(byte, n)
 
     @staticmethod
-    def decode(data: bytes) -> str:
+    def decode(data: Buffer) -> str:
         """
         Decodes bytes to a message.
         If the message ends with \r, it will be removed.
@@ -60,23 +93,20 @@ class Encoder:
 
         length = data[1]
 
-        # Process all bytes except the very last one (which is likely a newline)
-        payload = data[2:2 + length + 1]  # header + length + payload + checksum
-        checksum_byte = payload[-1]  # The last byte of the payload is the checksum
+        payload = data[2:2 + length + 1]  # payload + checksum
+        return Encoder.decode_payload(payload[:-1], payload[-1])
 
-        chars = []
-        calculated_checksum = 0
-
-        for i, byte in enumerate(payload[:-1]):  # Exclude the checksum byte from processing
-            calculated_checksum += byte
-            n = (i + 1) % 7
-            decoded_byte = Encoder.reverse_roll_shift(byte, n)
-            chars.append(chr(decoded_byte))
-
-        if checksum_byte != calculated_checksum & 0xFF:
-            raise ValueError(f"Checksum mismatch. Expected: {checksum_byte:02X}, Calculated: {calculated_checksum:02X}")
-
-        decoded_message = ''.join(chars)
+    @staticmethod
+    def decode_payload(payload: Buffer, checksum: int) -> str:
+        """
+        Decodes the payload of a frame, without its header, length and checksum bytes.
+        :param payload: The encoded payload
+        :param checksum: The checksum byte received with the frame
+        :return: The decoded message as a string, without the trailing \r
+        """
+        calculated_checksum = sum(payload) & 0xFF
+        if checksum != calculated_checksum:
+            raise ValueError(f"Checksum mismatch. Expected: {checksum:02X}, Calculated: {calculated_checksum:02X}")
 
-        # Remove trailing newline if present
-        return decoded_message.rstrip('\r')
+        # Every decoded byte maps to the code point of the same value
+        return _translate(payload, _DECODE_TABLES, _DECODE_BY_POSITION).decode('latin-1').rstrip('\r')
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from functools import lru_cache
+from typing import AsyncIterator, List, Dict, Type
+
+from commands import AnovaCommand, FixedCommand
+from .encoding import Encoder
+
+logger = logging.getLogger(__name__)
+
+HEADER = ord('h')
+SYN = 0x16
+MIN_FRAME_LENGTH = 3  # header + length + checksum
+FRAME_CACHE_SIZE = 512
+
+_fixed_frames: Dict[Type[FixedCommand], bytes] = {}
+
+
+@lru_cache(maxsize=FRAME_CACHE_SIZE)
+def encode_frame(message: str) -> bytes:
+    """
+    Encode a message into its final wire bytes, including the SYN terminator.
+    The frames of the recently sent messages are cached, as devices are polled with the same few commands.
+    :param message: The message to encode
+    :return: The frame to write to the connection
+    """
+    return Encoder.encode(message) + bytes((SYN,))
+
+
+def command_frame(command: AnovaCommand) -> bytes:
+    """
+    Get the wire bytes of a command.
+    Fixed commands are encoded once for the lifetime of the process, parameterized ones go through the LRU cache.
+    :param command: The command to encode
+    :return: The frame to write to the connection
+    """
+    if isinstance(command, FixedCommand):
+        frame = _fixed_frames.get(type(command))
+        if frame is None:
+            frame = _fixed_frames[type(command)] = Encoder.encode(command.encode()) + bytes((SYN,))
+        return frame
+    return encode_frame(command.encode())
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for the `h<len><payload><checksum>[\x16]` frames of the WiFi protocol.
+
+    TCP doesn't preserve message boundaries: a single read may hold several frames, or only part of one.
+    The decoder keeps the unconsumed bytes in a reusable buffer, extracts every complete frame from it, and
+    resynchronizes on the next header byte when it meets garbage or a frame with an invalid checksum.
+    """
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self.dropped_bytes = 0
+
+    @property
+    def pending(self) -> int:
+        """The number of buffered bytes that are not part of a complete frame yet."""
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> List[str]:
+        """
+        Add received data to the buffer and decode all the complete frames in it.
+        :param data: The bytes received from the stream
+        :return: The decoded messages, in order
+        """
+        buffer = self._buffer
+        buffer += data
+
+        messages = []
+        end = len(buffer)
+        pos = 0
+        with memoryview(buffer) as view:
+            while pos < end:
+                if buffer[pos] == SYN:  # Frame terminator, possibly split from its frame
+                    pos += 1
+                    continue
+
+                start = buffer.find(HEADER, pos)
+                if start < 0:
+                    self._drop(pos, end)
+                    pos = end
+                    break
+                if start > pos:
+                    self._drop(pos, start)
+                    pos = start
+
+                if end - start < MIN_FRAME_LENGTH:
+                    break
+                frame_end = start + MIN_FRAME_LENGTH + buffer[start + 1]
+                if frame_end > end:
+                    break
+
+                try:
+                    with view[start + 2:frame_end - 1] as payload:
+                        messages.append(Encoder.decode_payload(payload, buffer[frame_end - 1]))
+                except ValueError:
+                    # Not an actual frame, resync on the next header byte
+                    self._drop(start, start + 1)
+                    pos = start + 1
+                    continue
+
+                pos = frame_end
+
+        del buffer[:pos]
+        return messages
+
+    async def messages(self, reader: asyncio.StreamReader, read_size: int = 1024) -> AsyncIterator[str]:
+        """
+        Read the stream until it's closed, yielding every decoded message.
+        :param reader: The stream to read from
+        :param read_size: The maximum number of bytes to read at once
+        :return: An async iterator of the decoded messages
+        """
+        while True:
+            data = await reader.read(read_size)
+            if not data:
+                raise ConnectionResetError("Connection closed by remote host")
+
+            for message in self.feed(data):
+                yield message
+
+    def _drop(self, start: int, end: int) -> None:
+        logger.debug(f"Dropping {end - start} unframed bytes: {self._buffer[start:end].hex()}")
+        self.dropped_bytes += end - start
@@ -1,29 +1,43 @@
-import asyncio
 import logging
 from typing import Dict, List, Callable, Coroutine, Any, Optional
 
+from .bus import EventBus, Topic, BusStats, ALL_DEVICES, DEFAULT_SUBSCRIBER_TIMEOUT
 from .connection import AnovaConnection
-from .device import AnovaDevice, DeviceState
+from .device import AnovaDevice, DeviceStateDelta
+from .dispatch import OverflowPolicy, DEFAULT_EVENT_QUEUE_SIZE
+from .polling import PollingIntervals
+from .scheduler import PollScheduler
 from .event import AnovaEvent
 from .server import AnovaServer
 
 logger = logging.getLogger(__name__)
 
-HEARTBEAT_INTERVAL = 3  # seconds
+MIN_POLL_INTERVAL = 0.5  # seconds
+MAX_CONCURRENT_POLLS = 100
 
 
 class AnovaManager:
     server: AnovaServer
     devices: Dict[str, AnovaDevice] = {}
-    _monitoring_tasks: Dict[str, asyncio.Task[None]] = {}
 
-    device_connected_callbacks: List[Optional[Callable[[AnovaDevice], Coroutine[None, None, None]]]] = []
-    device_disconnected_callbacks: Dict[str, Optional[Callable[[str], Coroutine[None, None, None]]]] = {}
-    device_state_change_callbacks: Dict[str, Optional[Callable[[str, DeviceState], Coroutine[None, None, None]]]] = {}
-    device_event_callbacks: Dict[str, Optional[Callable[[str, AnovaEvent], Coroutine[None, None, None]]]] = {}
-
-    def __init__(self, host: str = "0.0.0.0", port: int = 8080):
-        self.server = AnovaServer(host, port)
+    def __init__(self, host: str = "0.0.0.0", port: int = 8080, event_queue_size: int = DEFAULT_EVENT_QUEUE_SIZE,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 polling_intervals: Optional[PollingIntervals] = None,
+                 max_concurrent_polls: int = MAX_CONCURRENT_POLLS,
+                 subscriber_timeout: float = DEFAULT_SUBSCRIBER_TIMEOUT):
+        """
+        :param host: The address to listen on for devices
+        :param port: The port to listen on for devices
+        :param event_queue_size: The number of events buffered per device while the callbacks are busy
+        :param overflow_policy: Which events to drop when the event queue of a device is full
+        :param polling_intervals: The refresh intervals of the device state fields
+        :param max_concurrent_polls: The maximum number of devices polled at the same time
+        :param subscriber_timeout: The time a callback may take to handle a notification, in seconds
+        """
+        self.server = AnovaServer(host, port, event_queue_size, overflow_policy)
+        self.polling_intervals = polling_intervals
+        self.scheduler = PollScheduler(max_concurrency=max_concurrent_polls, min_interval=MIN_POLL_INTERVAL)
+        self.bus = EventBus(subscriber_timeout)
 
     async def start(self) -> None:
         """
@@ -31,6 +45,7 @@ class AnovaManager:
         :return:
         """
         self.server.on_connection(self._handle_new_connection)
+        self.scheduler.start()
         await self.server.start()
         logger.info(f"AsyncAnovaManager started on {self.server.host}:{self.server.port}")
 
@@ -39,21 +54,12 @@ class AnovaManager:
         Stop the AnovaManager and close all devices
         :return:
         """
-        await self._stop_all_monitoring_tasks()
+        await self.scheduler.stop()
         await self._close_all_devices()
         await self.server.stop()
 
         logger.info("AsyncAnovaManager stopped")
 
-    async def _stop_all_monitoring_tasks(self) -> None:
-        for device_id, task in self._monitoring_tasks.items():
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
-        self._monitoring_tasks.clear()
-
     async def _close_all_devices(self) -> None:
         for device in self.devices.values():
             await device.close()
@@ -74,77 +80,84 @@ class AnovaManager:
         """
         return self.devices.get(device_id)
 
+    @property
+    def bus_stats(self) -> BusStats:
+        return self.bus.stats
+
     def on_device_connected(self, callback: Callable[[AnovaDevice], Coroutine[Any, Any, None]]) -> int:
         """
         Register a callback for when a new device is connected
         :param callback: The callback function of the form `async def callback(device: AnovaDevice)`
-        :return: The callback ID
+        :return: The subscription token, see `unsubscribe`
         """
-        self.device_connected_callbacks.append(callback)
-        return len(self.device_connected_callbacks) - 1
+        return self.bus.subscribe(Topic.DEVICE_CONNECTED, ALL_DEVICES, callback)
 
-    def remove_device_connected_callback(self, callback_id: int) -> None:
-        """
-        Remove a device connected callback
-        :param callback_id: The callback ID returned by `on_device_connected`
-        :return: None
-        """
-        self.device_connected_callbacks[callback_id] = None
-
-    def on_device_disconnected(self, device_id: str, callback: Callable[[str], Coroutine[Any, Any, None]]) -> None:
+    def on_device_disconnected(self, device_id: str, callback: Callable[[str], Coroutine[Any, Any, None]]) -> int:
         """
         Register a callback for when a device is disconnected
         :param device_id: The device ID (use "*" for all devices)
         :param callback: The callback function of the form `async def callback(device_id: str)`
-        :return:
+        :return: The subscription token, see `unsubscribe`
         """
-        self.device_disconnected_callbacks[device_id] = callback
+        return self.bus.subscribe(Topic.DEVICE_DISCONNECTED, device_id, callback)
 
-    def remove_device_disconnected_callback(self, device_id: str) -> None:
+    def on_device_state_change(self, device_id: str,
+                               callback: Callable[[str, DeviceStateDelta], Coroutine[Any, Any, None]]) -> int:
         """
-        Remove a device disconnected callback
-        :param device_id:
-        :return:
+        Register a callback for when a device's state changes. Only called when a field actually changed.
+        :param device_id: The device ID (use "*" for all devices)
+        :param callback: The callback function of the form
+                         `async def callback(device_id: str, delta: DeviceStateDelta)`
+        :return: The subscription token, see `unsubscribe`
         """
-        self.device_disconnected_callbacks[device_id] = None
+        return self.bus.subscribe(Topic.STATE_CHANGED, device_id, callback)
 
-    def on_device_state_change(self, device_id: str,
-                               callback: Callable[[str, DeviceState], Coroutine[Any, Any, None]]) -> None:
+    def on_device_event(self, device_id: str, callback: Callable[[str, AnovaEvent], Coroutine[Any, Any, None]]) -> int:
         """
-        Register a callback for when a device's state changes
+        Register a callback for when a device sends an event
         :param device_id: The device ID (use "*" for all devices)
-        :param callback: The callback function of the form `async def callback(device_id: str, state: DeviceState)`
-        :return:
+        :param callback: The callback function of the form `async def callback(device_id: str, event: AnovaEvent)`
+        :return: The subscription token, see `unsubscribe`
         """
-        self.device_state_change_callbacks[device_id] = callback
+        return self.bus.subscribe(Topic.EVENT, device_id, callback)
 
-    def remove_device_state_change_callback(self, device_id: str) -> None:
+    def remove_device_connected_callback(self, callback_id: int) -> None:
+        """
+        Remove a device connected callback
+        :param callback_id: The subscription token returned by `on_device_connected`
         """
-        Remove a device state change callback
+        self.bus.unsubscribe(callback_id)
+
+    def remove_device_disconnected_callback(self, device_id: str) -> None:
+        """
+        Remove the device disconnected callbacks of a device
         :param device_id: The device ID (use "*" for all devices)
-        :return:
         """
-        self.device_state_change_callbacks[device_id] = None
+        self.bus.unsubscribe_topic(Topic.DEVICE_DISCONNECTED, device_id)
 
-    def on_device_event(self, device_id: str, callback: Callable[[str, AnovaEvent], Coroutine[Any, Any, None]]) -> None:
+    def remove_device_state_change_callback(self, device_id: str) -> None:
         """
-        Register a callback for when a device sends an event
+        Remove the device state change callbacks of a device
         :param device_id: The device ID (use "*" for all devices)
-        :param callback: The callback function of the form `async def callback(device_id: str, event: AnovaEvent)`
-        :return:
         """
-        self.device_event_callbacks[device_id] = callback
+        self.bus.unsubscribe_topic(Topic.STATE_CHANGED, device_id)
 
     def remove_device_event_callback(self, device_id: str) -> None:
         """
-        Remove a device event callback
+        Remove the device event callbacks of a device
         :param device_id: The device ID (use "*" for all devices)
-        :return:
         """
-        self.device_event_callbacks[device_id] = None
+        self.bus.unsubscribe_topic(Topic.EVENT, device_id)
+
+    def unsubscribe(self, token: int) -> None:
+        """
+        Remove a callback. The callbacks of a single device are removed when it disconnects.
+        :param token: The subscription token returned when registering the callback
+        """
+        self.bus.unsubscribe(token)
 
     async def _handle_new_connection(self, connection: AnovaConnection) -> None:
-        device = AnovaDevice(connection)
+        device = AnovaDevice(connection, self.polling_intervals)
         await device.perform_handshake()
 
         device_id = device.id_card
@@ -159,63 +172,30 @@ class AnovaManager:
         device.add_state_change_callback(self._handle_device_state_change)
         device.add_event_callback(self._handle_device_event)
 
-        self._monitoring_tasks[device_id] = asyncio.create_task(self._monitor_device(device))
+        self.scheduler.add(device_id, device.poll, on_error=self._handle_poll_error)
+        device.add_poll_request_callback(lambda: self.scheduler.wake(device_id))
 
         logger.info(f"New device connected: {device}")
 
-        for callback in self.device_connected_callbacks:
-            if callback:
-                await callback(device)
-
-    async def _monitor_device(self, device: AnovaDevice) -> None:
-        while True:
-            try:
-                await device.heartbeat()
-                await asyncio.sleep(HEARTBEAT_INTERVAL)
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                if device.id_card is None:
-                    logger.error(f"Device ID is None, closing connection: {e}")
-                    await device.close()
-                    break
-                logger.error(f"Error monitoring device {device.id_card}: {e}")
-                await self._handle_device_disconnection(device.id_card)
-                raise
+        await self.bus.publish(Topic.DEVICE_CONNECTED, device_id, device)
+
+    async def _handle_poll_error(self, device_id: str, e: Exception) -> None:
+        logger.error(f"Error polling device {device_id}: {e}")
+        await self._handle_device_disconnection(device_id)
 
     async def _handle_device_disconnection(self, device_id: str) -> None:
         if device_id in self.devices:
             device = self.devices.pop(device_id)
             logger.info(f"Device disconnected: {device}")
 
-            if device_id in self._monitoring_tasks:
-                self._monitoring_tasks[device_id].cancel()
-                del self._monitoring_tasks[device_id]
+            self.scheduler.remove(device_id)
 
             await device.close()
-            await self._handle_callback(device_id, self.device_disconnected_callbacks, device_id)
-
-            if device_id in self.device_disconnected_callbacks:
-                del self.device_disconnected_callbacks[device_id]
-            if device_id in self.device_state_change_callbacks:
-                del self.device_state_change_callbacks[device_id]
-            if device_id in self.device_event_callbacks:
-                del self.device_event_callbacks[device_id]
+            await self.bus.publish(Topic.DEVICE_DISCONNECTED, device_id, device_id)
+            self.bus.unsubscribe_device(device_id)
 
-    async def _handle_device_state_change(self, device_id: str, state: DeviceState) -> None:
-        await self._handle_callback(device_id, self.device_state_change_callbacks, device_id, state)
+    async def _handle_device_state_change(self, device_id: str, delta: DeviceStateDelta) -> None:
+        await self.bus.publish(Topic.STATE_CHANGED, device_id, device_id, delta)
 
     async def _handle_device_event(self, device_id: str, event: AnovaEvent) -> None:
-        await self._handle_callback(device_id, self.device_event_callbacks, device_id, event)
-
-    @staticmethod
-    async def _handle_callback(device_id: str, callback_dict: Dict[str, Optional[Callable]], *args,  # type: ignore
-                               **kwargs) -> None:
-        if "*" in callback_dict:
-            cb = callback_dict["*"]
-            if cb:
-                await cb(*args, **kwargs)
-        if device_id in callback_dict:
-            cb = callback_dict[device_id]
-            if cb:
-                await cb(*args, **kwargs)
+        await self.bus.publish(Topic.EVENT, device_id, device_id, event)
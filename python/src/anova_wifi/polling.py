@@ -0,0 +1,141 @@
+import time
+from enum import Enum
+from typing import Dict, List, Optional, Iterable, TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from commands import (
+    AnovaCommand,
+    DeviceStatus,
+    GetDeviceStatus,
+    GetTargetTemperature,
+    GetCurrentTemperature,
+    GetTemperatureUnit,
+    GetTimerStatus,
+    GetSpeakerStatus,
+)
+from .event import AnovaEvent, EventType
+
+if TYPE_CHECKING:
+    from .device import DeviceState
+
+
+class PolledField(str, Enum):
+    STATUS = "status"
+    TARGET_TEMPERATURE = "target_temperature"
+    CURRENT_TEMPERATURE = "current_temperature"
+    UNIT = "unit"
+    TIMER = "timer"
+    SPEAKER_STATUS = "speaker_status"
+
+
+FIELD_COMMANDS: Dict[PolledField, AnovaCommand] = {
+    PolledField.STATUS: GetDeviceStatus(),
+    PolledField.TARGET_TEMPERATURE: GetTargetTemperature(),
+    PolledField.CURRENT_TEMPERATURE: GetCurrentTemperature(),
+    PolledField.UNIT: GetTemperatureUnit(),
+    PolledField.TIMER: GetTimerStatus(),
+    PolledField.SPEAKER_STATUS: GetSpeakerStatus(),
+}
+
+# The fields that may have changed when the device reports an event
+EVENT_FIELDS: Dict[EventType, List[PolledField]] = {
+    EventType.ChangeParam: list(PolledField),
+    EventType.START: [PolledField.STATUS, PolledField.CURRENT_TEMPERATURE],
+    EventType.STOP: [PolledField.STATUS, PolledField.CURRENT_TEMPERATURE],
+    EventType.LOW_WATER: [PolledField.STATUS],
+    EventType.TEMP_REACHED: [PolledField.CURRENT_TEMPERATURE],
+    EventType.TIME_START: [PolledField.TIMER],
+    EventType.TIME_STOP: [PolledField.TIMER],
+    EventType.TIME_FINISH: [PolledField.TIMER, PolledField.STATUS],
+}
+
+
+class PollingIntervals(BaseModel):
+    """Refresh intervals of the device state fields, in seconds."""
+    status: float = 5
+    target_temperature: float = 30
+    current_temperature_heating: float = 2  # Running, and further than `near_target` from the target
+    current_temperature_running: float = 10
+    current_temperature_idle: float = 60
+    timer_running: float = 30
+    timer_idle: float = 60
+    unit: float = 300
+    speaker_status: float = 300
+    near_target: float = 1.0  # degrees
+
+
+class PollingPolicy:
+    """
+    Decides which fields of the device state should be refreshed, and when.
+
+    Every field has its own refresh interval, which adapts to the state of the device: the current temperature is
+    polled quickly while heating towards the target and slowly when idle, while the unit and speaker status that
+    almost never change are polled rarely. Events invalidate the fields they may have changed, so they are
+    refreshed on the next poll.
+    """
+
+    def __init__(self, intervals: Optional[PollingIntervals] = None):
+        self.intervals = intervals or PollingIntervals()
+        self._last_polled: Dict[PolledField, float] = {}
+
+    def interval(self, field: PolledField, state: 'DeviceState') -> float:
+        intervals = self.intervals
+        if field == PolledField.CURRENT_TEMPERATURE:
+            if state.status != DeviceStatus.RUNNING:
+                return intervals.current_temperature_idle
+            if abs(state.target_temperature - state.current_temperature) > intervals.near_target:
+                return intervals.current_temperature_heating
+            return intervals.current_temperature_running
+        if field == PolledField.TIMER:
+            return intervals.timer_running if state.timer_running else intervals.timer_idle
+        if field == PolledField.STATUS:
+            return intervals.status
+        if field == PolledField.TARGET_TEMPERATURE:
+            return intervals.target_temperature
+        if field == PolledField.UNIT:
+            return intervals.unit
+        return intervals.speaker_status
+
+    def due(self, state: 'DeviceState', now: Optional[float] = None) -> List[PolledField]:
+        """
+        :return: The fields that should be refreshed now
+        """
+        now = time.monotonic() if now is None else now
+        return [field for field in PolledField if self._next_poll(field, state) <= now]
+
+    def delay(self, state: 'DeviceState', now: Optional[float] = None) -> float:
+        """
+        :return: The number of seconds until the next field should be refreshed
+        """
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(self._next_poll(field, state) for field in PolledField) - now)
+
+    def mark_polled(self, fields: Iterable[PolledField], now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        for field in fields:
+            self._last_polled[field] = now
+
+    def invalidate(self, fields: Optional[Iterable[PolledField]] = None) -> None:
+        """
+        Refresh the fields on the next poll.
+        :param fields: The fields to refresh, or all of them
+        """
+        for field in (PolledField if fields is None else fields):
+            self._last_polled.pop(field, None)
+
+    def invalidate_for_event(self, event: AnovaEvent) -> bool:
+        """
+        Refresh the fields an event may have changed on the next poll.
+        :return: True if any field was invalidated
+        """
+        fields = EVENT_FIELDS.get(event.type)
+        if not fields:
+            return False
+        self.invalidate(fields)
+        return True
+
+    def _next_poll(self, field: PolledField, state: 'DeviceState') -> float:
+        if field not in self._last_polled:
+            return 0.0
+        return self._last_polled[field] + self.interval(field, state)
@@ -0,0 +1,134 @@
+import asyncio
+import bisect
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+DEFAULT_AGING = 1.0  # seconds
+
+# Upper bounds of the wait histogram buckets, in seconds
+WAIT_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class CommandPriority(IntEnum):
+    """The priority of a command on a device connection. Lower values go first."""
+    INTERACTIVE = 0  # Commands of users, waiting on the response
+    POLL = 1  # Background refreshes of the device state
+
+
+class WaitStats(BaseModel):
+    count: int
+    p50: float
+    p99: float
+    max: float
+    buckets: Dict[str, int]  # Upper bound of the bucket in seconds ("inf" for the last one) -> count
+
+
+class WaitHistogram:
+    """A fixed-bucket histogram of the time commands waited for the connection."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, wait: float) -> None:
+        self.counts[bisect.bisect_left(WAIT_BUCKETS, wait)] += 1
+        self.count += 1
+        self.max = max(self.max, wait)
+
+    def percentile(self, p: float) -> float:
+        """
+        :return: The upper bound of the bucket holding the percentile, capped by the maximal wait
+        """
+        if not self.count:
+            return 0.0
+        rank = p * self.count
+        seen = 0
+        for bound, count in zip(WAIT_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    @property
+    def stats(self) -> WaitStats:
+        bounds = [str(bound) for bound in WAIT_BUCKETS] + ["inf"]
+        return WaitStats(
+            count=self.count,
+            p50=self.percentile(0.5),
+            p99=self.percentile(0.99),
+            max=self.max,
+            buckets=dict(zip(bounds, self.counts)),
+        )
+
+
+class PriorityLock:
+    """
+    A lock granted to the waiter of the highest priority, FIFO within a priority.
+
+    So that low priority waiters can't be starved by a steady stream of high priority ones, a waiter that has waited
+    longer than `aging` seconds is granted the lock first, whatever its priority. The time spent waiting for the lock
+    is recorded per priority.
+    """
+
+    def __init__(self, aging: float = DEFAULT_AGING):
+        self.aging = aging
+        self._locked = False
+        self._waiters: Dict[CommandPriority, Deque[Tuple[float, asyncio.Future[None]]]] = {
+            priority: deque() for priority in CommandPriority
+        }
+        self.histograms = {priority: WaitHistogram() for priority in CommandPriority}
+
+    def locked(self) -> bool:
+        return self._locked
+
+    @property
+    def stats(self) -> Dict[CommandPriority, WaitStats]:
+        return {priority: histogram.stats for priority, histogram in self.histograms.items()}
+
+    @asynccontextmanager
+    async def acquire(self, priority: CommandPriority = CommandPriority.INTERACTIVE) -> AsyncIterator[None]:
+        start = time.monotonic()
+        if self._locked or any(self._waiters.values()):
+            waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+            entry = (start, waiter)
+            self._waiters[priority].append(entry)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()  # The lock was granted just as the waiter was cancelled, pass it on
+                else:
+                    self._waiters[priority].remove(entry)
+                raise
+        self._locked = True
+        self.histograms[priority].record(time.monotonic() - start)
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        waiter = self._next_waiter()
+        if waiter is None:
+            self._locked = False
+        else:
+            waiter.set_result(None)
+
+    def _next_waiter(self) -> Optional[asyncio.Future[None]]:
+        queues: List[Deque[Tuple[float, asyncio.Future[None]]]] = [
+            queue for queue in self._waiters.values() if queue
+        ]
+        if not queues:
+            return None
+
+        oldest = min(queues, key=lambda queue: queue[0][0])
+        if time.monotonic() - oldest[0][0] >= self.aging:
+            return oldest.popleft()[1]
+        return queues[0].popleft()[1]
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import Callable, Coroutine, Dict, Generic, Hashable, List, Optional, Set, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+
+Job = Callable[[], Coroutine[None, None, float]]
+ErrorHandler = Callable[[str, Exception], Coroutine[None, None, None]]
+
+LAG_SAMPLES = 1024
+
+
+class HashedTimerWheel(Generic[K]):
+    """
+    A hashed timer wheel: timers are hashed by their expiry tick into a fixed ring of slots.
+    Scheduling and cancelling are O(1), and advancing the wheel only visits the slots of the elapsed ticks.
+    """
+
+    def __init__(self, tick: float = 0.1, slots: int = 512, now: Optional[float] = None):
+        self.tick = tick
+        self._slots: List[Dict[K, int]] = [{} for _ in range(slots)]
+        self._timers: Dict[K, int] = {}  # key -> expiry tick
+        self._cursor = self._tick_of(time.monotonic() if now is None else now)
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: K, deadline: float) -> None:
+        """
+        Schedule a timer, replacing the previous timer of the same key.
+        :param key: The timer key
+        :param deadline: The monotonic time at which the timer expires
+        """
+        self.cancel(key)
+        expiry = max(math.ceil(deadline / self.tick), self._cursor + 1)
+        self._timers[key] = expiry
+        self._slots[expiry % len(self._slots)][key] = expiry
+
+    def cancel(self, key: K) -> None:
+        expiry = self._timers.pop(key, None)
+        if expiry is not None:
+            del self._slots[expiry % len(self._slots)][key]
+
+    def deadline(self, key: K) -> Optional[float]:
+        expiry = self._timers.get(key)
+        return None if expiry is None else expiry * self.tick
+
+    def advance(self, now: float) -> List[K]:
+        """
+        Advance the wheel to the given time, and remove the expired timers.
+        :param now: The current monotonic time
+        :return: The keys of the expired timers
+        """
+        target = self._tick_of(now)
+        if target <= self._cursor:
+            return []
+
+        expired: List[K] = []
+        slot_count = len(self._slots)
+        ticks = range(self._cursor + 1, target + 1) if target - self._cursor < slot_count else range(slot_count)
+        for tick in ticks:
+            slot = self._slots[tick % slot_count]
+            if not slot:
+                continue
+            due = [key for key, expiry in slot.items() if expiry <= target]
+            for key in due:
+                del slot[key]
+                del self._timers[key]
+            expired.extend(due)
+
+        self._cursor = target
+        return expired
+
+    def _tick_of(self, t: float) -> int:
+        return math.floor(t / self.tick)
+
+
+class SchedulerStats(BaseModel):
+    jobs: int
+    running: int
+    waiting: int
+    max_concurrency: int
+    lag_p50: float
+    lag_p99: float
+    lag_max: float
+
+
+class PollScheduler:
+    """
+    Runs the periodic work of all the devices from a single timer wheel, instead of one sleeping task per device.
+
+    Each job returns the number of seconds until it should run again. The first run of a job is spread randomly
+    over `initial_jitter` seconds, and every delay is jittered by `jitter_ratio`, so devices that connected at the
+    same moment don't poll in lockstep. At most `max_concurrency` jobs run at once. The schedule lag, the time
+    between a job's deadline and the moment it actually starts, is recorded.
+    """
+    _task: Optional[asyncio.Task[None]]
+
+    def __init__(self, tick: float = 0.1, max_concurrency: int = 100, initial_jitter: float = 3.0,
+                 jitter_ratio: float = 0.1, min_interval: float = 0.5):
+        self.tick = tick
+        self.max_concurrency = max_concurrency
+        self.initial_jitter = initial_jitter
+        self.jitter_ratio = jitter_ratio
+        self.min_interval = min_interval
+        self._wheel: HashedTimerWheel[str] = HashedTimerWheel(tick)
+        self._jobs: Dict[str, Job] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._error_handlers: Dict[str, ErrorHandler] = {}
+        self._running: Dict[str, asyncio.Task[None]] = {}
+        self._woken: Set[str] = set()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._lags: List[float] = []
+        self._lag_index = 0
+        self._task = None
+
+    @property
+    def stats(self) -> SchedulerStats:
+        lags = sorted(self._lags)
+
+        def percentile(p: float) -> float:
+            return lags[min(len(lags) - 1, int(p * len(lags)))] if lags else 0.0
+
+        return SchedulerStats(
+            jobs=len(self._jobs),
+            running=len(self._running) - self._waiting,
+            waiting=self._waiting,
+            max_concurrency=self.max_concurrency,
+            lag_p50=percentile(0.5),
+            lag_p99=percentile(0.99),
+            lag_max=lags[-1] if lags else 0.0,
+        )
+
+    def add(self, key: str, job: Job, on_error: Optional[ErrorHandler] = None) -> None:
+        """
+        Schedule a periodic job.
+        :param key: The job key, usually the device ID
+        :param job: The job, returning the number of seconds until its next run
+        :param on_error: Called with the key and the exception when the job fails. A failed job is removed.
+        """
+        self.remove(key)
+        self._jobs[key] = job
+        if on_error:
+            self._error_handlers[key] = on_error
+        self._schedule(key, time.monotonic() + random.uniform(0, self.initial_jitter))
+
+    def remove(self, key: str) -> None:
+        self._jobs.pop(key, None)
+        self._error_handlers.pop(key, None)
+        self._woken.discard(key)
+        self._wheel.cancel(key)
+        self._deadlines.pop(key, None)
+        task = self._running.pop(key, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+
+    def wake(self, key: str) -> None:
+        """
+        Run a job as soon as possible.
+        If the job is currently running, it runs again right after it completes.
+        """
+        if key not in self._jobs:
+            return
+        if key in self._running:
+            self._woken.add(key)
+        else:
+            self._schedule(key, time.monotonic())
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = list(self._running.values())
+        if self._task:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._running.clear()
+
+    async def _run(self) -> None:
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+            now = time.monotonic()
+            if now - next_tick > self.tick:  # The loop fell behind, don't try to catch up tick by tick
+                next_tick = now
+
+            for key in self._wheel.advance(now):
+                if key in self._jobs and key not in self._running:
+                    self._running[key] = asyncio.create_task(self._execute(key))
+
+    async def _execute(self, key: str) -> None:
+        job = self._jobs[key]
+        deadline = self._deadlines.pop(key, time.monotonic())
+        try:
+            self._waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self._waiting -= 1
+
+            try:
+                self._record_lag(max(0.0, time.monotonic() - deadline))
+                delay = await job()
+            finally:
+                self._semaphore.release()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled job {key} failed: {repr(e)}")
+            on_error = self._error_handlers.get(key)
+            self._running.pop(key, None)
+            self.remove(key)
+            if on_error:
+                await on_error(key, e)
+            return
+
+        self._running.pop(key, None)
+        if key not in self._jobs:
+            return
+        if key in self._woken:
+            self._woken.discard(key)
+            delay = 0.0
+        else:
+            delay = max(delay, self.min_interval)
+            delay *= random.uniform(1 - self.jitter_ratio, 1 + self.jitter_ratio)
+        self._schedule(key, time.monotonic() + delay)
+
+    def _schedule(self, key: str, deadline: float) -> None:
+        self._deadlines[key] = deadline
+        self._wheel.schedule(key, deadline)
+
+    def _record_lag(self, lag: float) -> None:
+        if len(self._lags) < LAG_SAMPLES:
+            self._lags.append(lag)
+        else:
+            self._lags[self._lag_index] = lag
+            self._lag_index = (self._lag_index + 1) % LAG_SAMPLES
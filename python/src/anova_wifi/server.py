@@ -3,6 +3,7 @@ import logging
 from typing import Callable, Coroutine
 
 from .connection import AnovaConnection
+from .dispatch import OverflowPolicy, DEFAULT_EVENT_QUEUE_SIZE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -15,9 +16,12 @@ class AnovaServer:
     server: asyncio.Server
     connection_callback: Callable[[AnovaConnection], Coroutine[None, None, None]]
 
-    def __init__(self, host: str = "0.0.0.0", port: int = 8080):
+    def __init__(self, host: str = "0.0.0.0", port: int = 8080, event_queue_size: int = DEFAULT_EVENT_QUEUE_SIZE,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST):
         self.host = host
         self.port = port
+        self.event_queue_size = event_queue_size
+        self.overflow_policy = overflow_policy
 
     async def start(self) -> None:
         self.server = await asyncio.start_server(
@@ -37,7 +41,7 @@ class AnovaServer:
         self.connection_callback = callback
 
     async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
-        connection = AnovaConnection(reader, writer)
+        connection = AnovaConnection(reader, writer, self.event_queue_size, self.overflow_policy)
         logger.info(f'New connection from {writer.transport.get_extra_info("peername")}')
         connection.start_listening()
         if self.connection_callback:  # type: ignore
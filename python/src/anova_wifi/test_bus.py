@@ -0,0 +1,75 @@
+import asyncio
+import time
+from typing import Callable, Coroutine, List
+
+from .bus import EventBus, Topic, ALL_DEVICES
+
+
+def test_many_subscribers() -> None:
+    async def run() -> None:
+        bus = EventBus()
+        received: List[str] = []
+
+        def subscriber(name: str) -> Callable[[str], Coroutine[None, None, None]]:
+            async def callback(device_id: str) -> None:
+                received.append(f"{name}:{device_id}")
+
+            return callback
+
+        bus.subscribe(Topic.DEVICE_DISCONNECTED, ALL_DEVICES, subscriber("all"))
+        first = bus.subscribe(Topic.DEVICE_DISCONNECTED, "a", subscriber("first"))
+        bus.subscribe(Topic.DEVICE_DISCONNECTED, "a", subscriber("second"))
+        bus.subscribe(Topic.EVENT, "a", subscriber("event"))
+
+        await bus.publish(Topic.DEVICE_DISCONNECTED, "a", "a")
+        assert sorted(received) == ["all:a", "first:a", "second:a"]
+
+        received.clear()
+        bus.unsubscribe(first)
+        await bus.publish(Topic.DEVICE_DISCONNECTED, "a", "a")
+        await bus.publish(Topic.DEVICE_DISCONNECTED, "b", "b")
+        assert sorted(received) == ["all:a", "all:b", "second:a"]
+
+        received.clear()
+        bus.unsubscribe_topic(Topic.DEVICE_DISCONNECTED, "a")
+        await bus.publish(Topic.DEVICE_DISCONNECTED, "a", "a")
+        await bus.publish(Topic.EVENT, "a", "a")
+        assert sorted(received) == ["all:a", "event:a"]
+
+        received.clear()
+        bus.unsubscribe_device("a")
+        await bus.publish(Topic.EVENT, "a", "a")
+        assert received == []
+        assert bus.stats.subscriptions == 1
+
+    asyncio.run(run())
+
+
+def test_slow_and_failing_subscribers_are_isolated() -> None:
+    async def run() -> None:
+        bus = EventBus(timeout=0.05)
+        received: List[str] = []
+
+        async def slow(device_id: str) -> None:
+            await asyncio.sleep(1)
+
+        async def failing(device_id: str) -> None:
+            raise RuntimeError("boom")
+
+        async def fast(device_id: str) -> None:
+            received.append(device_id)
+
+        for callback in (slow, failing, fast):
+            bus.subscribe(Topic.DEVICE_DISCONNECTED, ALL_DEVICES, callback)
+
+        start = time.monotonic()
+        await bus.publish(Topic.DEVICE_DISCONNECTED, "a", "a")
+        assert time.monotonic() - start < 0.5
+        assert received == ["a"]
+
+        stats = bus.stats
+        assert stats.published == 1
+        assert stats.timeouts == 1
+        assert stats.failures == 1
+
+    asyncio.run(run())
@@ -0,0 +1,206 @@
+import asyncio
+from typing import Callable, List, cast
+
+import pytest
+
+from . import connection as connection_module
+from .connection import AnovaConnection, PipelineInterruptedError
+from .dispatch import OverflowPolicy
+from .encoding import Encoder
+from .event import AnovaEvent, EventType
+from .framing import FrameDecoder
+
+RESPONSES = {
+    "status": "running",
+    "read set temp": "57.5",
+    "read temp": "28.6",
+    "read unit": "c",
+}
+
+
+class LoopbackWriter:
+    """Stands for the socket of a device: answers every command written to it on the connection's reader."""
+
+    def __init__(self, reader: asyncio.StreamReader, respond: Callable[[str], List[str]]):
+        self.reader = reader
+        self.respond = respond
+        self.writes: List[bytes] = []
+        self._decoder = FrameDecoder()
+
+    def write(self, data: bytes) -> None:
+        self.writes.append(data)
+        replies = [reply for command in self._decoder.feed(data) for reply in self.respond(command)]
+        self.reader.feed_data(b''.join(Encoder.encode(reply) + b'\x16' for reply in replies))
+
+    async def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.reader.feed_eof()
+
+    async def wait_closed(self) -> None:
+        pass
+
+
+def connect(respond: Callable[[str], List[str]]) -> AnovaConnection:
+    reader = asyncio.StreamReader()
+    writer = LoopbackWriter(reader, respond)
+    connection = AnovaConnection(reader, cast(asyncio.StreamWriter, writer))
+    connection.start_listening()
+    return connection
+
+
+def test_pipelined_batch() -> None:
+    async def run() -> None:
+        connection = connect(lambda command: [RESPONSES[command]])
+        responses = await connection.send_commands(list(RESPONSES))
+        assert responses == list(RESPONSES.values())
+
+        writer = cast(LoopbackWriter, connection.writer)
+        assert len(writer.writes) == 1
+        await connection.close()
+
+    asyncio.run(run())
+
+
+def test_serial_batch() -> None:
+    async def run() -> None:
+        connection = connect(lambda command: [RESPONSES[command]])
+        responses = await connection.send_commands(list(RESPONSES), pipelined=False)
+        assert responses == list(RESPONSES.values())
+
+        writer = cast(LoopbackWriter, connection.writer)
+        assert len(writer.writes) == len(RESPONSES)
+        await connection.close()
+
+    asyncio.run(run())
+
+
+def test_event_interrupts_batch() -> None:
+    events: List[AnovaEvent] = []
+
+    async def on_event(event: AnovaEvent) -> None:
+        events.append(event)
+
+    def respond(command: str) -> List[str]:
+        if command == "read temp":
+            return ["event wifi stop", RESPONSES[command]]
+        return [RESPONSES[command]]
+
+    async def run() -> None:
+        connection = connect(respond)
+        connection.set_event_callback(on_event)
+        with pytest.raises(PipelineInterruptedError) as e:
+            await connection.send_commands(list(RESPONSES))
+        assert e.value.responses == list(RESPONSES.values())
+
+        # A single command can't be interleaved with the event
+        assert await connection.send_command("read temp") == "28.6"
+        await connection.dispatcher.join()
+        await connection.close()
+
+    asyncio.run(run())
+    assert [event.type for event in events] == [EventType.STOP, EventType.STOP]
+
+
+def test_slow_event_handler_does_not_block_responses() -> None:
+    handled = asyncio.Event()
+
+    async def slow_handler(event: AnovaEvent) -> None:
+        await handled.wait()
+
+    def respond(command: str) -> List[str]:
+        return ["event wifi start", "event wifi stop", "event wifi start", RESPONSES[command]]
+
+    async def run() -> None:
+        reader = asyncio.StreamReader()
+        connection = AnovaConnection(reader, cast(asyncio.StreamWriter, LoopbackWriter(reader, respond)),
+                                     event_queue_size=1, overflow_policy=OverflowPolicy.DROP_OLDEST)
+        connection.set_event_callback(slow_handler)
+        connection.start_listening()
+
+        assert await connection.send_command("status") == "running"
+        # The 3 events were read at once, before the handler got the last one
+        stats = connection.event_stats
+        assert stats.dropped == 2
+        assert stats.dispatched == 0
+
+        handled.set()
+        await connection.dispatcher.join()
+        assert connection.event_stats.dispatched == 1
+        await connection.close()
+
+    asyncio.run(run())
+
+
+def test_late_response_is_not_matched_to_the_next_command(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(connection_module, "COMMAND_TIMEOUT", 0.05)
+
+    def respond(command: str) -> List[str]:
+        if command == "status":
+            return []  # Answered late, along with the next command
+        return ["running", RESPONSES[command]] if command == "read temp" else [RESPONSES[command]]
+
+    async def run() -> None:
+        connection = connect(respond)
+        with pytest.raises(TimeoutError):
+            await connection.send_command("status")
+        assert await connection.send_command("read temp") == "28.6"
+        assert await connection.send_command("read unit") == "c"
+        await connection.close()
+
+    asyncio.run(run())
+
+
+def test_unanswered_command_is_no_longer_expected(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(connection_module, "COMMAND_TIMEOUT", 0.05)
+
+    def respond(command: str) -> List[str]:
+        return [] if command == "status" else [RESPONSES[command]]  # Never answers status
+
+    async def run() -> None:
+        connection = connect(respond)
+        with pytest.raises(TimeoutError):
+            await connection.send_command("status")
+        await asyncio.sleep(0.06)  # The response of status is no longer expected
+        assert await connection.send_command("read temp") == "28.6"
+        await connection.close()
+
+    asyncio.run(run())
+
+
+def test_responses_of_a_failed_batch_are_discarded() -> None:
+    def respond(command: str) -> List[str]:
+        if command == "bad command":
+            return ["Invalid Command"]
+        if command == "status":
+            return []  # Answered late, along with the next command
+        return ["running", RESPONSES[command]] if command == "read unit" else [RESPONSES[command]]
+
+    async def run() -> None:
+        connection = connect(respond)
+        with pytest.raises(ValueError):
+            await connection.send_commands(["bad command", "status"])
+        assert await connection.send_command("read unit") == "c"
+        assert await connection.send_command("read temp") == "28.6"
+        await connection.close()
+
+    asyncio.run(run())
+
+
+def test_connections_are_independent() -> None:
+    async def run() -> None:
+        slow = connect(lambda command: [])  # Never answers
+        fast = connect(lambda command: [RESPONSES[command]])
+
+        slow_command = asyncio.create_task(slow.send_command("status"))
+        await asyncio.sleep(0)
+        assert slow.cmd_lock.locked()
+        assert not fast.cmd_lock.locked()
+        assert await fast.send_command("read unit") == "c"
+
+        slow_command.cancel()
+        await slow.close()
+        await fast.close()
+
+    asyncio.run(run())
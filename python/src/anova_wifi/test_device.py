@@ -0,0 +1,168 @@
+import asyncio
+from typing import Callable, List, Tuple, cast
+
+import pytest
+
+from commands import DeviceStatus, GetCurrentTemperature, GetTimerStatus, SetTargetTemperature, TemperatureUnit
+from .device import AnovaDevice, DeviceStateDelta, HEARTBEAT_COMMANDS
+from .event import AnovaEvent, EventType
+from .test_connection import LoopbackWriter, connect
+
+RESPONSES = {
+    "status": "running",
+    "read set temp": "57.5",
+    "read temp": "28.6",
+    "read unit": "c",
+    "read timer": "10 running",
+    "speaker status": "speaker on",
+}
+
+
+def make_device(respond: Callable[[str], str]) -> Tuple[AnovaDevice, List[DeviceStateDelta]]:
+    device = AnovaDevice(connect(lambda command: [respond(command)]))
+    device.id_card = "anova test"
+    deltas: List[DeviceStateDelta] = []
+
+    async def on_state_change(device_id: str, delta: DeviceStateDelta) -> None:
+        deltas.append(delta)
+
+    device.add_state_change_callback(on_state_change)
+    return device, deltas
+
+
+def test_poll_notifies_changes_once() -> None:
+    async def run() -> None:
+        device, deltas = make_device(RESPONSES.__getitem__)
+        await device.send_commands(HEARTBEAT_COMMANDS)
+
+        assert len(deltas) == 1
+        assert deltas[0].version == device.state.version == 1
+        assert deltas[0].changes == {
+            "status": DeviceStatus.RUNNING,
+            "target_temperature": 57.5,
+            "current_temperature": 28.6,
+            "unit": TemperatureUnit.CELSIUS,
+            "timer_value": 10,
+            "timer_running": True,
+            "speaker_status": True,
+        }
+        await device.close()
+
+    asyncio.run(run())
+
+
+def test_unchanged_state_is_not_notified() -> None:
+    async def run() -> None:
+        responses = dict(RESPONSES)
+        device, deltas = make_device(responses.__getitem__)
+        await device.send_commands(HEARTBEAT_COMMANDS)
+        await device.send_commands(HEARTBEAT_COMMANDS)
+        assert len(deltas) == 1
+
+        responses["read temp"] = "29.1"
+        await device.send_commands(HEARTBEAT_COMMANDS)
+        assert len(deltas) == 2
+        assert deltas[1].version == 2
+        assert deltas[1].changes == {"current_temperature": 29.1}
+        assert deltas[1].model_dump() == {"version": 2, "current_temperature": 29.1}
+
+        await device.send_command(GetCurrentTemperature())
+        assert device.state.version == 2
+        await device.close()
+
+    asyncio.run(run())
+
+
+def test_event_delta() -> None:
+    async def run() -> None:
+        device, deltas = make_device(RESPONSES.__getitem__)
+        await device.handle_event(AnovaEvent(type=EventType.STOP))  # Stopped is the initial status
+        await device.handle_event(AnovaEvent(type=EventType.START))
+        await device.handle_event(AnovaEvent(type=EventType.START))
+        assert [delta.changes for delta in deltas] == [{"status": DeviceStatus.RUNNING}]
+        await device.close()
+
+    asyncio.run(run())
+
+
+def test_wait_for_change() -> None:
+    async def run() -> None:
+        device, _ = make_device(RESPONSES.__getitem__)
+        assert not await device.wait_for_change(0, timeout=0.01)
+
+        waiter = asyncio.create_task(device.wait_for_change(0, timeout=1))
+        await asyncio.sleep(0)
+        await device.handle_event(AnovaEvent(type=EventType.START))
+        assert await waiter
+        assert await device.wait_for_change(0, timeout=0)  # Already newer
+        await device.close()
+
+    asyncio.run(run())
+
+
+def test_concurrent_reads_share_one_request() -> None:
+    async def run() -> None:
+        device, _ = make_device(RESPONSES.__getitem__)
+        writer = cast(LoopbackWriter, device.connection.writer)
+
+        temperatures = await asyncio.gather(*(device.read(GetCurrentTemperature(), max_age=0) for _ in range(10)))
+        assert temperatures == [28.6] * 10
+        assert len(writer.writes) == 1
+
+        assert await device.read(GetTimerStatus(), max_age=0) == (10, True)
+        assert len(writer.writes) == 2
+        await device.close()
+
+    asyncio.run(run())
+
+
+def test_read_max_age() -> None:
+    async def run() -> None:
+        device, _ = make_device(RESPONSES.__getitem__)
+        writer = cast(LoopbackWriter, device.connection.writer)
+
+        assert await device.read(GetCurrentTemperature()) == 0.0  # Any age, from the state
+        assert await device.read(GetCurrentTemperature(), max_age=60) == 28.6  # Never reported
+        assert await device.read(GetCurrentTemperature(), max_age=60) == 28.6
+        assert len(writer.writes) == 1
+        assert device.age("current_temperature") < 60
+
+        assert await device.read(GetCurrentTemperature(), max_age=0) == 28.6
+        assert len(writer.writes) == 2
+        await device.close()
+
+    asyncio.run(run())
+
+
+def test_writes_are_coalesced() -> None:
+    async def run() -> None:
+        device, _ = make_device(lambda command: command.removeprefix("set temp "))
+        writer = cast(LoopbackWriter, device.connection.writer)
+
+        first = asyncio.create_task(device.write(SetTargetTemperature(50, TemperatureUnit.CELSIUS)))
+        await asyncio.sleep(0)  # The first write is in flight
+        burst = [asyncio.create_task(device.write(SetTargetTemperature(t, TemperatureUnit.CELSIUS)))
+                 for t in (51, 52, 53)]
+
+        assert await asyncio.gather(first, *burst) == ["53.0"] * 4
+        assert len(writer.writes) == 2
+        await device.close()
+
+    asyncio.run(run())
+
+
+def test_close_fails_the_pending_writes() -> None:
+    async def run() -> None:
+        device = AnovaDevice(connect(lambda command: []))  # Never answers
+
+        in_flight = asyncio.create_task(device.write(SetTargetTemperature(50, TemperatureUnit.CELSIUS)))
+        await asyncio.sleep(0)
+        pending = asyncio.create_task(device.write(SetTargetTemperature(51, TemperatureUnit.CELSIUS)))
+        await asyncio.sleep(0)
+        await device.close()
+
+        for write in (in_flight, pending):
+            with pytest.raises(ConnectionResetError):
+                await write
+
+    asyncio.run(run())
@@ -34,3 +34,25 @@ def test_async_encoder_decode(original_bytes: bytes, expected_length: int, expec
 def test_async_encoder_encode(original_bytes: bytes, expected_length: int, expected_decoded: str) -> None:
     re_encoded = Encoder.encode(expected_decoded)
     assert re_encoded == original_bytes, f"Expected: {original_bytes!r}, Got: {re_encoded!r}"
+
+
+@pytest.mark.parametrize("n", range(7))
+def test_rotation_tables_match_roll_shift(n: int) -> None:
+    message = bytes(range(1, 128))
+    encoded = Encoder.encode(message.decode('ascii'))
+    for i, byte in enumerate(message):
+        if (i + 1) % 7 == n:
+            assert encoded[2 + i] == Encoder.roll_shift(byte, n)
+            assert Encoder.reverse_roll_shift(encoded[2 + i], n) == byte
+
+
+def test_decode_accepts_memoryview() -> None:
+    encoded = Encoder.encode("read set temp") + b'\x16'
+    assert Encoder.decode(memoryview(encoded)) == "read set temp"
+
+
+def test_decode_checksum_mismatch() -> None:
+    encoded = bytearray(Encoder.encode("status"))
+    encoded[-1] ^= 0xFF
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        Encoder.decode(bytes(encoded))
@@ -0,0 +1,87 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from commands import GetDeviceStatus, SetTimer
+from .encoding import Encoder
+from .framing import FrameDecoder, command_frame
+
+MESSAGES = ["status running 30.2 c", "57.5", "event wifi stop", "0 stopped", "speaker is on"]
+
+
+def frames(messages: List[str], syn: bool = True) -> bytes:
+    return b''.join(Encoder.encode(m) + (b'\x16' if syn else b'') for m in messages)
+
+
+def test_single_frame() -> None:
+    decoder = FrameDecoder()
+    assert decoder.feed(frames(["status"])) == ["status"]
+    assert decoder.pending == 0
+
+
+@pytest.mark.parametrize("syn", [True, False])
+def test_coalesced_frames(syn: bool) -> None:
+    decoder = FrameDecoder()
+    assert decoder.feed(frames(MESSAGES, syn)) == MESSAGES
+    assert decoder.pending == 0
+    assert decoder.dropped_bytes == 0
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 13])
+def test_fragmented_frames(chunk_size: int) -> None:
+    decoder = FrameDecoder()
+    stream = frames(MESSAGES)
+    received = []
+    for i in range(0, len(stream), chunk_size):
+        received.extend(decoder.feed(stream[i:i + chunk_size]))
+    assert received == MESSAGES
+    assert decoder.dropped_bytes == 0
+
+
+def test_checksum_of_syn_value() -> None:
+    # The checksum byte of this frame is 0x16, which must not be mistaken for the terminator
+    message = "set timer 11002"
+    assert Encoder.encode(message)[-1] == 0x16
+    decoder = FrameDecoder()
+    assert decoder.feed(Encoder.encode(message)) == [message]
+    assert decoder.feed(frames(["status"], syn=False)) == ["status"]
+
+
+def test_resync_after_garbage() -> None:
+    decoder = FrameDecoder()
+    assert decoder.feed(b'\x00\x01garbage' + frames(["status"])) == ["status"]
+    assert decoder.dropped_bytes == 9
+
+
+def test_resync_after_bad_checksum() -> None:
+    corrupted = bytearray(Encoder.encode("read set temp"))
+    corrupted[-1] ^= 0xFF
+    decoder = FrameDecoder()
+    assert decoder.feed(bytes(corrupted) + frames(["57.5", "28.6"])) == ["57.5", "28.6"]
+    assert decoder.pending == 0
+
+
+def test_messages_iterator() -> None:
+    async def run() -> List[str]:
+        reader = asyncio.StreamReader()
+        stream = frames(MESSAGES)
+        reader.feed_data(stream[:10])
+        reader.feed_data(stream[10:])
+        reader.feed_eof()
+
+        received = []
+        with pytest.raises(ConnectionResetError):
+            async for message in FrameDecoder().messages(reader, read_size=16):
+                received.append(message)
+        return received
+
+    assert asyncio.run(run()) == MESSAGES
+
+
+def test_command_frames() -> None:
+    assert GetDeviceStatus() is GetDeviceStatus()
+    assert command_frame(GetDeviceStatus()) is command_frame(GetDeviceStatus())
+    assert command_frame(GetDeviceStatus()) == Encoder.encode("status") + b'\x16'
+    assert command_frame(SetTimer(160)) == Encoder.encode("set timer 160") + b'\x16'
+    assert command_frame(SetTimer(160)) is command_frame(SetTimer(160))
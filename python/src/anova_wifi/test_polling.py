@@ -0,0 +1,62 @@
+from commands import DeviceStatus
+from .device import DeviceState
+from .event import AnovaEvent, EventType
+from .polling import PollingPolicy, PollingIntervals, PolledField
+
+INTERVALS = PollingIntervals()
+
+
+def test_everything_is_due_initially() -> None:
+    policy = PollingPolicy()
+    assert policy.due(DeviceState(), now=0) == list(PolledField)
+    assert policy.delay(DeviceState(), now=0) == 0
+
+
+def test_idle_device() -> None:
+    policy = PollingPolicy()
+    state = DeviceState(status=DeviceStatus.STOPPED)
+    policy.mark_polled(PolledField, now=0)
+
+    assert policy.due(state, now=1) == []
+    assert policy.delay(state, now=0) == INTERVALS.status
+    assert policy.due(state, now=INTERVALS.status) == [PolledField.STATUS]
+    assert PolledField.CURRENT_TEMPERATURE in policy.due(state, now=INTERVALS.current_temperature_idle)
+
+
+def test_current_temperature_adapts_to_heating() -> None:
+    policy = PollingPolicy()
+    heating = DeviceState(status=DeviceStatus.RUNNING, current_temperature=30, target_temperature=57.5)
+    reached = DeviceState(status=DeviceStatus.RUNNING, current_temperature=57.3, target_temperature=57.5)
+    idle = DeviceState(status=DeviceStatus.STOPPED, current_temperature=30, target_temperature=57.5)
+
+    assert policy.interval(PolledField.CURRENT_TEMPERATURE, heating) == INTERVALS.current_temperature_heating
+    assert policy.interval(PolledField.CURRENT_TEMPERATURE, reached) == INTERVALS.current_temperature_running
+    assert policy.interval(PolledField.CURRENT_TEMPERATURE, idle) == INTERVALS.current_temperature_idle
+
+    policy.mark_polled(PolledField, now=0)
+    assert policy.due(heating, now=INTERVALS.current_temperature_heating) == [PolledField.CURRENT_TEMPERATURE]
+
+
+def test_rarely_changing_fields() -> None:
+    policy = PollingPolicy()
+    state = DeviceState()
+    assert policy.interval(PolledField.UNIT, state) > policy.interval(PolledField.STATUS, state)
+    assert policy.interval(PolledField.SPEAKER_STATUS, state) > policy.interval(PolledField.STATUS, state)
+
+
+def test_change_param_refreshes_everything() -> None:
+    policy = PollingPolicy()
+    state = DeviceState()
+    policy.mark_polled(PolledField, now=0)
+
+    assert policy.invalidate_for_event(AnovaEvent(type=EventType.ChangeParam))
+    assert policy.due(state, now=0) == list(PolledField)
+
+
+def test_timer_event_refreshes_timer() -> None:
+    policy = PollingPolicy()
+    state = DeviceState()
+    policy.mark_polled(PolledField, now=0)
+
+    assert policy.invalidate_for_event(AnovaEvent(type=EventType.TIME_START))
+    assert policy.due(state, now=0) == [PolledField.TIMER]
@@ -0,0 +1,90 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from .priority import CommandPriority, PriorityLock, WaitHistogram
+
+
+async def hold(lock: PriorityLock, priority: CommandPriority, name: str, order: List[str], duration: float = 0) -> None:
+    async with lock.acquire(priority):
+        order.append(name)
+        await asyncio.sleep(duration)
+
+
+def test_interactive_goes_first() -> None:
+    async def run() -> None:
+        lock = PriorityLock()
+        order: List[str] = []
+        holder = asyncio.create_task(hold(lock, CommandPriority.POLL, "holder", order, 0.01))
+        await asyncio.sleep(0)
+
+        tasks = [
+            asyncio.create_task(hold(lock, CommandPriority.POLL, "poll 1", order)),
+            asyncio.create_task(hold(lock, CommandPriority.POLL, "poll 2", order)),
+            asyncio.create_task(hold(lock, CommandPriority.INTERACTIVE, "stop", order)),
+        ]
+        await asyncio.gather(holder, *tasks)
+
+        assert order == ["holder", "stop", "poll 1", "poll 2"]
+        assert not lock.locked()
+        assert lock.stats[CommandPriority.INTERACTIVE].count == 1
+        assert lock.stats[CommandPriority.POLL].count == 3
+
+    asyncio.run(run())
+
+
+def test_aged_waiter_is_not_starved() -> None:
+    async def run() -> None:
+        lock = PriorityLock(aging=0.01)
+        order: List[str] = []
+        holder = asyncio.create_task(hold(lock, CommandPriority.INTERACTIVE, "holder", order, 0.02))
+        await asyncio.sleep(0)
+
+        poll = asyncio.create_task(hold(lock, CommandPriority.POLL, "poll", order))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(hold(lock, CommandPriority.INTERACTIVE, "interactive", order))
+        await asyncio.gather(holder, poll, interactive)
+
+        assert order == ["holder", "poll", "interactive"]
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter() -> None:
+    async def run() -> None:
+        lock = PriorityLock()
+        order: List[str] = []
+        holder = asyncio.create_task(hold(lock, CommandPriority.POLL, "holder", order, 0.01))
+        await asyncio.sleep(0)
+
+        cancelled = asyncio.create_task(hold(lock, CommandPriority.INTERACTIVE, "cancelled", order))
+        waiting = asyncio.create_task(hold(lock, CommandPriority.POLL, "poll", order))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        await asyncio.gather(holder, waiting)
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert order == ["holder", "poll"]
+        assert not lock.locked()
+
+    asyncio.run(run())
+
+
+def test_wait_histogram() -> None:
+    histogram = WaitHistogram()
+    assert histogram.stats.p99 == 0
+
+    for _ in range(98):
+        histogram.record(0.0015)
+    histogram.record(0.3)
+    histogram.record(0.3)
+
+    stats = histogram.stats
+    assert stats.count == 100
+    assert stats.p50 == 0.002
+    assert stats.p99 == 0.3
+    assert stats.max == 0.3
+    assert stats.buckets["0.002"] == 98
+    assert stats.buckets["0.5"] == 2
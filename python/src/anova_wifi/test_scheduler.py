@@ -0,0 +1,81 @@
+import asyncio
+from typing import List
+
+from .scheduler import HashedTimerWheel, PollScheduler, Job
+
+
+def test_timer_wheel_expiry() -> None:
+    wheel: HashedTimerWheel[str] = HashedTimerWheel(tick=1, slots=8, now=0)
+    wheel.schedule("a", 3)
+    wheel.schedule("b", 5)
+    wheel.schedule("c", 20)  # Wraps around the wheel
+
+    assert wheel.advance(2) == []
+    assert wheel.advance(3) == ["a"]
+    assert wheel.advance(12) == ["b"]
+    assert "c" in wheel
+    assert wheel.advance(20) == ["c"]
+    assert len(wheel) == 0
+
+
+def test_timer_wheel_reschedule_and_cancel() -> None:
+    wheel: HashedTimerWheel[str] = HashedTimerWheel(tick=1, slots=8, now=0)
+    wheel.schedule("a", 3)
+    wheel.schedule("a", 6)
+    wheel.schedule("b", 4)
+    wheel.cancel("b")
+
+    assert wheel.deadline("a") == 6
+    assert wheel.advance(5) == []
+    assert wheel.advance(6) == ["a"]
+
+
+def test_timer_wheel_past_deadline_expires_on_next_tick() -> None:
+    wheel: HashedTimerWheel[str] = HashedTimerWheel(tick=1, slots=8, now=10)
+    wheel.schedule("a", 2)
+    assert wheel.advance(11) == ["a"]
+
+
+def test_scheduler_runs_jobs() -> None:
+    async def run() -> None:
+        scheduler = PollScheduler(tick=0.01, max_concurrency=2, initial_jitter=0, min_interval=0.05)
+        runs: List[str] = []
+        errors: List[str] = []
+        concurrent = 0
+        max_concurrent = 0
+
+        def job(key: str) -> Job:
+            async def poll() -> float:
+                nonlocal concurrent, max_concurrent
+                runs.append(key)
+                concurrent += 1
+                max_concurrent = max(max_concurrent, concurrent)
+                await asyncio.sleep(0.02)
+                concurrent -= 1
+                if key == "broken":
+                    raise ConnectionResetError()
+                return 60
+
+            return poll
+
+        async def on_error(key: str, e: Exception) -> None:
+            errors.append(key)
+
+        scheduler.start()
+        for key in ("a", "b", "c", "broken"):
+            scheduler.add(key, job(key), on_error=on_error)
+        await asyncio.sleep(0.2)
+
+        assert sorted(runs) == ["a", "b", "broken", "c"]
+        assert max_concurrent == 2
+        assert errors == ["broken"]
+        assert scheduler.stats.jobs == 3
+
+        scheduler.wake("a")
+        await asyncio.sleep(0.05)
+        assert runs.count("a") == 2
+        assert scheduler.stats.lag_max < 0.2
+
+        await scheduler.stop()
+
+    asyncio.run(run())
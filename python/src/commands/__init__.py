@@ -2,11 +2,12 @@ from .ble import GetDate, GetTemperatureHistory, SetWifiCredentials, StartSmartl
     SetCalibrationFactor, GetCalibrationFactor, SetSecretKey, SetServerInfo, SetLED
 from .common import AnovaCommand, TemperatureUnit, DeviceStatus, SetTargetTemperature, SetTimer, SetTemperatureUnit, \
     GetTargetTemperature, GetCurrentTemperature, StartDevice, StopDevice, GetDeviceStatus, StartTimer, StopTimer, \
-    GetTimerStatus, GetTemperatureUnit, GetIDCard, ClearAlarm, GetSpeakerStatus, GetVersion
+    GetTimerStatus, GetTemperatureUnit, GetIDCard, ClearAlarm, GetSpeakerStatus, GetVersion, FixedCommand
 from .wifi import GetSecretKey
 
 __all__ = [
     "AnovaCommand",
+    "FixedCommand",
     "TemperatureUnit",
     "DeviceStatus",
     "SetTargetTemperature",
@@ -1,9 +1,9 @@
 from typing import List, Optional
 
-from .common import AnovaCommand
+from .common import AnovaCommand, FixedCommand
 
 
-class GetCalibrationFactor(AnovaCommand):
+class GetCalibrationFactor(FixedCommand):
     def supports_ble(self) -> bool: return True
 
     def encode(self) -> str:
@@ -76,14 +76,14 @@ class SetSecretKey(AnovaCommand):
         return f"set number {self.key}"
 
 
-class GetDate(AnovaCommand):
+class GetDate(FixedCommand):
     def supports_ble(self) -> bool: return True
 
     def encode(self) -> str:
         return "read date"
 
 
-class GetTemperatureHistory(AnovaCommand):
+class GetTemperatureHistory(FixedCommand):
     def supports_ble(self) -> bool: return True
 
     def encode(self) -> str:
@@ -108,7 +108,7 @@ class SetWifiCredentials(AnovaCommand):
         return f"wifi para 2 {self.ssid} {self.password} WPA2PSK AES"
 
 
-class StartSmartlink(AnovaCommand):
+class StartSmartlink(FixedCommand):
     def supports_ble(self) -> bool: return True
 
     def encode(self) -> str:
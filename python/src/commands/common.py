@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Any, Optional, Tuple
+from typing import Any, Optional, Tuple, Dict, Type, Self, cast
 
 
 class AnovaCommand(ABC):
@@ -25,6 +25,24 @@ class AnovaCommand(ABC):
         return self.encode()
 
 
+class FixedCommand(AnovaCommand, ABC):
+    """
+    A command without parameters.
+    There is a single immutable instance of each fixed command, so it's never re-instantiated, and transports can
+    compute its encoded form once.
+    """
+    _instances: Dict[Type['FixedCommand'], 'FixedCommand'] = {}
+
+    def __new__(cls) -> Self:
+        instance = FixedCommand._instances.get(cls)
+        if instance is None:
+            instance = FixedCommand._instances[cls] = super().__new__(cls)
+        return cast(Self, instance)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
 class TemperatureUnit(Enum):
     CELSIUS = "c"
     FAHRENHEIT = "f"
@@ -87,7 +105,7 @@ class SetTemperatureUnit(AnovaCommand):
         return f"set unit {self.unit.value}"
 
 
-class GetTargetTemperature(AnovaCommand):
+class GetTargetTemperature(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -99,7 +117,7 @@ class GetTargetTemperature(AnovaCommand):
         return float(float(response.strip()))
 
 
-class GetCurrentTemperature(AnovaCommand):
+class GetCurrentTemperature(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -111,7 +129,7 @@ class GetCurrentTemperature(AnovaCommand):
         return float(float(response.strip()))
 
 
-class StartDevice(AnovaCommand):
+class StartDevice(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -123,7 +141,7 @@ class StartDevice(AnovaCommand):
         return response.strip().lower() == "ok" or response.strip().lower() == "start"
 
 
-class StopDevice(AnovaCommand):
+class StopDevice(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -135,7 +153,7 @@ class StopDevice(AnovaCommand):
         return response.strip().lower() == "ok" or response.strip().lower() == "stop"
 
 
-class GetDeviceStatus(AnovaCommand):
+class GetDeviceStatus(FixedCommand):
 
     def supports_wifi(self) -> bool:
         return True
@@ -153,7 +171,7 @@ class GetDeviceStatus(AnovaCommand):
             raise ValueError(f"Unknown device status: {response}")
 
 
-class StartTimer(AnovaCommand):
+class StartTimer(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -162,7 +180,7 @@ class StartTimer(AnovaCommand):
         return "start time"
 
 
-class StopTimer(AnovaCommand):
+class StopTimer(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -174,7 +192,7 @@ class StopTimer(AnovaCommand):
         return response.strip().lower() == "ok" or response.strip().lower() == "stop time"
 
 
-class GetTimerStatus(AnovaCommand):
+class GetTimerStatus(FixedCommand):
     def supports_wifi(self) -> bool:
         return True
 
@@ -192,7 +210,7 @@ class GetTimerStatus(AnovaCommand):
         return int(response.strip()), False
 
 
-class GetTemperatureUnit(AnovaCommand):
+class GetTemperatureUnit(FixedCommand):
     def supports_wifi(self) -> bool:
         return True
 
@@ -209,7 +227,7 @@ class GetTemperatureUnit(AnovaCommand):
             raise ValueError(f"Unknown temperature unit: {response}")
 
 
-class GetIDCard(AnovaCommand):
+class GetIDCard(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -224,7 +242,7 @@ class GetIDCard(AnovaCommand):
         return id_card
 
 
-class ClearAlarm(AnovaCommand):
+class ClearAlarm(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -236,7 +254,7 @@ class ClearAlarm(AnovaCommand):
         return response.strip().lower() == "ok" or response.strip().lower() == "clear alarm"
 
 
-class GetSpeakerStatus(AnovaCommand):
+class GetSpeakerStatus(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -248,7 +266,7 @@ class GetSpeakerStatus(AnovaCommand):
         return response.strip().lower().endswith(" on")
 
 
-class GetVersion(AnovaCommand):
+class GetVersion(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def supports_ble(self) -> bool: return True
@@ -1,7 +1,7 @@
-from .common import AnovaCommand
+from .common import FixedCommand
 
 
-class GetSecretKey(AnovaCommand):
+class GetSecretKey(FixedCommand):
     def supports_wifi(self) -> bool: return True
 
     def encode(self) -> str: